@@ -1,8 +1,16 @@
 from ReasonFlux.agent.base import BaseAgent
+from ReasonFlux.agent.retry import AgentCallError, CircuitOpenError, RetryPolicy
+from ReasonFlux.agent.early_exit import EarlyExitPolicy
+from ReasonFlux.agent.projection import TemplateProjection
 from ReasonFlux.agent.navigator import Navigator
 from ReasonFlux.agent.inference import Inference
 __all__ = [
     "BaseAgent",
+    "AgentCallError",
+    "CircuitOpenError",
+    "RetryPolicy",
+    "EarlyExitPolicy",
+    "TemplateProjection",
     "Navigator",
     "Inference"
 ]
\ No newline at end of file
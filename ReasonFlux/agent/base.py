@@ -1,9 +1,24 @@
+import hashlib
+import time
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import ClassVar, Dict, Literal, Optional, Tuple
 from pydantic import BaseModel, Field, model_validator
 from langchain_openai import ChatOpenAI
+from langchain_core.prompts import BasePromptTemplate
 from langchain_core.runnables import RunnableSerializable
-import traceback
+from ReasonFlux.agent.retry import (
+    AgentCallError,
+    CircuitOpenError,
+    RetryPolicy,
+    classify_error,
+    get_circuit_breaker,
+    get_retry_after
+)
+from ReasonFlux.utils.client_registry import client_registry
+from ReasonFlux.utils.common import logger
+from ReasonFlux.utils.scheduler import call_scheduler
+from ReasonFlux.utils.tracing import SpanRecord, UsageCallbackHandler, span
+
 class BaseAgent(BaseModel, ABC):
     """
     Base class for all agents, providing a common structure and functionality.
@@ -17,17 +32,21 @@ class BaseAgent(BaseModel, ABC):
         name (str): Unique name of the agent.
         description (str): Optional description of the agent.
         model_client (ChatOpenAI): The model client used by the agent.
-        max_steps (int): Maximum steps before termination.
-        current_step (int): Current step in execution.
+        max_steps (int): Maximum number of attempts for a single call.
+        current_step (int): Number of attempts made for the current call.
         client_params (dict): Parameters for the model client.
+        stage_params (Dict[str, dict]): Per-stage overrides of `client_params`, keyed by the agent method.
+        stage_clients (Dict[str, ChatOpenAI]): The model clients of the overridden stages.
+        retry_policy (RetryPolicy): Backoff and circuit breaker policy applied between attempts.
+        prompt_layout (str): Message layout of the multi-turn Step4 prompts, "default" or "stable_prefix".
     """
     name: str = Field(..., description="Unique name of the agent")
     description: Optional[str] = Field(None, description="Optional agent description")
     model_client: ChatOpenAI = Field(
         None, description="The model client used by the agent"
     )
-    max_steps: int = Field(default=10, description="Maximum steps before termination")
-    current_step: int = Field(default=0, description="Current step in execution")
+    max_steps: int = Field(default=10, description="Maximum number of attempts for a single call")
+    current_step: int = Field(default=0, description="Number of attempts made for the current call")
 
     client_params: dict = Field(
         default={
@@ -37,60 +56,216 @@ class BaseAgent(BaseModel, ABC):
             "temperature": 0.7,
             "max_tokens": 4096,
             "timeout": 60.0,
-            "max_retries": 1,
             "vision": False,
             "function_calling": False,
-            "json_output": False
+            "json_output": False,
+            "http_pool": None
         },
         description="Parameters for the model client",
     )
 
+    stage_params: Dict[str, dict] = Field(
+        default_factory=dict,
+        description="Per-stage overrides of client_params, keyed by the agent method"
+    )
+    stage_clients: Dict[str, ChatOpenAI] = Field(
+        default_factory=dict,
+        description="The model clients of the overridden stages"
+    )
+
+    # the agent methods that call the model, i.e. the valid keys of stage_params
+    stages: ClassVar[Tuple[str, ...]] = ()
+
+    retry_policy: RetryPolicy = Field(
+        default_factory=RetryPolicy,
+        description="Backoff and circuit breaker policy applied between attempts"
+    )
+
+    prompt_layout: Literal["default", "stable_prefix"] = Field(
+        default="default",
+        description="Message layout of the multi-turn Step4 prompts, stable_prefix keeps the prompt prefix of a run unchanged"
+    )
+
     class Config:
         arbitrary_types_allowed = True
         extra = "allow"
     
     @model_validator(mode="after")
     def initialize_agent(self) -> "BaseAgent":
-        """Initialize agent with default settings if not provided."""
-        if self.model_client is None or not isinstance(self.model_client, ChatOpenAI):
-            self.model_client = ChatOpenAI(
-                api_key=self.client_params["api_key"],
-                base_url=self.client_params["base_url"],
-                model=self.client_params["model"],
-                temperature=self.client_params["temperature"],
-                max_completion_tokens = self.client_params["max_tokens"],
-                timeout=self.client_params["timeout"],
-                max_retries=self.client_params["max_retries"],
-                verbose=True
+        """Initialize agent with default settings if not provided.
+
+        The model clients draw their HTTP connection pool from the process-wide client registry,
+        so agents on the same endpoint and model share keep-alive connections. Every stage in
+        `stage_params` without a client in `stage_clients` gets its own client.
+        """
+        unknown = set(self.stage_params) - set(self.stages)
+        if unknown:
+            raise ValueError(
+                f"Unknown stages {sorted(unknown)} for agent {self.name}, expected some of {list(self.stages)}"
             )
+        if self.model_client is None or not isinstance(self.model_client, ChatOpenAI):
+            self.model_client = self._create_client(self.client_params)
+        for stage in self.stage_params:
+            if not isinstance(self.stage_clients.get(stage), ChatOpenAI):
+                self.stage_clients[stage] = self._create_client(self.params_for(stage))
         return self
 
-    def run(self, chain: RunnableSerializable, **kwargs):
+    @staticmethod
+    def _create_client(params: dict) -> ChatOpenAI:
+        return ChatOpenAI(
+            api_key=params["api_key"],
+            base_url=params["base_url"],
+            model=params["model"],
+            temperature=params["temperature"],
+            max_completion_tokens = params["max_tokens"],
+            timeout=params["timeout"],
+            # retries belong to `_run_with_retries`, which applies the retry policy and the scheduler
+            max_retries=0,
+            http_client=client_registry.get_http_client(
+                params["base_url"],
+                params["api_key"],
+                params["model"],
+                params.get("http_pool")
+            ),
+            verbose=True
+        )
+
+    def params_for(self, stage: Optional[str] = None) -> dict:
+        """
+        The client parameters of a stage: `client_params` updated with the stage's overrides.
+        """
+        return {**self.client_params, **self.stage_params.get(stage, {})}
+
+    def client_for(self, stage: Optional[str] = None) -> ChatOpenAI:
+        """
+        The model client of a stage, `model_client` unless the stage is overridden.
+        """
+        return self.stage_clients.get(stage, self.model_client)
+
+    def run(
+        self,
+        chain: RunnableSerializable,
+        stage: Optional[str] = None,
+        span_attributes: Optional[dict] = None,
+        **kwargs
+    ):
         """
         Run the agent's workflow.
 
-        This method executes the agent's steps until the maximum number of steps
-        is reached or an exception occurs. It handles exceptions and retries
-        the step if possible.
+        Each call gets its own budget of `max_steps` attempts. Transient provider errors
+        (rate limits, timeouts, connection and server errors) are retried with exponential
+        backoff and jitter, honoring the provider's Retry-After header, and are reported to
+        the circuit breaker shared by all agents on the same endpoint and model. Malformed
+        output is re-sampled at once, up to `retry_policy.max_parse_retries` times. Any
+        other error is raised immediately. Every call is recorded as an `llm` span with its
+        latency, token usage, the prompt tokens the provider served from its cache, and retries.
+
+        Every attempt goes through the process-wide call scheduler, which holds it until the
+        rate limit of the endpoint and model allows it. The token estimate is the rendered
+        prompt plus `max_tokens`, and calls rendering the same prompt for the same agent,
+        stage and model may share one provider call.
 
         Args:
             chain (RunnableSerializable): The chain to run.
+            stage (Optional[str]): The agent method making the call, selects the circuit breaker and
+                the model reported in the span when the stage is overridden.
+            span_attributes (Optional[dict]): Additional attributes of the call's `llm` span.
             **kwargs: Additional keyword arguments for the step method.
 
         Returns:
-            Any: The result of the agent's execution, or None if it fails.
+            Any: The result of the agent's execution.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker for the provider is open.
+            AgentCallError: If the attempt budget is exhausted.
         """
-        while self.current_step < self.max_steps:
+        usage = UsageCallbackHandler()
+        chain = chain.with_config(callbacks=[usage])
+        params = self.params_for(stage)
+        attributes = {"model": params["model"], **({"stage": stage} if stage else {}), **(span_attributes or {})}
+        prompt = self._render_prompt(chain, kwargs)
+        if prompt is None:
+            tokens, coalesce_key = params["max_tokens"], None
+        else:
+            tokens = len(prompt) // 4 + params["max_tokens"]
+            coalesce_key = (
+                params["base_url"], params["model"], self.name, stage,
+                hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+            )
+        with span(f"llm.{self.name}", "llm", **attributes) as record:
             try:
-                res = self.step(chain, **kwargs)
-                # print(res)
-                return res
+                return self._run_with_retries(chain, record, params, tokens, coalesce_key, **kwargs)
+            finally:
+                record.set_attribute("prompt_tokens", usage.prompt_tokens)
+                record.set_attribute("completion_tokens", usage.completion_tokens)
+                record.set_attribute("cached_tokens", usage.cached_tokens)
+
+    @staticmethod
+    def _render_prompt(chain: RunnableSerializable, kwargs: dict) -> Optional[str]:
+        """
+        The prompt a `prompt | client | ...` chain sends, or None for other chains.
+        """
+        first = getattr(chain, "first", None)
+        if not isinstance(first, BasePromptTemplate):
+            return None
+        return first.invoke(kwargs).to_string()
+
+    def _run_with_retries(
+        self,
+        chain: RunnableSerializable,
+        record: SpanRecord,
+        params: dict,
+        tokens: int,
+        coalesce_key: Optional[tuple],
+        **kwargs
+    ):
+        breaker = get_circuit_breaker(params["base_url"], params["model"], self.retry_policy)
+        attempt = 0
+        parse_retries = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(
+                    f"Agent {self.name}: circuit open for {params['model']} at {params['base_url']}"
+                )
+            attempt += 1
+            self.current_step = attempt
+            record.set_attribute("retries", attempt - 1)
+            try:
+                res = call_scheduler.call(
+                    params["base_url"],
+                    params["model"],
+                    lambda: self.step(chain, **kwargs),
+                    tokens=tokens,
+                    coalesce_key=coalesce_key
+                )
             except Exception as e:
-                print(f"Error in agent {self.name}: {e}")
-                print(traceback.format_exc())
-                if self.current_step < self.max_steps:
-                    self.current_step += 1
-        return None
+                kind = classify_error(e)
+                if kind == "retryable":
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                logger.warning(
+                    "Error in agent %s (attempt %d/%d, %s): %s: %s",
+                    self.name, attempt, self.max_steps, kind, type(e).__name__, e
+                )
+                logger.debug("Agent step traceback", exc_info=True)
+
+                if kind == "fatal":
+                    raise
+                if kind == "parse":
+                    parse_retries += 1
+                    exhausted = parse_retries > self.retry_policy.max_parse_retries
+                else:
+                    exhausted = False
+                if exhausted or attempt >= self.max_steps:
+                    raise AgentCallError(
+                        f"Agent {self.name} failed after {attempt} attempts"
+                    ) from e
+                if kind == "retryable":
+                    time.sleep(self.retry_policy.backoff(attempt, get_retry_after(e)))
+                continue
+            breaker.record_success()
+            return res
 
     @abstractmethod
     def step(self, messages:dict, **kwargs):
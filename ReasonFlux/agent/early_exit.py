@@ -0,0 +1,60 @@
+import re
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+# Appended to the interplay prompt in "flag" mode, and stripped from the answer again.
+FINAL_ANSWER_FLAG = "[FINAL ANSWER VERIFIED]"
+
+BOXED_PATTERN = re.compile(r"\\boxed\{\s*[^\s}]")
+
+
+class EarlyExitPolicy(BaseModel):
+    """
+    Decides when the Step4 loop can stop before the last step of the reasoning flow.
+
+    Modes:
+        off: always run every step.
+        boxed: stop once an answer contains a non-empty \\boxed{} answer and every remaining
+            step only verifies, summarizes or restates it (a cheap local check).
+        flag: the Inference agent is asked to end its answer with `FINAL_ANSWER_FLAG` once
+            the final answer is derived and verified; stop when it does.
+
+    Attributes:
+        mode (str): "off", "boxed" or "flag".
+        restating_keywords (List[str]): Words that mark a step as verification or summary.
+    """
+    mode: Literal["off", "boxed", "flag"] = Field("off", description="off, boxed or flag")
+    restating_keywords: List[str] = Field(
+        default=[
+            "verify", "verification", "check", "confirm", "validate", "summarize", "summary",
+            "conclude", "conclusion", "review", "restate", "final answer", "state the answer"
+        ],
+        description="Words that mark a step as verification or summary"
+    )
+
+    def is_restating(self, step: str) -> bool:
+        step = step.lower()
+        return any(keyword in step for keyword in self.restating_keywords)
+
+    def check(self, answer: str, remaining_steps: List[str]) -> Optional[str]:
+        """
+        Whether to skip the remaining steps after this answer.
+
+        Args:
+            answer (str): The Inference agent's answer for the current step.
+            remaining_steps (List[str]): The steps of the reasoning flow not run yet.
+
+        Returns:
+            Optional[str]: The reason to exit ("boxed_answer" or "final_answer_flag"), or None to continue.
+        """
+        if not remaining_steps or self.mode == "off":
+            return None
+        if self.mode == "flag":
+            return "final_answer_flag" if FINAL_ANSWER_FLAG in answer else None
+        if BOXED_PATTERN.search(answer) and all(self.is_restating(step) for step in remaining_steps):
+            return "boxed_answer"
+        return None
+
+    def strip_flag(self, answer: str) -> str:
+        return answer.replace(FINAL_ANSWER_FLAG, "").rstrip()
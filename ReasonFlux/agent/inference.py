@@ -1,8 +1,14 @@
+from typing import ClassVar, Optional, Tuple
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableSerializable
 from ReasonFlux.agent.base import BaseAgent
-from ReasonFlux.prompts.inference import INTERPLAY_PROMPT
+from ReasonFlux.prompts.inference import (
+    INTERPLAY_PROMPT,
+    INTERPLAY_EARLY_EXIT_PROMPT,
+    INTERPLAY_STABLE_PROMPT,
+    INTERPLAY_EARLY_EXIT_STABLE_PROMPT
+)
 from ReasonFlux.agent.parser import think_answer_parser
 
 
@@ -21,7 +27,9 @@ class Inference(BaseAgent):
 
     name: str = "Inference"
     description: str = """Inference agent"""
-    
+
+    stages: ClassVar[Tuple[str, ...]] = ("interplay",)
+
     def step(self, chain: RunnableSerializable, **kwargs):
         return chain.invoke(kwargs)
     
@@ -30,19 +38,26 @@ class Inference(BaseAgent):
         instruction: str,
         problem: str,
         previous_instruction: list[str],
-        previous_reasoning: list[str]
+        previous_reasoning: list[str],
+        request_final_flag: bool = False,
+        step_idx: Optional[int] = None
     ):
         """
         Simulates the interplay between a student and a tutor for problem-solving.
 
         This method constructs a conversation history based on previous instructions
         and reasoning, and then uses the model client to generate a new thought and solution.
+        With the "stable_prefix" layout the problem is the first turn rather than part of the
+        system message, so the system message is shared by all problems.
 
         Args:
             instruction (str): The current instruction from the teacher.
             problem (str): The problem to be solved.
             previous_instruction (list[str]): List of previous instructions.
             previous_reasoning (list[str]): List of previous reasoning steps.
+            request_final_flag (bool): Whether to ask the model to flag a verified final answer, for early exit.
+            step_idx (int, optional): The index of the step, when the steps of a block run
+                concurrently on the same history. Defaults to the step after the history.
 
         Returns:
             tuple: A tuple containing the thought and solution generated by the model.
@@ -50,7 +65,13 @@ class Inference(BaseAgent):
         Raises:
             AssertionError: If the lengths of previous_instruction and previous_reasoning do not match.
         """
-        system_prompt = INTERPLAY_PROMPT
+        if self.prompt_layout == "stable_prefix":
+            system_prompt = INTERPLAY_EARLY_EXIT_STABLE_PROMPT if request_final_flag else INTERPLAY_STABLE_PROMPT
+        else:
+            system_prompt = INTERPLAY_EARLY_EXIT_PROMPT if request_final_flag else INTERPLAY_PROMPT
+
+        if step_idx is None:
+            step_idx = len(previous_instruction)
 
         history = []
         assert len(previous_instruction) == len(previous_reasoning), "The length of previous instruction and reasoning must be the same"
@@ -62,14 +83,14 @@ class Inference(BaseAgent):
                 AIMessage(content=previous_reasoning[i])
             )
         history.append(
-            HumanMessage(content=f"Teacher Instruction for Step {len(previous_instruction)+1}: {instruction}")
+            HumanMessage(content=f"Teacher Instruction for Step {step_idx+1}: {instruction}")
         )
         
         prompt = system_prompt.__add__(
             ChatPromptTemplate.from_messages(history)
         )
 
-        chain =  prompt | self.model_client | think_answer_parser
-        res = self.run(chain, problem=problem)
+        chain =  prompt | self.client_for("interplay") | think_answer_parser
+        res = self.run(chain, stage="interplay", problem=problem)
         thought, solution = res["thought"], res["answer"]
         return thought, solution
\ No newline at end of file
@@ -6,11 +6,17 @@ from ReasonFlux.prompts.navigator import (
     TRAJECTORY_BUILDING_PROMPT,
     TRAJECTORY_ADJUST_PROMPT,
     REASONING_FLOW_UPDATE_PROMPT,
-    INITIALIZE_REASON_PROBLEM_PROMPT
+    INITIALIZE_REASON_PROBLEM_PROMPT,
+    INITIALIZE_REASON_PROBLEM_STABLE_PROMPT,
+    STEP_DEPENDENCY_PROMPT
 )
-from ReasonFlux.agent.parser import think_answer_parser, json_parser
+from ReasonFlux.agent.projection import TemplateProjection, estimate_tokens
+from ReasonFlux.agent.parser import think_answer_parser, json_parser, reasoning_flow_parser, split_step_dependencies
+from ReasonFlux.utils.common import logger
 
+from typing import ClassVar, Optional, Tuple
 from pydantic import Field
+from langchain.schema import OutputParserException
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from langchain_core.runnables import RunnableSerializable
@@ -32,6 +38,12 @@ class Navigator(BaseAgent):
         reasoning_rounds (int): The number of reasoning rounds completed by the model.
         reasoning_instructions (List): A list of reasoning instructions generated by the model.
         template (Dict): The template used for reasoning.
+        local_flow_parsing (bool): Whether to parse the adjusted reasoning flow locally before asking the model.
+        flow_parse_stats (Dict): How many adjusted reasoning flows were parsed locally and how many fell back to the model.
+        emit_dependencies (bool): Whether to ask the model which earlier steps each step of the reasoning flow needs.
+        step_dependencies (List): The indices of the earlier steps each step depends on, empty for a sequential flow.
+        template_projection (TemplateProjection): Which fields of the retrieved template are sent in Step3, and how.
+        projection_stats (Dict): Number of projected templates and their estimated tokens before and after projection.
     """
 
     name: str = "Navigator"
@@ -69,9 +81,134 @@ class Navigator(BaseAgent):
         description="The template used for reasoning.",
     )
 
+    local_flow_parsing: bool = Field(
+        default=True,
+        description="Whether to parse the adjusted reasoning flow locally before asking the model.",
+    )
+
+    flow_parse_stats: Dict = Field(
+        default_factory=lambda: {"local": 0, "fallback": 0},
+        description="How many adjusted reasoning flows were parsed locally and how many fell back to the model.",
+    )
+
+    emit_dependencies: bool = Field(
+        default=False,
+        description="Whether to ask the model which earlier steps each step of the reasoning flow needs.",
+    )
+
+    step_dependencies: List = Field(
+        default_factory=list,
+        description="The indices of the earlier steps each step depends on, empty for a sequential flow.",
+    )
+
+    template_projection: TemplateProjection = Field(
+        default_factory=TemplateProjection,
+        description="Which fields of the retrieved template are sent in Step3, and how.",
+    )
+
+    projection_stats: Dict = Field(
+        default_factory=lambda: {"calls": 0, "tokens_before": 0, "tokens_after": 0},
+        description="Number of projected templates and their estimated tokens before and after projection.",
+    )
+
+    stages: ClassVar[Tuple[str, ...]] = (
+        "initializing_reasoning_trajectory",
+        "dynamic_adjustment",
+        "update_reasoning_flow",
+        "initialize_reason_problem"
+    )
+
     def step(self, chain: RunnableSerializable, **kwargs):
         return chain.invoke(kwargs)
 
+    def reset(self) -> None:
+        """
+        Clears the reasoning state left by a previous problem, so the agent can be reused.
+        """
+        self.reasoning_thoughts = []
+        self.reasoning_flow = []
+        self.instantiation = []
+        self.reasoning_rounds = 0
+        self.reasoning_instructions = []
+        self.step_dependencies = []
+        self.template = None
+
+    def state(self) -> Dict:
+        """
+        The reasoning state of the current problem, as plain JSON-serializable data.
+        """
+        return {
+            "reasoning_thoughts": list(self.reasoning_thoughts),
+            "reasoning_flow": list(self.reasoning_flow),
+            "instantiation": list(self.instantiation),
+            "reasoning_rounds": self.reasoning_rounds,
+            "reasoning_instructions": list(self.reasoning_instructions),
+            "step_dependencies": list(self.step_dependencies),
+            "template": self.template
+        }
+
+    def restore(self, state: Dict) -> None:
+        """
+        Restores a reasoning state saved by `state`, e.g. to resume an interrupted run.
+        """
+        self.reasoning_thoughts = list(state["reasoning_thoughts"])
+        self.reasoning_flow = list(state["reasoning_flow"])
+        self.instantiation = list(state["instantiation"])
+        self.reasoning_rounds = state["reasoning_rounds"]
+        self.reasoning_instructions = list(state["reasoning_instructions"])
+        self.step_dependencies = list(state.get("step_dependencies", []))
+        self.template = state["template"]
+
+    def _with_step_dependencies(self, prompt: ChatPromptTemplate) -> ChatPromptTemplate:
+        """
+        Adds `STEP_DEPENDENCY_PROMPT` after the leading system message when dependencies are emitted.
+        """
+        if not self.emit_dependencies:
+            return prompt
+        messages = list(prompt.messages)
+        return ChatPromptTemplate(messages[:1] + list(STEP_DEPENDENCY_PROMPT.messages) + messages[1:])
+
+    def set_reasoning_flow(self, reasoning_flow: List[str]) -> None:
+        """
+        Sets the reasoning flow and rounds, splitting off the step dependencies when they are emitted.
+        """
+        if self.emit_dependencies:
+            reasoning_flow, self.step_dependencies = split_step_dependencies(reasoning_flow)
+        else:
+            self.step_dependencies = []
+        self.reasoning_flow = reasoning_flow
+        self.reasoning_rounds = len(self.reasoning_flow)
+        if self.template is not None:
+            self.template["reason_flow"] = self.reasoning_flow
+
+    def dependencies_of(self, step_idx: int) -> List[int]:
+        """
+        The indices of the earlier steps the step needs, the previous step for a sequential flow.
+        """
+        if self.step_dependencies:
+            return self.step_dependencies[step_idx]
+        return [step_idx - 1] if step_idx else []
+
+    def step_blocks(self, start: int = 0) -> List[List[int]]:
+        """
+        Splits the steps from `start` on into consecutive blocks of steps that do not depend on
+        each other. Every step of a block only needs steps of earlier blocks, so the steps of a
+        block can be carried out concurrently, and a sequential flow gives one step per block.
+
+        Args:
+            start (int): The first step to schedule.
+
+        Returns:
+            List[List[int]]: The step indices of each block, in order.
+        """
+        blocks = []
+        for step_idx in range(start, self.reasoning_rounds):
+            if blocks and not set(self.dependencies_of(step_idx)) & set(blocks[-1]):
+                blocks[-1].append(step_idx)
+            else:
+                blocks.append([step_idx])
+        return blocks
+
     def initializing_reasoning_trajectory(
         self,
         problem:str
@@ -89,18 +226,17 @@ class Navigator(BaseAgent):
             str: The thoughts generated for building the template.
         """
 
-        prompt = TRAJECTORY_BUILDING_PROMPT
+        prompt = self._with_step_dependencies(TRAJECTORY_BUILDING_PROMPT)
 
-        chain = prompt | self.model_client | think_answer_parser
+        chain = prompt | self.client_for("initializing_reasoning_trajectory") | think_answer_parser
 
 
-        res = self.run(chain, problem=problem)
+        res = self.run(chain, stage="initializing_reasoning_trajectory", problem=problem)
         thoughts_for_template_building,template_str= res['thought'], res['answer']
         
         self.template = json_parser.parse(template_str)
         self.reasoning_thoughts.append(thoughts_for_template_building)
-        self.reasoning_flow = self.template['reason_flow']
-        self.reasoning_rounds = len(self.reasoning_flow)
+        self.set_reasoning_flow(self.template['reason_flow'])
     
     def dynamic_adjustment(
         self,
@@ -111,7 +247,9 @@ class Navigator(BaseAgent):
         Dynamically adjusts the reasoning flow based on the provided trajectory and template.
 
         This method constructs a prompt to adjust the reasoning trajectory and runs it through
-        the model client. It returns the new reasoning flow as a string.
+        the model client. It returns the new reasoning flow as a string. The template is sent
+        as `template_projection` serializes it, and the estimated tokens of the full and the
+        projected template are recorded on the call's span and in `projection_stats`.
 
         Args:
             trajectory (List[Dict]): The current reasoning trajectory.
@@ -120,14 +258,24 @@ class Navigator(BaseAgent):
         Returns:
             str: The new reasoning flow as a string.
         """
-        prompt = TRAJECTORY_ADJUST_PROMPT
+        prompt = self._with_step_dependencies(TRAJECTORY_ADJUST_PROMPT)
+
+        chain = prompt | self.client_for("dynamic_adjustment") | think_answer_parser
 
-        chain = prompt | self.model_client | think_answer_parser
+        standard_solution_template = self.template_projection.serialize(retrieved_template)
+        tokens_before = estimate_tokens(json.dumps(retrieved_template, indent=2))
+        tokens_after = estimate_tokens(standard_solution_template)
+        self.projection_stats["calls"] += 1
+        self.projection_stats["tokens_before"] += tokens_before
+        self.projection_stats["tokens_after"] += tokens_after
+        logger.debug("Retrieved template projected from ~%d to ~%d tokens", tokens_before, tokens_after)
 
         new_reasoning_flow = self.run(
             chain,
+            stage="dynamic_adjustment",
+            span_attributes={"template_tokens_before": tokens_before, "template_tokens_after": tokens_after},
             original_reason_flow=json.dumps(trajectory, indent=2),
-            standard_solution_template=json.dumps(retrieved_template, indent=2)
+            standard_solution_template=standard_solution_template
         )["answer"]
 
         return new_reasoning_flow
@@ -138,43 +286,73 @@ class Navigator(BaseAgent):
     def update_reasoning_flow(
         self,
         reasoning_flow_str: str,
-    ) -> None:
+    ) -> str:
         """
         Updates the reasoning flow based on the retrieved template.
 
-        This method constructs a prompt to update the reasoning flow and runs it through
-        the model client. It parses the response to update the reasoning flow and rounds.
+        The reasoning flow is first parsed locally, which handles JSON lists, fenced code
+        blocks and numbered or bulleted step lists. Only when that fails is a prompt to
+        extract the reasoning flow run through the model client. It updates the reasoning
+        flow and rounds, and counts the outcome in `flow_parse_stats`.
 
         Args:
             reasoning_flow_str (str): The new reasoning flow as a string.
-        """
-        prompt = REASONING_FLOW_UPDATE_PROMPT
-
-        chain = prompt | self.model_client | json_parser
 
-        updated_reasoning_flow = self.run(
-            chain=chain,
-            reasoning_flow=reasoning_flow_str
-        )
+        Returns:
+            str: "local" if the flow was parsed locally, "llm" if the model extracted it.
+        """
+        updated_reasoning_flow = None
+        if self.local_flow_parsing:
+            try:
+                updated_reasoning_flow = reasoning_flow_parser.parse(reasoning_flow_str)
+            except OutputParserException as e:
+                logger.info("Falling back to the model to extract the reasoning flow: %s", e)
+
+        if updated_reasoning_flow is not None:
+            self.flow_parse_stats["local"] += 1
+            source = "local"
+        else:
+            self.flow_parse_stats["fallback"] += 1
+            source = "llm"
+            prompt = REASONING_FLOW_UPDATE_PROMPT
+
+            chain = prompt | self.client_for("update_reasoning_flow") | json_parser
+
+            updated_reasoning_flow = self.run(
+                chain=chain,
+                stage="update_reasoning_flow",
+                reasoning_flow=reasoning_flow_str
+            )
 
-        self.reasoning_flow = updated_reasoning_flow
-        self.reasoning_rounds = len(self.reasoning_flow)
-        self.template["reason_flow"] = self.reasoning_flow
+        self.set_reasoning_flow(updated_reasoning_flow)
+        return source
     
-    def initialize_reason_problem(self, problem, reason_step):
+    def initialize_reason_problem(self, problem, reason_step, step_idx: Optional[int] = None):
         """
         Initializes the reasoning problem by constructing a prompt based on the current reasoning state.
 
         This method constructs a prompt to initialize the reasoning problem and runs it through
         the model client. It returns the response text.
 
+        With the "stable_prefix" layout, the problem is the first turn and every step is asked
+        for in a human turn that is kept in the history as it was sent, so the prompt of each
+        step starts with the exact prompt of the step before it.
+
         Args:
             problem: The problem description.
             reason_step: The current reasoning step.
+            step_idx (int, optional): The index of the step, when the steps of a block run
+                concurrently on the same history. Defaults to the step after the history.
 
         Returns:
             str: The response text from the model.
         """
+        if step_idx is None:
+            step_idx = len(self.reasoning_instructions)
+
+        if self.prompt_layout == "stable_prefix":
+            return self._initialize_reason_problem_stable(problem, reason_step, step_idx)
+
         system_prompt = INITIALIZE_REASON_PROBLEM_PROMPT
 
         histoty = []
@@ -190,12 +368,29 @@ class Navigator(BaseAgent):
             )
         
         continue_prompt = "Now based on the student's response and the previous steps, please continue to instruct students to implement this step."
-        histoty.append(SystemMessage(content=f"{continue_prompt}\nCurrent step: Step {len(self.reasoning_instructions)+1}:\n{reason_step}"))
+        histoty.append(SystemMessage(content=f"{continue_prompt}\nCurrent step: Step {step_idx+1}:\n{reason_step}"))
         
         prompt = system_prompt.__add__(
             ChatPromptTemplate.from_messages(histoty)
         )
 
-        chain = prompt | self.model_client
+        chain = prompt | self.client_for("initialize_reason_problem")
+
+        return self.run(chain=chain, stage="initialize_reason_problem", problem=problem).text()
+
+    def _initialize_reason_problem_stable(self, problem, reason_step, step_idx: int):
+        """
+        `initialize_reason_problem` in the "stable_prefix" layout.
+        """
+        history = []
+        for i in range(len(self.reasoning_instructions)):
+            history.append(HumanMessage(content=f"Current step: Step {i+1}:\n{self.reasoning_flow[i]}"))
+            history.append(AIMessage(content=f"Step {i+1}:\n{self.reasoning_instructions[i]}"))
+            history.append(HumanMessage(content=f"Student Response for Step {i+1}:\n{self.instantiation[i]}"))
+        history.append(HumanMessage(content=f"Current step: Step {step_idx+1}:\n{reason_step}"))
+
+        prompt = INITIALIZE_REASON_PROBLEM_STABLE_PROMPT + ChatPromptTemplate.from_messages(history)
+
+        chain = prompt | self.client_for("initialize_reason_problem")
 
-        return self.run(chain=chain,problem=problem).text()
+        return self.run(chain=chain, stage="initialize_reason_problem", problem=problem).text()
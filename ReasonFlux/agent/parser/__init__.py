@@ -1,5 +1,8 @@
-from ReasonFlux.agent.parser.utils import think_answer_parser, json_parser
+from ReasonFlux.agent.parser.utils import think_answer_parser, json_parser, reasoning_flow_parser
+from ReasonFlux.agent.parser.reasoning_flow_parser import split_step_dependencies
 __all__ = [
     "think_answer_parser",
-    "json_parser"
+    "json_parser",
+    "reasoning_flow_parser",
+    "split_step_dependencies"
 ]
\ No newline at end of file
@@ -0,0 +1,173 @@
+import json
+import re
+from typing import List, Tuple
+
+from langchain.schema import BaseOutputParser, OutputParserException
+
+
+# A fenced code block, optionally tagged with a language.
+FENCE_PATTERN = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)```", re.DOTALL)
+
+# The start of a list item: "1.", "1)", "(1)", "Step 1:", "**Step 1.**", "①", "-", "*", "•".
+# A bold marker after the number is only consumed when one opened before it, so the bold
+# of the step text itself ("1. **Observe**: ...") is left in one piece.
+ITEM_PATTERN = re.compile(
+    r"^\s*(\*\*|__)?"
+    r"(?:"
+    r"(?:step\s*)?\(?\d+[.):：、]|"
+    r"step\s*\d+\s*[-—]|"
+    r"[①-⑳]|"
+    r"[-*•+]\s"
+    r")"
+    r"(?(1)(?:\*\*|__)?)\s*",
+    re.IGNORECASE
+)
+
+# Bold text inside a step: "**Observe**" or "__Observe__".
+BOLD_PATTERN = re.compile(r"(\*\*|__)(.+?)\1")
+
+# The dependency marker `STEP_DEPENDENCY_PROMPT` asks for at the end of a step: "(depends on: 1, 2)".
+DEPENDENCY_PATTERN = re.compile(r"\s*\(\s*depends\s+on\s*:?\s*([^()]*)\)\s*[.。]?\s*$", re.IGNORECASE)
+
+
+def split_step_dependencies(steps: List[str]) -> Tuple[List[str], List[List[int]]]:
+    """
+    Strip the "(depends on: ...)" markers from the steps of a reasoning flow.
+
+    Markers use 1-based step numbers, "none" for a step that needs no earlier step. A step
+    without a marker depends on the step before it, and references to the step itself or to
+    later steps are dropped, so the dependencies always form a DAG in step order.
+
+    Args:
+        steps (List[str]): The steps, possibly ending with a marker.
+
+    Returns:
+        Tuple[List[str], List[List[int]]]: The steps without markers and the 0-based indices
+        of the earlier steps each one depends on.
+    """
+    cleaned, dependencies = [], []
+    for step_idx, step in enumerate(steps):
+        marker = DEPENDENCY_PATTERN.search(step)
+        if marker is None:
+            cleaned.append(step)
+            dependencies.append([step_idx - 1] if step_idx else [])
+            continue
+        cleaned.append(step[:marker.start()].strip())
+        dependencies.append(sorted({
+            int(number) - 1 for number in re.findall(r"\d+", marker.group(1))
+            if 0 < int(number) <= step_idx
+        }))
+    return cleaned, dependencies
+
+
+class ReasoningFlowOutputParser(BaseOutputParser[List[str]]):
+    """
+    Deterministic parser for the reasoning flow returned by `TRAJECTORY_ADJUST_PROMPT`.
+
+    Understands a JSON list of steps, optionally inside a fenced code block, and numbered
+    or bulleted step lists. Lines outside a list (e.g. a heading) are ignored, lines
+    directly following a step are joined to it, and text separated from the list by a blank
+    line, or an item of the other kind (bulleted after numbered or the reverse), ends it.
+    Bold markers are removed from the steps.
+
+    When the answer holds several lists, e.g. a bulleted list of the changes made followed
+    by the numbered flow, the only numbered one is the flow. Raises `OutputParserException`
+    when no step is found or the flow is ambiguous, so the caller can fall back to
+    `REASONING_FLOW_UPDATE_PROMPT`.
+    """
+
+    def parse(self, text: str) -> List[str]:
+        """
+        Parse the reasoning flow into a list of steps.
+        """
+        fence = FENCE_PATTERN.search(text)
+        body = fence.group(1) if fence else text
+        steps = self._parse_json(body.strip())
+        if steps is None:
+            steps = self._choose_list(self._parse_lists(body), text)
+        if not steps:
+            raise OutputParserException(f"No reasoning steps found in: {text[:200]}")
+        return steps
+
+    @staticmethod
+    def _parse_json(text: str) -> List[str] | None:
+        if not text.startswith("["):
+            return None
+        try:
+            steps = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(steps, list) or not all(isinstance(step, (str, int, float)) for step in steps):
+            return None
+        return [str(step).strip() for step in steps if str(step).strip()]
+
+    @staticmethod
+    def _choose_list(lists: List[Tuple[bool, List[str]]], text: str) -> List[str]:
+        if len(lists) > 1:
+            numbered = [steps for is_numbered, steps in lists if is_numbered]
+            if len(numbered) != 1:
+                raise OutputParserException(f"Found {len(lists)} step lists, cannot tell which is the flow: {text[:200]}")
+            return numbered[0]
+        return lists[0][1] if lists else []
+
+    @staticmethod
+    def _parse_lists(text: str) -> List[Tuple[bool, List[str]]]:
+        """
+        Every top-level list of the text, whether it is numbered, and its steps.
+        """
+        lists: List[Tuple[bool, List[str]]] = []
+        steps: List[str] = []
+        numbered = False
+        indent = None
+        after_blank = False
+
+        def _close():
+            if steps:
+                cleaned = [BOLD_PATTERN.sub(r"\2", step) for step in steps]
+                cleaned = [re.sub(r"^(?:\*\*|__)|(?:\*\*|__)(?=\s*$)", "", step).strip() for step in cleaned]
+                lists.append((numbered, [step for step in cleaned if step]))
+
+        for line in text.splitlines():
+            if not line.strip():
+                after_blank = True
+                continue
+            item = ITEM_PATTERN.match(line)
+            line_indent = len(line) - len(line.lstrip())
+            if item and (indent is None or line_indent <= indent):
+                # items indented deeper than the first one are sub-points of the current step
+                item_numbered = bool(re.search(r"\d|[①-⑳]", item.group(0)))
+                if steps and item_numbered != numbered:
+                    _close()
+                    steps, indent = [], None
+                if not steps:
+                    numbered, indent = item_numbered, line_indent
+                steps.append(line[item.end():].strip())
+            elif steps and (not after_blank or line_indent > indent):
+                steps[-1] = f"{steps[-1]} {line.strip()}"
+            elif steps:
+                # text after a blank line ends the list
+                _close()
+                steps, indent = [], None
+            after_blank = False
+        _close()
+        return [(is_numbered, list_steps) for is_numbered, list_steps in lists if list_steps]
+
+    def get_format_instructions(self) -> str:
+        """
+        Provide formatting instructions for the model's output.
+        """
+        return "Output the reasoning flow as a numbered list, one step per line."
+
+    @property
+    def _type(self) -> str:
+        """
+        Return the type of this parser.
+        """
+        return "ReasoningFlowParser"
+
+
+if __name__ == "__main__":
+    parser = ReasoningFlowOutputParser()
+    print(parser.parse("Optimized flow:\n1. Observe the recurrence\n2. Derive the general term"))
+    print(parser.parse('```json\n["Observe the recurrence", "Derive the general term"]\n```'))
+    print(split_step_dependencies(["Case x > 0 (depends on: none)", "Case x < 0 (depends on: none)", "Combine (depends on: 1, 2)"]))
@@ -1,5 +1,7 @@
 from ReasonFlux.agent.parser.think_answer_parser import ThinkAnswerOutputParser
+from ReasonFlux.agent.parser.reasoning_flow_parser import ReasoningFlowOutputParser
 from langchain_core.output_parsers import JsonOutputParser
 
 think_answer_parser = ThinkAnswerOutputParser()
-json_parser = JsonOutputParser()
\ No newline at end of file
+json_parser = JsonOutputParser()
+reasoning_flow_parser = ReasoningFlowOutputParser()
\ No newline at end of file
@@ -0,0 +1,81 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+# The rough prompt size estimate used for rate limiting, see `BaseAgent.run`.
+CHARS_PER_TOKEN = 4
+
+EXAMPLE_FIELD = "example_application"
+TRUNCATION_MARK = "..."
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _truncate(value: Any, max_chars: int) -> Any:
+    """
+    Shorten `value` until its compact JSON fits in `max_chars`, keeping its structure:
+    strings are cut, lists keep their leading items, and dicts shrink their largest value first.
+    """
+    if len(_dumps(value)) <= max_chars:
+        return value
+    if isinstance(value, str):
+        return value[:max(max_chars - 2 - len(TRUNCATION_MARK), 0)] + TRUNCATION_MARK
+    if isinstance(value, list):
+        kept: List[Any] = []
+        for item in value:
+            if len(_dumps(kept + [item, TRUNCATION_MARK])) > max_chars:
+                break
+            kept.append(item)
+        return kept + [TRUNCATION_MARK]
+    if isinstance(value, dict):
+        result = dict(value)
+        while (overflow := len(_dumps(result)) - max_chars) > 0:
+            key = max(result, key=lambda k: len(_dumps(result[k])))
+            size = len(_dumps(result[key]))
+            shortened = _truncate(result[key], size - overflow)
+            if len(_dumps(shortened)) >= size:
+                break
+            result[key] = shortened
+        return result
+    return value
+
+
+class TemplateProjection(BaseModel):
+    """
+    Selects and serializes the template fields the Navigator sends to the model in Step3.
+
+    The defaults send the whole template as indented JSON. `fields` keeps only the listed
+    fields, `compact` drops the indentation and keeps non-ASCII characters unescaped, and
+    `max_example_tokens` cuts `example_application` to an estimated token budget, dropping
+    trailing solution steps before shortening text.
+
+    Attributes:
+        fields (List[str], optional): Template fields sent to the model, in order, None for all of them.
+        compact (bool): Whether to serialize without indentation and ASCII escapes.
+        max_example_tokens (int, optional): Estimated token budget of the worked example, None for no limit.
+    """
+    fields: Optional[List[str]] = Field(None, description="Template fields sent to the model, in order, None for all of them")
+    compact: bool = Field(False, description="Whether to serialize without indentation and ASCII escapes")
+    max_example_tokens: Optional[int] = Field(None, description="Estimated token budget of the worked example, None for no limit")
+
+    def project(self, template: Dict[str, Any]) -> Dict[str, Any]:
+        if self.fields is None:
+            projected = dict(template)
+        else:
+            projected = {field: template[field] for field in self.fields if field in template}
+        if self.max_example_tokens is not None and EXAMPLE_FIELD in projected:
+            projected[EXAMPLE_FIELD] = _truncate(projected[EXAMPLE_FIELD], self.max_example_tokens * CHARS_PER_TOKEN)
+        return projected
+
+    def serialize(self, template: Dict[str, Any]) -> str:
+        projected = self.project(template)
+        if self.compact:
+            return _dumps(projected)
+        return json.dumps(projected, indent=2)
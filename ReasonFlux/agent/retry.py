@@ -0,0 +1,201 @@
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Literal, Optional, Tuple
+
+import openai
+from langchain_core.exceptions import OutputParserException
+from pydantic import BaseModel, Field, PrivateAttr
+
+
+class AgentCallError(RuntimeError):
+    """Raised when an agent call fails after its attempt budget is exhausted."""
+
+
+class CircuitOpenError(AgentCallError):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+# Transient provider failures: worth retrying after a pause.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    openai.ConflictError,
+)
+
+# The provider answered, but not in the expected shape: worth re-sampling at once.
+PARSE_ERRORS = (
+    OutputParserException,
+    json.JSONDecodeError,
+)
+
+
+def classify_error(error: Exception) -> Literal["retryable", "parse", "fatal"]:
+    """
+    Classify an exception raised by an agent step.
+
+    Args:
+        error (Exception): The exception raised by the step.
+
+    Returns:
+        str: "retryable" for transient provider errors, "parse" for malformed model output,
+        and "fatal" for everything else (authentication, bad requests, bugs).
+    """
+    if isinstance(error, RETRYABLE_ERRORS):
+        return "retryable"
+    if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+        return "retryable"
+    if isinstance(error, PARSE_ERRORS):
+        return "parse"
+    return "fatal"
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """
+    Read the delay requested by the provider from the `retry-after-ms` or `retry-after` header.
+
+    Args:
+        error (Exception): The exception raised by the step.
+
+    Returns:
+        float | None: The delay in seconds, or None if the provider did not ask for one.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(float(retry_after_ms) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy(BaseModel):
+    """
+    Backoff policy applied by `BaseAgent.run` between attempts of a single call.
+
+    Attributes:
+        initial_backoff (float): Delay before the first retry, in seconds.
+        max_backoff (float): Upper bound of the computed delay, in seconds.
+        backoff_multiplier (float): Growth factor of the delay between attempts.
+        jitter (float): Fraction of the delay that is randomized, 1.0 is full jitter.
+        max_retry_after (float): Upper bound of a delay requested by the provider, in seconds.
+        max_parse_retries (int): How many times malformed output is re-sampled within one call.
+        failure_threshold (int): Consecutive transient failures that open the circuit breaker.
+        reset_timeout (float): Seconds the circuit stays open before a trial call is let through.
+    """
+    initial_backoff: float = Field(1.0, description="Delay before the first retry, in seconds")
+    max_backoff: float = Field(30.0, description="Upper bound of the computed delay, in seconds")
+    backoff_multiplier: float = Field(2.0, description="Growth factor of the delay between attempts")
+    jitter: float = Field(1.0, description="Fraction of the delay that is randomized, 1.0 is full jitter")
+    max_retry_after: float = Field(120.0, description="Upper bound of a delay requested by the provider, in seconds")
+    max_parse_retries: int = Field(2, description="How many times malformed output is re-sampled within one call")
+    failure_threshold: int = Field(5, description="Consecutive transient failures that open the circuit breaker")
+    reset_timeout: float = Field(30.0, description="Seconds the circuit stays open before a trial call is let through")
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Compute the delay before the next attempt.
+
+        Args:
+            attempt (int): Number of attempts already made for this call, starting at 1.
+            retry_after (float, optional): Delay requested by the provider, which takes precedence.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        delay = min(self.max_backoff, self.initial_backoff * self.backoff_multiplier ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker(BaseModel):
+    """
+    Circuit breaker shared by every agent that talks to the same endpoint and model.
+
+    The circuit opens after `failure_threshold` consecutive transient failures. While open,
+    calls are rejected without reaching the provider. After `reset_timeout` seconds a single
+    trial call is let through (half-open); its outcome closes or re-opens the circuit.
+
+    Attributes:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds before a trial call is let through.
+        state (str): One of "closed", "open" or "half_open".
+        failures (int): Current number of consecutive failures.
+        opened_at (float): Monotonic time at which the circuit last opened.
+    """
+    failure_threshold: int = Field(5, description="Consecutive failures that open the circuit")
+    reset_timeout: float = Field(30.0, description="Seconds before a trial call is let through")
+    state: Literal["closed", "open", "half_open"] = Field("closed", description="State of the circuit")
+    failures: int = Field(0, description="Current number of consecutive failures")
+    opened_at: float = Field(0.0, description="Monotonic time at which the circuit last opened")
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def allow(self) -> bool:
+        """Return whether a call may be sent to the provider now."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+_circuit_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(base_url: str, model: str, policy: RetryPolicy) -> CircuitBreaker:
+    """
+    Return the process-wide circuit breaker for an endpoint and model, creating it if needed.
+
+    Args:
+        base_url (str): The API base URL.
+        model (str): The model name.
+        policy (RetryPolicy): The policy providing the breaker thresholds on creation.
+
+    Returns:
+        CircuitBreaker: The shared circuit breaker.
+    """
+    key = (base_url, model)
+    with _circuit_breakers_lock:
+        if key not in _circuit_breakers:
+            _circuit_breakers[key] = CircuitBreaker(
+                failure_threshold=policy.failure_threshold,
+                reset_timeout=policy.reset_timeout
+            )
+        return _circuit_breakers[key]
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from pydantic_yaml import parse_yaml_file_as
-from typing import Literal
+from typing import Any, Dict, List, Literal, Optional
 
 class YamlSettings(BaseModel):
     @classmethod
@@ -11,6 +11,11 @@ class YamlSettings(BaseModel):
         return parse_yaml_file_as(cls, yaml_file)
 
 
+class HTTPPoolSettings(YamlSettings):
+    max_connections: int = Field(100, description="Maximum number of concurrent connections")
+    max_keepalive_connections: int = Field(20, description="Maximum number of idle keep-alive connections")
+    keepalive_expiry: float = Field(30.0, description="Seconds an idle connection is kept alive")
+
 class LLMSettings(YamlSettings):
     model: str = Field(..., description="Model Name")
     base_url: str = Field(..., description="API base URL")
@@ -18,25 +23,150 @@ class LLMSettings(YamlSettings):
     max_tokens: int = Field(4096, description="Maximum number of tokens per request")
     temperature: float = Field(1.0, description="Sampling temperature")
     timeout:float = Field(60.0, description="Timeout in seconds")
-    max_retries: int = Field(3, description="Maximum number of retries")
     
     enable_vision:bool = Field(False, description="Enable vision")
     enable_function_calling:bool = Field(False, description="Enable function calling")
     enable_json_output:bool = Field(False, description="Enable JSON output")
+    http_pool: HTTPPoolSettings = Field(default_factory=HTTPPoolSettings, description="Shared HTTP connection pool")
+
+class StageLLMSettings(YamlSettings):
+    model: Optional[str] = Field(None, description="Model Name, defaults to the agent's model")
+    base_url: Optional[str] = Field(None, description="API base URL, defaults to the agent's base URL")
+    api_key: Optional[str] = Field(None, description="API key, defaults to the agent's API key")
+    max_tokens: Optional[int] = Field(None, description="Maximum number of tokens per request")
+    temperature: Optional[float] = Field(None, description="Sampling temperature")
+    timeout: Optional[float] = Field(None, description="Timeout in seconds")
+
+class RetrySettings(YamlSettings):
+    initial_backoff: float = Field(1.0, description="Delay before the first retry, in seconds")
+    max_backoff: float = Field(30.0, description="Upper bound of the computed delay, in seconds")
+    backoff_multiplier: float = Field(2.0, description="Growth factor of the delay between attempts")
+    jitter: float = Field(1.0, description="Fraction of the delay that is randomized, 1.0 is full jitter")
+    max_retry_after: float = Field(120.0, description="Upper bound of a delay requested by the provider, in seconds")
+    max_parse_retries: int = Field(2, description="How many times malformed output is re-sampled within one call")
+    failure_threshold: int = Field(5, description="Consecutive transient failures that open the circuit breaker")
+    reset_timeout: float = Field(30.0, description="Seconds the circuit stays open before a trial call is let through")
+
+class TemplateProjectionSettings(YamlSettings):
+    fields: Optional[List[str]] = Field(None, description="Template fields sent to the model in Step3, None for all of them")
+    compact: bool = Field(False, description="Serialize the template without indentation and ASCII escapes")
+    max_example_tokens: Optional[int] = Field(None, description="Estimated token budget of the worked example, None for no limit")
 
 class AgentSettings(YamlSettings):
     name: str = Field(..., description="Unique name of the agent")
     description: str = Field(..., description="Description of the agent")
     type: Literal["inference", "navigator"] = Field(..., description="Type of agent")
-    max_steps: int = Field(10, description="Maximum number of steps")
+    max_steps: int = Field(10, description="Maximum number of attempts for a single call")
     llm: LLMSettings = Field(..., description="LLM settings")
+    stages: Dict[str, StageLLMSettings] = Field(default_factory=dict, description="Per-method overrides of the LLM settings")
+    retry: RetrySettings = Field(default_factory=RetrySettings, description="Retry and circuit breaker settings")
+    prompt_layout: Literal["default", "stable_prefix"] = Field("default", description="Message layout of the multi-turn Step4 prompts")
+    template_projection: Optional[TemplateProjectionSettings] = Field(None, description="Projection of the retrieved template in Step3, navigator only")
+
+class EmbeddingBatchSettings(YamlSettings):
+    max_wait_ms: float = Field(5.0, description="How long the first text of a batch waits for others, in milliseconds")
+    max_batch: int = Field(64, description="Number of texts that sends a batch at once")
 
 class EmbeddingSettings(YamlSettings):
     model: str = Field(..., description="Model Name")
     api_key: str = Field(..., description="API key")
     api_base: str = Field(..., description="API base URL")
     provider: Literal["openai", "jina"] = Field(..., description="Embedding provider")
+    http_pool: HTTPPoolSettings = Field(default_factory=HTTPPoolSettings, description="Shared HTTP connection pool")
+    batching: Optional[EmbeddingBatchSettings] = Field(None, description="Micro-batching of concurrent encode calls, None disables it")
+    max_request_texts: Optional[int] = Field(None, description="Most texts sent in one embedding request, None for no limit")
+
+class IndexSettings(YamlSettings):
+    space: Literal["l2", "cosine", "ip"] = Field("l2", description="Distance space of the level's collections")
+    M: Optional[int] = Field(None, description="Links per node of the HNSW graph, None for chroma's default")
+    construction_ef: Optional[int] = Field(None, description="Candidate list size while building, None for chroma's default")
+    search_ef: Optional[int] = Field(None, description="Candidate list size while searching, None for chroma's default")
 
 class HierarchicalDataBaseSettings(YamlSettings):
     data_dir: str = Field(..., description="Data directory")
-    embedding_service: EmbeddingSettings = Field(..., description="Embedding service")
\ No newline at end of file
+    embedding_service: EmbeddingSettings = Field(..., description="Embedding service")
+    shard_by_category: bool = Field(False, description="Split the levels below the first into one collection per level-0 node")
+    index_per_level: List[IndexSettings] = Field(default_factory=list, description="Distance space and HNSW parameters per level, the last one applying to deeper levels")
+    tag_mode: Literal["off", "filter", "boost"] = Field("off", description="How the Navigator's Examined Knowledge tags narrow the leaf search")
+    tag_boost: float = Field(0.1, description="Similarity added to a leaf carrying every query tag in boost mode")
+    max_tag_candidates: int = Field(256, description="Largest number of leaves a tag may carry and still be used")
+
+class SemanticCacheSettings(YamlSettings):
+    collection_name: str = Field("solved_problems", description="Name of the cache collection in the hierarchical database")
+    similarity_threshold: float = Field(0.95, description="Minimum cosine similarity (0-1) for reusing a similar problem's plan")
+
+class TrajectoryStoreSettings(YamlSettings):
+    data_dir: str = Field(..., description="Directory holding the segments and the index")
+    segment_bytes: int = Field(64 * 1024 * 1024, description="Size after which a new segment is started")
+    compression_level: int = Field(10, description="zstd compression level")
+
+class CheckpointStoreSettings(YamlSettings):
+    data_dir: str = Field(..., description="Directory holding checkpoints.sqlite3")
+
+class RateLimitSettings(YamlSettings):
+    base_url: str = Field(..., description="API base URL of the LLM or embedding endpoint")
+    model: str = Field(..., description="Model Name")
+    requests_per_minute: Optional[float] = Field(None, description="Request limit, None for no limit")
+    tokens_per_minute: Optional[float] = Field(None, description="Token limit, None for no limit")
+    burst_seconds: float = Field(60.0, description="Seconds' worth of the limits that may be used at once")
+
+class SchedulerSettings(YamlSettings):
+    coalesce: bool = Field(True, description="Whether identical in-flight calls share one provider call")
+    limits: List[RateLimitSettings] = Field(default_factory=list, description="Rate limits per endpoint and model")
+
+class LoggingSettings(YamlSettings):
+    level: str = Field("INFO", description="Level of the ReasonFlux logger")
+    format: Literal["text", "json"] = Field("text", description="Plain text or one JSON object per record")
+    color: bool = Field(False, description="Color text output by level, for interactive use")
+    asynchronous: bool = Field(False, description="Format and write records on a background thread")
+    max_field_chars: int = Field(2000, description="Truncate structured fields longer than this, 0 disables")
+    sample_rate: float = Field(1.0, description="Fraction of INFO and DEBUG records that keep their structured fields")
+
+class ServerSettings(YamlSettings):
+    host: str = Field("0.0.0.0", description="Host to bind")
+    port: int = Field(8000, description="Port to bind")
+    workers: int = Field(4, description="Number of pipelines, i.e. problems solved concurrently")
+    queue_size: int = Field(16, description="Solve requests allowed to wait for a pipeline, more are rejected with 429")
+    search_workers: int = Field(4, description="Search requests run concurrently, more wait in the queue")
+    default_deadline: float = Field(300.0, description="Deadline of a request that sets none, in seconds")
+    max_deadline: float = Field(900.0, description="Upper bound of a requested deadline, in seconds")
+    retry_after: float = Field(1.0, description="Retry-After header sent with 429 responses, in seconds")
+    latency_window: int = Field(1000, description="Number of recent requests the latency metrics are computed over")
+    navigator_config_path: str = Field(..., description="Navigator agent configuration file")
+    inference_config_path: str = Field(..., description="Inference agent configuration file")
+    hierarchical_database_config_path: str = Field(..., description="HierarchicalVectorDatabase configuration file")
+    trajectory_store_config_path: Optional[str] = Field(None, description="TrajectoryStore configuration file")
+    semantic_cache_config_path: Optional[str] = Field(None, description="SemanticCache configuration file")
+    checkpoint_store_config_path: Optional[str] = Field(None, description="CheckpointStore configuration file")
+    options: Dict[str, Any] = Field(default_factory=dict, description="Other ReasonFlux fields, e.g. fast_path")
+
+class StagedSettings(YamlSettings):
+    step1_workers: int = Field(4, description="Step1 (trajectory) workers, each with agents of its own")
+    step2_workers: int = Field(1, description="Step2 (hierarchical search) workers, each searching a batch of problems at a time")
+    step2_batch_size: int = Field(32, description="Problems searched together by a Step2 worker at most")
+    step2_max_wait_ms: float = Field(20.0, description="How long a Step2 worker waits to fill a batch, in milliseconds")
+    step3_workers: int = Field(4, description="Step3 (adjustment) workers, each with agents of its own")
+    step4_workers: int = Field(8, description="Step4 (iterations) workers, each with agents of its own")
+    queue_size: int = Field(64, description="Problems waiting in front of each stage, submitting blocks beyond this")
+    navigator_config_path: str = Field(..., description="Navigator agent configuration file")
+    inference_config_path: str = Field(..., description="Inference agent configuration file")
+    hierarchical_database_config_path: str = Field(..., description="HierarchicalVectorDatabase configuration file")
+    trajectory_store_config_path: Optional[str] = Field(None, description="TrajectoryStore configuration file")
+    checkpoint_store_config_path: Optional[str] = Field(None, description="CheckpointStore configuration file")
+    options: Dict[str, Any] = Field(default_factory=dict, description="Other ReasonFlux fields, e.g. fast_path")
+
+class WorkQueueSettings(YamlSettings):
+    data_dir: str = Field(..., description="Directory holding queue.sqlite3, shared by every node")
+    lease_seconds: float = Field(300.0, description="How long a lease lasts without a heartbeat")
+    max_attempts: int = Field(3, description="Leases of a problem before it is given up as failed")
+
+class DistributedSettings(YamlSettings):
+    queue: WorkQueueSettings = Field(..., description="The shared work queue")
+    pipelines: int = Field(4, description="Problems a worker process solves concurrently, each with agents of its own")
+    poll_seconds: float = Field(1.0, description="How long an idle worker waits before leasing again")
+    navigator_config_path: str = Field(..., description="Navigator agent configuration file")
+    inference_config_path: str = Field(..., description="Inference agent configuration file")
+    hierarchical_database_config_path: str = Field(..., description="HierarchicalVectorDatabase configuration file")
+    trajectory_store_config_path: Optional[str] = Field(None, description="TrajectoryStore configuration file")
+    checkpoint_store_config_path: Optional[str] = Field(None, description="CheckpointStore configuration file")
+    options: Dict[str, Any] = Field(default_factory=dict, description="Other ReasonFlux fields, e.g. fast_path")
@@ -0,0 +1,249 @@
+import sys, os
+import argparse
+import json
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+sys.path.append(os.getcwd())
+from ReasonFlux.config import DistributedSettings
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.storage import WorkQueue
+from ReasonFlux.utils.client import initialize_agent
+from ReasonFlux.utils.common import get_uuid, logger
+
+
+class QueueWorker(BaseModel):
+    """
+    Solves the problems of a `WorkQueue`, one per pipeline at a time.
+
+    Each pipeline runs in its own thread and leases one problem at a time, so a worker
+    holds at most as many leases as it has pipelines, and throughput grows with the number
+    of workers leasing from the same queue, on this node or others. A heartbeat thread
+    renews the leases of the problems in flight every third of `lease_seconds`; if the
+    worker dies, only those problems are leased again, once their leases run out.
+
+    The job id is used as the run id, so with a checkpoint store a problem leased again
+    resumes from its last checkpoint instead of starting over. A run that raises is given
+    back to the queue and retried until `max_attempts`; a run without a search result is
+    stored as a None result.
+
+    Attributes:
+        queue (WorkQueue): The queue to lease from.
+        pipelines (List[ReasonFlux]): One pipeline per concurrently solved problem.
+        worker_id (str): Name of the worker in the queue, unique across nodes.
+        poll_seconds (float): How long an idle pipeline waits before leasing again.
+        stats (Dict[str, int]): Number of problems completed, resumed, failed and lost to another worker.
+    """
+    queue: WorkQueue = Field(..., description="The queue to lease from")
+    pipelines: List[ReasonFlux] = Field(..., description="One pipeline per concurrently solved problem")
+    worker_id: str = Field(
+        default_factory=lambda: f"{socket.gethostname()}-{os.getpid()}-{get_uuid()[:8]}",
+        description="Name of the worker in the queue, unique across nodes"
+    )
+    poll_seconds: float = Field(1.0, description="How long an idle pipeline waits before leasing again")
+    stats: Dict[str, int] = Field(
+        default_factory=lambda: {"completed": 0, "resumed": 0, "failed": 0, "lost": 0},
+        description="Number of problems completed, resumed, failed and lost to another worker"
+    )
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _in_flight: Dict[str, str] = PrivateAttr(default_factory=dict)
+    _stop: threading.Event = PrivateAttr(default_factory=threading.Event)
+    _stop_heartbeat: threading.Event = PrivateAttr(default_factory=threading.Event)
+
+    class Config:
+        arbitrary_types_allowed: bool = True
+
+    @model_validator(mode="after")
+    def check_pipelines(self) -> "QueueWorker":
+        if not self.pipelines:
+            raise ValueError("A queue worker needs at least one pipeline")
+        return self
+
+    @classmethod
+    def from_settings(cls, settings: DistributedSettings, worker_id: Optional[str] = None) -> "QueueWorker":
+        """
+        Build `settings.pipelines` pipelines. The first one loads the database and stores from
+        their configuration files, the others share them and only get agents of their own.
+        """
+        first = ReasonFlux(
+            navigator_config_path=settings.navigator_config_path,
+            inference_config_path=settings.inference_config_path,
+            hierarchical_database_config_path=settings.hierarchical_database_config_path,
+            trajectory_store_config_path=settings.trajectory_store_config_path,
+            checkpoint_store_config_path=settings.checkpoint_store_config_path,
+            **settings.options
+        )
+        pipelines = [first] + [
+            ReasonFlux(
+                navigator=initialize_agent(settings.navigator_config_path),
+                inference=initialize_agent(settings.inference_config_path),
+                hierarchical_database=first.hierarchical_database,
+                trajectory_store=first.trajectory_store,
+                checkpoint_store=first.checkpoint_store,
+                **settings.options
+            )
+            for _ in range(settings.pipelines - 1)
+        ]
+        return cls(
+            queue=WorkQueue(**settings.queue.model_dump()),
+            pipelines=pipelines,
+            poll_seconds=settings.poll_seconds,
+            **({"worker_id": worker_id} if worker_id else {})
+        )
+
+    def run(self, exit_when_empty: bool = True) -> Dict[str, int]:
+        """
+        Solve problems until the queue has none left to lease, or until `stop` with
+        `exit_when_empty=False`.
+
+        A pipeline exits when nothing can be leased and no problem is pending or leased,
+        so it keeps waiting while other workers may still give problems back.
+
+        Returns:
+            Dict[str, int]: The worker's stats.
+        """
+        self._stop.clear()
+        self._stop_heartbeat.clear()
+        heartbeat = threading.Thread(target=self._heartbeat, name=f"{self.worker_id}-heartbeat", daemon=True)
+        heartbeat.start()
+        threads = [
+            threading.Thread(target=self._work, args=(pipeline, exit_when_empty), name=f"{self.worker_id}-{index}")
+            for index, pipeline in enumerate(self.pipelines)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            # the leases are renewed until the last problem in flight is finished
+            self._stop.set()
+            self._stop_heartbeat.set()
+            heartbeat.join()
+        logger.info("Worker %s finished", self.worker_id, extra={"stats": self.stats})
+        return self.stats
+
+    def stop(self) -> None:
+        """
+        Stop leasing; the problems in flight are finished first, their leases still renewed.
+        """
+        self._stop.set()
+
+    def _heartbeat(self) -> None:
+        while not self._stop_heartbeat.wait(self.queue.lease_seconds / 3):
+            with self._lock:
+                job_ids = list(self._in_flight)
+            try:
+                self.queue.heartbeat(self.worker_id, job_ids)
+            except Exception as e:
+                logger.warning("Worker %s could not renew its leases: %s: %s", self.worker_id, type(e).__name__, e)
+
+    def _work(self, pipeline: ReasonFlux, exit_when_empty: bool) -> None:
+        while not self._stop.is_set():
+            leased = self.queue.lease(self.worker_id)
+            if not leased:
+                counts = self.queue.counts()
+                if exit_when_empty and counts["pending"] == 0 and counts["leased"] == 0:
+                    return
+                self._stop.wait(self.poll_seconds)
+                continue
+            self._solve(pipeline, leased[0])
+
+    def _solve(self, pipeline: ReasonFlux, job: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+        with self._lock:
+            self._in_flight[job_id] = job["problem"]
+        try:
+            checkpoint = pipeline.checkpoint_store.load(job_id) if pipeline.checkpoint_store is not None else None
+            if checkpoint is not None:
+                logger.info("Job %s was started before, resuming it after %s", job_id, checkpoint["stage"])
+                with self._lock:
+                    self.stats["resumed"] += 1
+                result = pipeline.resume(job_id)
+            else:
+                result = pipeline.run(job["problem"], run_id=job_id)
+        except Exception as e:
+            status = self.queue.fail(job_id, self.worker_id, f"{type(e).__name__}: {e}")
+            logger.warning(
+                "Job %s failed on attempt %d: %s: %s", job_id, job["attempts"], type(e).__name__, e,
+                extra={"status": status}
+            )
+            with self._lock:
+                self.stats["failed" if status is not None else "lost"] += 1
+        else:
+            stored = self.queue.complete(job_id, self.worker_id, result)
+            with self._lock:
+                self.stats["completed" if stored else "lost"] += 1
+            if not stored:
+                logger.warning("Job %s was leased by another worker, its result is discarded", job_id)
+        finally:
+            with self._lock:
+                del self._in_flight[job_id]
+
+
+def coordinate(queue: WorkQueue, problems: List[str], batch: str, output: str, poll_seconds: float = 5.0) -> Dict[str, int]:
+    """
+    Enqueue `problems` as `batch`, wait until every one is done or failed, and write the
+    results to `output` as JSONL, in input order.
+
+    Returns:
+        Dict[str, int]: The final counts per status.
+    """
+    queue.enqueue(problems, batch)
+    while True:
+        counts = queue.counts(batch)
+        if counts["pending"] == 0 and counts["leased"] == 0:
+            break
+        logger.info("Batch %s: %d pending, %d leased, %d done, %d failed", batch,
+                    counts["pending"], counts["leased"], counts["done"], counts["failed"])
+        time.sleep(poll_seconds)
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        for job in queue.results(batch):
+            if job["status"] == "done":
+                record = job["result"] if job["result"] is not None else {"problem": job["problem"], "result": None}
+            else:
+                record = {"problem": job["problem"], "error": job["error"]}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return counts
+
+
+def config() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Solve a file of problems with workers leasing from a shared queue")
+    parser.add_argument("--config", type=str, default="ReasonFlux/config/distributed/distributed.yaml", help="Distributed execution configuration file")
+    parser.add_argument("--role", type=str, choices=["coordinator", "worker"], required=True, help="Enqueue and collect a batch, or solve problems")
+    parser.add_argument("--input", type=str, default=None, help="Coordinator: JSONL file with a \"problem\" field per line")
+    parser.add_argument("--output", type=str, default=None, help="Coordinator: JSONL file the results are written to, in input order")
+    parser.add_argument("--batch", type=str, default=None, help="Coordinator: name of the batch, defaults to the input file name; an edited input needs a new one")
+    parser.add_argument("--worker_id", type=str, default=None, help="Worker: name in the queue, defaults to host, pid and a random suffix")
+    parser.add_argument("--keep_running", action="store_true", help="Worker: wait for new problems instead of exiting once the queue is empty")
+    return parser.parse_args()
+
+
+def main():
+    args = config()
+    settings = DistributedSettings.from_yaml(args.config)
+    if args.role == "coordinator":
+        if not args.input or not args.output:
+            raise ValueError("The coordinator needs --input and --output")
+        with open(args.input, "r") as f:
+            problems = [json.loads(line)["problem"] for line in f if line.strip()]
+        batch = args.batch or os.path.splitext(os.path.basename(args.input))[0]
+        queue = WorkQueue(**settings.queue.model_dump())
+        counts = coordinate(queue, problems, batch, args.output, settings.poll_seconds)
+        logger.info("Batch %s finished", batch, extra={"counts": counts})
+        queue.close()
+    else:
+        worker = QueueWorker.from_settings(settings, args.worker_id)
+        worker.run(exit_when_empty=not args.keep_running)
+        worker.queue.close()
+
+if __name__ == "__main__":
+    main()
+# python ReasonFlux/distributed.py --role coordinator --input problems.jsonl --output output/distributed.jsonl
+# python ReasonFlux/distributed.py --role worker   # on every node, as many processes as wanted
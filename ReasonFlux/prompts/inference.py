@@ -2,11 +2,37 @@ from langchain_core.prompts import ChatPromptTemplate
 
 # modify the prompt to ensure that <think></think> tags are used in every response to describe the thought process.
 # additionally, require the final answer to be formatted with \boxed{} to enhance the clarity and standardization of the solution.
-INTERPLAY_PROMPT = ChatPromptTemplate(
-    [
-        (
-            "system",
-            "Now you are a student who is interacting with your tutor. Your teacher will gradually guide you to solve a problem.\n\n**It is mandatory to use <think></think> tags in every response to describe your thought process and reasoning.** This helps track your understanding and ensures a clear solution process. After completing all steps, please provide the final answer in the format of \\boxed{{answer}}. For example, if the final answer is 5, you should write it as \\boxed{{5}}. Please follow these instructions carefully.\n\nProblem:\n{problem}"
-        )
-    ]
-)
\ No newline at end of file
+INTERPLAY_SYSTEM = (
+    "Now you are a student who is interacting with your tutor. Your teacher will gradually guide you to solve a problem.\n\n"
+    "**It is mandatory to use <think></think> tags in every response to describe your thought process and reasoning.** "
+    "This helps track your understanding and ensures a clear solution process. "
+    "After completing all steps, please provide the final answer in the format of \\boxed{{answer}}. "
+    "For example, if the final answer is 5, you should write it as \\boxed{{5}}. "
+    "{early_exit}"
+    "Please follow these instructions carefully."
+)
+
+# used by the "flag" early-exit policy: the student marks a verified final answer so the remaining steps can be skipped.
+INTERPLAY_EARLY_EXIT = (
+    "If your response already gives the final answer in \\boxed{{}} and you have verified it, so that any "
+    "remaining steps could only restate it, end your response with the line [FINAL ANSWER VERIFIED]. "
+)
+
+PROBLEM_SECTION = "Problem:\n{problem}"
+
+
+def _interplay_prompt(early_exit: bool, stable_prefix: bool) -> ChatPromptTemplate:
+    """
+    The interplay prompt, with the early-exit instruction or not. The "stable_prefix" layout
+    sends the problem as the first turn, so the system message is the same for every problem.
+    """
+    system = INTERPLAY_SYSTEM.replace("{early_exit}", INTERPLAY_EARLY_EXIT if early_exit else "")
+    if stable_prefix:
+        return ChatPromptTemplate([("system", system), ("human", PROBLEM_SECTION)])
+    return ChatPromptTemplate([("system", f"{system}\n\n{PROBLEM_SECTION}")])
+
+
+INTERPLAY_PROMPT = _interplay_prompt(early_exit=False, stable_prefix=False)
+INTERPLAY_EARLY_EXIT_PROMPT = _interplay_prompt(early_exit=True, stable_prefix=False)
+INTERPLAY_STABLE_PROMPT = _interplay_prompt(early_exit=False, stable_prefix=True)
+INTERPLAY_EARLY_EXIT_STABLE_PROMPT = _interplay_prompt(early_exit=True, stable_prefix=True)
@@ -65,4 +65,32 @@ Problem:
 {problem}"""
         )
     ]
-)
\ No newline at end of file
+)
+
+# the "stable_prefix" layout: the system message is the same for every problem, the problem is the
+# first turn, and each step is asked for in a turn that stays in the history unchanged
+INITIALIZE_REASON_PROBLEM_STABLE_PROMPT = ChatPromptTemplate(
+    [
+        (
+            "system",
+            """You are a math tutor guiding a student to solve a math problem step by step.
+Your task is to help your student to learn how to apply the steps to solve the problem.
+For each step you are given, and based on the problem description and the student's responses to the previous steps, give a clear and high-level instruction for your student to help them apply the method in the current step to solve the problem."""
+        ),
+        (
+            "human",
+            """Problem:
+{problem}"""
+        )
+    ]
+)
+
+# appended to the trajectory building and adjustment prompts when the Navigator emits step dependencies
+STEP_DEPENDENCY_PROMPT = ChatPromptTemplate(
+    [
+        (
+            "system",
+            """Some steps of the reasoning flow may not need each other, for example when two cases are analysed or two quantities are computed separately. End every step of the reasoning flow with the numbers of the earlier steps it needs, as "(depends on: 1, 2)", or with "(depends on: none)" if it can be carried out without any earlier step."""
+        )
+    ]
+)
@@ -1,14 +1,28 @@
 import json
-from pydantic import BaseModel, Field, model_validator
-from ReasonFlux.agent import Navigator, Inference
-from ReasonFlux.template_matcher import HierarchicalVectorDatabase
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+from ReasonFlux.agent import EarlyExitPolicy, Navigator, Inference
+from ReasonFlux.storage import CheckpointStore, TrajectoryStore
+from ReasonFlux.template_matcher import HierarchicalVectorDatabase, SemanticCache
+from ReasonFlux.template_matcher.tag_index import query_tags
 from ReasonFlux.utils.client import (
     initialize_agent,
-    initialize_hierarchical_database
+    initialize_checkpoint_store,
+    initialize_hierarchical_database,
+    initialize_scheduler,
+    initialize_semantic_cache,
+    initialize_trajectory_store
 )
-from ReasonFlux.utils.common import logger
+from ReasonFlux.utils.common import get_uuid, logger
+from ReasonFlux.utils.scheduler import run_progress, set_run_progress
+from ReasonFlux.utils.tracing import span, trace_run
 from copy import deepcopy
-from typing import Dict, Any
+from typing import Dict, Any, List, Literal, Optional
+
+
+def _normalize_name(name: str) -> str:
+    return " ".join(str(name).split()).casefold()
 
 class ReasonFlux(BaseModel):
     """
@@ -22,9 +36,27 @@ class ReasonFlux(BaseModel):
         navigator_config_path (str): Path to the Navigator agent configuration file.
         inference_config_path (str): Path to the Inference agent configuration file.
         hierarchical_database_config_path (str): Path to the HierarchicalVectorDatabase configuration file.
+        trajectory_store_config_path (Optional[str]): Path to the TrajectoryStore configuration file, None disables the store.
+        semantic_cache_config_path (Optional[str]): Path to the SemanticCache configuration file, None disables the cache.
+        checkpoint_store_config_path (Optional[str]): Path to the CheckpointStore configuration file, None disables checkpoints.
+        scheduler_config_path (Optional[str]): Path to the call scheduler configuration file, None keeps the scheduler as it is.
         navigator (Navigator): The Navigator agent instance.
         inference (Inference): The Inference agent instance.
         hierarchical_database (HierarchicalVectorDatabase): The HierarchicalVectorDatabase instance.
+        trajectory_store (TrajectoryStore): The store every run result is appended to, if any.
+        semantic_cache (SemanticCache): The cache of solved problems, if any.
+        checkpoint_store (CheckpointStore): The store of run checkpoints, if any.
+        speculative_retrieval (bool): Whether to search the leaf level with the raw problem concurrently with Step1.
+        speculative_top_k (int): Number of leaf candidates kept by the speculative search.
+        speculation_stats (Dict[str, int]): How often the speculative search was attempted and used.
+        top_k_per_level (List[int]): Number of candidates kept at each level of the hierarchical search.
+        weight_per_level (List[float]): Weight of each level in the hierarchical similarity.
+        fast_path (bool): Whether to skip the Step3 adjustment when the retrieval is confident.
+        fast_path_similarity_threshold (float): Minimum normalized similarity for the fast path.
+        early_exit (EarlyExitPolicy): When Step4 may stop before the last step of the reasoning flow.
+        early_exit_stats (Dict[str, int]): How many runs exited early and how many LLM calls that saved.
+        parallel_steps (bool): Whether to run consecutive independent steps of the reasoning flow concurrently.
+        max_parallel_steps (int): Maximum number of steps run concurrently.
     """
     navigator_config_path: str = Field(
         default="config/navigator.yaml",
@@ -41,6 +73,26 @@ class ReasonFlux(BaseModel):
         description="The path to the hierarchical database configuration file"
     )
 
+    trajectory_store_config_path: Optional[str] = Field(
+        default=None,
+        description="The path to the trajectory store configuration file, None disables the store"
+    )
+
+    semantic_cache_config_path: Optional[str] = Field(
+        default=None,
+        description="The path to the semantic cache configuration file, None disables the cache"
+    )
+
+    checkpoint_store_config_path: Optional[str] = Field(
+        default=None,
+        description="The path to the checkpoint store configuration file, None disables checkpoints"
+    )
+
+    scheduler_config_path: Optional[str] = Field(
+        default=None,
+        description="The path to the call scheduler configuration file, rate limits and coalescing of LLM and embedding calls"
+    )
+
     navigator: Navigator = Field(
         default=None,
         description="The navigator agent"
@@ -56,6 +108,78 @@ class ReasonFlux(BaseModel):
         description="The hierarchical vector database"
     )
 
+    trajectory_store: TrajectoryStore = Field(
+        default=None,
+        description="The store every run result is appended to"
+    )
+
+    semantic_cache: SemanticCache = Field(
+        default=None,
+        description="The cache of solved problems"
+    )
+
+    checkpoint_store: CheckpointStore = Field(
+        default=None,
+        description="The store of run checkpoints"
+    )
+
+    speculative_retrieval: bool = Field(
+        default=False,
+        description="Whether to search the leaf level with the raw problem concurrently with Step1"
+    )
+
+    speculative_top_k: int = Field(
+        default=5,
+        description="Number of leaf candidates kept by the speculative search"
+    )
+
+    speculation_stats: Dict[str, int] = Field(
+        default_factory=lambda: {"attempts": 0, "hits": 0},
+        description="How often the speculative search was attempted and used"
+    )
+
+    top_k_per_level: List[int] = Field(
+        default=[1, 2, 3],
+        description="Number of candidates kept at each level of the hierarchical search"
+    )
+
+    weight_per_level: List[float] = Field(
+        default=[1, 0.1, 0.9],
+        description="Weight of each level in the hierarchical similarity"
+    )
+
+    fast_path: bool = Field(
+        default=False,
+        description="Whether to reuse the Step1 reasoning flow and skip the Step3 adjustment when the retrieval is confident"
+    )
+
+    fast_path_similarity_threshold: float = Field(
+        default=0.9,
+        description="Minimum normalized similarity (0-1) of the retrieved template for the fast path"
+    )
+
+    early_exit: EarlyExitPolicy = Field(
+        default_factory=EarlyExitPolicy,
+        description="When Step4 may stop before the last step of the reasoning flow"
+    )
+
+    early_exit_stats: Dict[str, int] = Field(
+        default_factory=lambda: {"exits": 0, "saved_llm_calls": 0},
+        description="How many runs exited Step4 early and how many LLM calls that saved"
+    )
+
+    parallel_steps: bool = Field(
+        default=False,
+        description="Whether to run consecutive steps of the reasoning flow that do not depend on each other concurrently"
+    )
+
+    max_parallel_steps: int = Field(
+        default=4,
+        description="Maximum number of steps run concurrently"
+    )
+
+    _executor: ThreadPoolExecutor = PrivateAttr(default=None)
+    _step_executor: ThreadPoolExecutor = PrivateAttr(default=None)
 
     @model_validator(mode="after")
     def initialize_reason_flux(self) -> "ReasonFlux":
@@ -65,9 +189,66 @@ class ReasonFlux(BaseModel):
             self.inference = initialize_agent(self.inference_config_path)
         if not self.hierarchical_database or not isinstance(self.hierarchical_database, HierarchicalVectorDatabase):
             self.hierarchical_database = initialize_hierarchical_database(self.hierarchical_database_config_path)
+        if self.trajectory_store is None and self.trajectory_store_config_path:
+            self.trajectory_store = initialize_trajectory_store(self.trajectory_store_config_path)
+        if self.semantic_cache is None and self.semantic_cache_config_path:
+            self.semantic_cache = initialize_semantic_cache(self.semantic_cache_config_path, self.hierarchical_database)
+        if self.checkpoint_store is None and self.checkpoint_store_config_path:
+            self.checkpoint_store = initialize_checkpoint_store(self.checkpoint_store_config_path)
+        if self.scheduler_config_path:
+            initialize_scheduler(self.scheduler_config_path)
         return self
+
+    def _start_speculation(self, problem: str) -> Future:
+        """
+        Start a leaf-level search on the raw problem text in the background.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix="ReasonFlux-speculation"
+            )
+        # run in a copy of the current context so the search is recorded in the run trace
+        return self._executor.submit(
+            contextvars.copy_context().run,
+            self.hierarchical_database.leaf_search,
+            problem,
+            self.speculative_top_k
+        )
+
+    def _resolve_speculation(self, speculation: Future, applied_method: str) -> List[Dict[str, Any]] | None:
+        """
+        Return the speculative candidate named by the Navigator, or None if there is none.
+        """
+        self.speculation_stats["attempts"] += 1
+        try:
+            candidates = speculation.result()
+        except Exception as e:
+            logger.warning("[Step2] Speculative search failed: %s", e)
+            return None
+
+        target = _normalize_name(applied_method)
+        for candidate in candidates or []:
+            if _normalize_name(candidate["doc"]) == target and candidate["meta_data"]["data"]:
+                self.speculation_stats["hits"] += 1
+                return [candidate]
+        return None
+
+    def _fast_path_gate(self, normalized_similarity: float, retrieved_template: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Decide whether Step3 can be skipped for the retrieved template, whose similarity is
+        on the 0-1 scale of `_accept_search`.
+        """
+        template_match = _normalize_name(retrieved_template.get("template_name", "")) == \
+            _normalize_name(self.navigator.template['Applied Method'])
+        return {
+            "template_match": template_match,
+            "normalized_similarity": normalized_similarity,
+            "threshold": self.fast_path_similarity_threshold,
+            "taken": template_match and normalized_similarity >= self.fast_path_similarity_threshold
+        }
     
-    def run(self, problem: str) -> Dict[str,Any] | None:
+    def run(self, problem: str, run_id: Optional[str] = None) -> Dict[str,Any] | None:
         """
         Run the ReasonFlux reasoning process for the given problem.
 
@@ -79,6 +260,20 @@ class ReasonFlux(BaseModel):
 
         Args:
             problem (str): The problem description to reason about.
+            run_id (Optional[str]): Id of the run for checkpointing, a new one is generated if not given.
+
+        Every step, LLM call, embedding call and vector query is traced, and the per-run
+        timing summary is attached to the result under "timing". With a trajectory store the
+        result is appended to it and its record id is returned under "trajectory_id".
+
+        With a semantic cache, an exact repeat of a solved problem returns the cached result,
+        and a problem similar enough to a solved one reuses its Step1 template and Step3
+        reasoning flow and only runs Step4. The outcome is reported under "cache", and
+        results of the full pipeline are added to the cache.
+
+        With a checkpoint store, the partial result and the Navigator state are saved under
+        "run_id" after every completed stage and Step4 iteration, so `resume` can continue
+        the run after a failure.
 
         Returns:
             Dict[str, Any] | None: A dictionary containing metadata about the reasoning process, or None if an error occurs.
@@ -86,97 +281,405 @@ class ReasonFlux(BaseModel):
         task_meta_data = {
             "problem": problem
         }
-        logger.info(f"Starting ReasonFlux with problem: \n{problem}\n")
+        if self.checkpoint_store is not None:
+            task_meta_data["run_id"] = run_id or get_uuid()
+        self.navigator.reset()
+        return self._execute(task_meta_data)
+
+    def resume(self, run_id: str) -> Dict[str,Any] | None:
+        """
+        Continue an interrupted run from its last completed stage or Step4 iteration.
+
+        Args:
+            run_id (str): The "run_id" of the run, as returned by `run` or listed by the checkpoint store.
+
+        Returns:
+            Dict[str, Any] | None: The result of the run, see `run`. A completed run's result is returned as stored.
+
+        Raises:
+            ValueError: If there is no checkpoint store.
+            KeyError: If the run has no checkpoint.
+        """
+        if self.checkpoint_store is None:
+            raise ValueError("Resuming a run needs a checkpoint store")
+        checkpoint = self.checkpoint_store.load(run_id)
+        if checkpoint is None:
+            raise KeyError(f"No checkpoint for run {run_id}")
+        if checkpoint["status"] == "completed":
+            return checkpoint["state"]["task_meta_data"]
 
-        logger.info(f"[Step1] Navigator initialize the reasoning trajectory")        
-        self.navigator.initializing_reasoning_trajectory(problem)
-        logger.info(f"[Step1] Navigator's reasoning thoughts: \n{self.navigator.reasoning_thoughts}\n")
-        logger.info(f"[Step1] Navigator give template: \n{self.navigator.template}\n")
+        logger.info("Resuming run %s after %s", run_id, checkpoint["stage"])
+        self.navigator.restore(checkpoint["state"]["navigator"])
+        return self._execute(checkpoint["state"]["task_meta_data"])
+
+    def _execute(self, task_meta_data: Dict[str, Any]) -> Dict[str,Any] | None:
+        try:
+            # the call scheduler serves the calls of runs closer to completion first
+            with run_progress(), trace_run() as run_trace:
+                result = self._run(task_meta_data)
+        except Exception as e:
+            if self.checkpoint_store is not None:
+                self.checkpoint_store.mark_failed(task_meta_data["run_id"], f"{type(e).__name__}: {e}")
+            raise
+
+        if result is None:
+            if self.checkpoint_store is not None:
+                self.checkpoint_store.mark_failed(task_meta_data["run_id"], "No search result found")
+            return None
+        return self._complete(result, run_trace.summary())
+
+    def _complete(self, result: Dict[str, Any], timing: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Attach the timing to a finished run, store it and mark its checkpoint completed.
+        """
+        result["timing"] = timing
+        if self.trajectory_store is not None:
+            result["trajectory_id"] = self.trajectory_store.append(result)
+        if self.semantic_cache is not None and result.get("cache", {}).get("kind") == "miss":
+            self.semantic_cache.add(result["problem"], result)
+        self._checkpoint(result, "completed", status="completed")
+        return result
+
+    def _checkpoint(self, task_meta_data: Dict[str, Any], stage: str, status: str = "running") -> None:
+        """
+        Save the partial result and the Navigator state after `stage`, if checkpointing is enabled.
+        """
+        if self.checkpoint_store is None:
+            return
+        self.checkpoint_store.save(
+            task_meta_data["run_id"],
+            task_meta_data["problem"],
+            stage,
+            {"task_meta_data": task_meta_data, "navigator": self.navigator.state()},
+            status=status
+        )
+
+    def _run(self, task_meta_data: Dict[str, Any]) -> Dict[str,Any] | None:
+        problem = task_meta_data["problem"]
+        logger.info("Starting ReasonFlux", extra={"problem": problem})
+
+        cache_hit = None
+        if self.semantic_cache is not None and "cache" not in task_meta_data:
+            cache_hit = self.semantic_cache.lookup(problem)
+            task_meta_data["cache"] = {"kind": "miss"}
+
+        if cache_hit and cache_hit["kind"] == "exact":
+            logger.info("Semantic cache exact hit, reuse the cached result")
+            result = {
+                key: value for key, value in cache_hit["result"].items()
+                if key not in ("timing", "trajectory_id", "run_id")
+            }
+            if "run_id" in task_meta_data:
+                result["run_id"] = task_meta_data["run_id"]
+            result["cache"] = {"kind": "exact", "similarity": 1.0, "problem": cache_hit["problem"]}
+            return result
+
+        if cache_hit:
+            logger.info(
+                "Semantic cache hit with similarity %.4f, reuse the cached plan", cache_hit["similarity"],
+                extra={"cached_problem": cache_hit["problem"]}
+            )
+            self._reuse_plan(problem, cache_hit["result"], task_meta_data)
+            task_meta_data["cache"] = {
+                "kind": "similar",
+                "similarity": cache_hit["similarity"],
+                "problem": cache_hit["problem"]
+            }
+            self._checkpoint(task_meta_data, "step3")
+        elif not self._plan(problem, task_meta_data):
+            return None
+
+        self._solve(problem, task_meta_data)
+        return task_meta_data
+
+    def _reuse_plan(self, problem: str, cached: Dict[str, Any], task_meta_data: Dict[str, Any]) -> None:
+        """
+        Take the Step1 template and the Step3 reasoning flow of a similar solved problem.
+        """
+        template = deepcopy(cached["step1"]["template"])
+        template["Problem"] = problem
+        template["reason_flow"] = list(cached["step3"]["reasoning_flow"])
+        self.navigator.template = template
+        self.navigator.reasoning_flow = template["reason_flow"]
+        self.navigator.reasoning_rounds = len(self.navigator.reasoning_flow)
+        self.navigator.step_dependencies = list(cached["step3"].get("step_dependencies", []))
 
         task_meta_data["step1"] = {
-            "reasoning_thoughts": self.navigator.reasoning_thoughts,
-            "template": deepcopy(self.navigator.template),
+            "reasoning_thoughts": [],
+            "template": deepcopy(template)
+        }
+        task_meta_data["step2"] = cached["step2"]
+        task_meta_data["step3"] = {
+            "reasoning_flow_str": None,
+            "reasoning_flow": self.navigator.reasoning_flow,
+            "reasoning_flow_parser": None
         }
+        if self.navigator.step_dependencies:
+            task_meta_data["step3"]["step_dependencies"] = self.navigator.step_dependencies
+
+    def _plan(self, problem: str, task_meta_data: Dict[str, Any]) -> bool:
+        """
+        Step1 to Step3: build the trajectory, retrieve a template and adjust the reasoning flow.
+
+        Steps already in `task_meta_data`, e.g. restored from a checkpoint, are skipped, and a
+        checkpoint is saved after each completed step.
+
+        Returns:
+            bool: False if no template was found.
+        """
+        speculation = None
+        if self.speculative_retrieval and "step2" not in task_meta_data:
+            speculation = self._start_speculation(problem)
+
+        if "step1" not in task_meta_data:
+            self._step1(problem, task_meta_data)
+            self._checkpoint(task_meta_data, "step1")
+        set_run_progress(0.2)
+        if "step2" not in task_meta_data:
+            if not self._step2(task_meta_data, speculation):
+                return False
+            self._checkpoint(task_meta_data, "step2")
+        set_run_progress(0.3)
+        if "step3" not in task_meta_data:
+            self._step3(task_meta_data)
+            self._checkpoint(task_meta_data, "step3")
+        return True
+
+    def _step1(self, problem: str, task_meta_data: Dict[str, Any]) -> None:
+        with span("step1", "stage"):
+            logger.info("[Step1] Navigator initialize the reasoning trajectory")
+            self.navigator.initializing_reasoning_trajectory(problem)
+
+            task_meta_data["step1"] = {
+                "reasoning_thoughts": self.navigator.reasoning_thoughts,
+                "template": deepcopy(self.navigator.template),
+            }
+            logger.info(
+                "[Step1] Navigator give template",
+                extra={
+                    "reasoning_thoughts": self.navigator.reasoning_thoughts[-1],
+                    "template": task_meta_data["step1"]["template"]
+                }
+            )
+
+    def _step2(self, task_meta_data: Dict[str, Any], speculation: Future | None) -> bool:
+        with span("step2", "stage"):
+            queries = self._step2_queries(self.navigator.template)
 
-        queries = [
-            self.navigator.template['General Knowledge Category'],
-            self.navigator.template['Specific Direction'],
-            self.navigator.template['Applied Method']
+            search_result = None
+            if speculation is not None:
+                search_result = self._resolve_speculation(
+                    speculation,
+                    self.navigator.template['Applied Method']
+                )
+            speculative_hit = bool(search_result)
+
+            if speculative_hit:
+                logger.info("[Step2] Speculative search already contains the applied method, skip hierarchical search")
+            else:
+                logger.info("[Step2] Hierarchical template search")
+                search_result = self.hierarchical_database.hierarchical_search(
+                    queries=queries,
+                    top_k_per_level=self.top_k_per_level,
+                    weight_per_level=self.weight_per_level,
+                    tags=query_tags(self.navigator.template.get('Examined Knowledge'))
+                )
+
+            if not self._accept_search(task_meta_data, search_result, "speculative" if speculative_hit else "hierarchical"):
+                return False
+            if speculation is not None:
+                task_meta_data["step2"]["speculative_hit"] = speculative_hit
+        return True
+
+    @staticmethod
+    def _step2_queries(template: Dict[str, Any]) -> List[str]:
+        return [
+            template['General Knowledge Category'],
+            template['Specific Direction'],
+            template['Applied Method']
         ]
 
-        top_k_per_level = [1, 2, 3]
-        weight_per_level = [1, 0.1, 0.9]
-        
-        logger.info("[Step2] Hierarchical template search")
-        search_result = self.hierarchical_database.hierarchical_search(
-            queries=queries,
-            top_k_per_level=top_k_per_level,
-            weight_per_level=weight_per_level
-        )
+    def _accept_search(
+        self,
+        task_meta_data: Dict[str, Any],
+        search_result: List[Dict[str, Any]] | None,
+        source: Literal["hierarchical", "speculative"] = "hierarchical"
+    ) -> bool:
+        """
+        Record the best search result as the Step2 template, or return False if there is none.
 
+        A hierarchical similarity is a weighted sum over levels, up to the sum of
+        `weight_per_level`, and a speculative one a single leaf similarity. The recorded
+        "similarity" is brought to 0-1 in both cases, next to the search's own value as
+        "raw_similarity" and the search that found the template as "source".
+        """
         if not search_result or not search_result[0]["meta_data"]["data"]:
             logger.error("No search result found")
-            return None
-        
-        similarity = search_result[0]["similarity"]
+            return False
+
+        raw_similarity = search_result[0]["similarity"]
+        similarity = raw_similarity / sum(self.weight_per_level) if source == "hierarchical" else raw_similarity
         retrieved_template = json.loads(search_result[0]["meta_data"]["data"])
-        logger.info(f"[Step2] Retrieved template with similarity score: {similarity}: \n{json.dumps(retrieved_template,indent=2)}\n")
+        logger.info(
+            "[Step2] Retrieved template with similarity score: %s", similarity,
+            extra={"template": retrieved_template, "source": source}
+        )
 
         task_meta_data["step2"] = {
             "similarity": similarity,
+            "raw_similarity": raw_similarity,
+            "source": source,
             "template": retrieved_template
         }
+        return True
 
-        logger.info("[Step3] Navigator dynamic adjustment the reasoning flow")
-        new_reasoning_flow = self.navigator.dynamic_adjustment(
-            trajectory=self.navigator.reasoning_flow,
-            retrieved_template=retrieved_template
-        )
-        logger.info(f"[Step3] New reasoning flow adjusted to: \n{new_reasoning_flow}\n")
+    def _step3(self, task_meta_data: Dict[str, Any]) -> None:
+        similarity = task_meta_data["step2"]["similarity"]
+        retrieved_template = task_meta_data["step2"]["template"]
 
+        with span("step3", "stage"):
+            gate = None
+            if self.fast_path:
+                gate = self._fast_path_gate(similarity, retrieved_template)
+                logger.info("[Step3] Fast path gate", extra={"fast_path": gate})
 
-        logger.info("[Step3] Navigator update reasoning flow")
-        self.navigator.update_reasoning_flow(
-            reasoning_flow_str=new_reasoning_flow
-        )
-        logger.info(f"[Step3] Reasoning flow updated to: \n{self.navigator.reasoning_flow}\n")
+            if gate and gate["taken"]:
+                logger.info("[Step3] Retrieved template matches the Step1 template, reuse the Step1 reasoning flow")
+                new_reasoning_flow = None
+                flow_parser = None
+            else:
+                logger.info("[Step3] Navigator dynamic adjustment the reasoning flow")
+                new_reasoning_flow = self.navigator.dynamic_adjustment(
+                    trajectory=self.navigator.reasoning_flow,
+                    retrieved_template=retrieved_template
+                )
+                logger.info("[Step3] New reasoning flow adjusted", extra={"reasoning_flow_str": new_reasoning_flow})
 
-        task_meta_data["step3"] = {
-            "reasoning_flow_str": new_reasoning_flow,
-            "reasoning_flow": self.navigator.reasoning_flow
-        }
 
-        task_meta_data["step4"] = []
+                logger.info("[Step3] Navigator update reasoning flow")
+                flow_parser = self.navigator.update_reasoning_flow(
+                    reasoning_flow_str=new_reasoning_flow
+                )
+                logger.info(
+                    "[Step3] Reasoning flow updated (%s parser)", flow_parser,
+                    extra={"reasoning_flow": self.navigator.reasoning_flow}
+                )
+
+            task_meta_data["step3"] = {
+                "reasoning_flow_str": new_reasoning_flow,
+                "reasoning_flow": self.navigator.reasoning_flow,
+                "reasoning_flow_parser": flow_parser
+            }
+            if gate is not None:
+                task_meta_data["step3"]["fast_path"] = gate
+            if self.navigator.step_dependencies:
+                task_meta_data["step3"]["step_dependencies"] = self.navigator.step_dependencies
+
+    def _solve(self, problem: str, task_meta_data: Dict[str, Any]) -> None:
+        """
+        Step4: instruct and reason through every step of the reasoning flow, starting after
+        the iterations already in `task_meta_data`, until the early-exit policy stops it.
+
+        With `parallel_steps`, consecutive steps that do not depend on each other run
+        concurrently on the same history, and their outputs are added to the history in step
+        order once the whole block is done.
+        """
+        task_meta_data.setdefault("step4", [])
+        if "early_exit" in task_meta_data:
+            return
 
-        logger.info(f"[Step4] Start reasoning process iteration")
-        for step_idx in range(self.navigator.reasoning_rounds):
+        with span("step4", "stage"):
+            logger.info("[Step4] Start reasoning process iteration")
+            start = len(task_meta_data["step4"])
+            if self.parallel_steps:
+                blocks = self.navigator.step_blocks(start)
+            else:
+                blocks = [[step_idx] for step_idx in range(start, self.navigator.reasoning_rounds)]
+
+            for block in blocks:
+                set_run_progress(0.4 + 0.6 * block[0] / self.navigator.reasoning_rounds)
+                if len(block) > 1:
+                    logger.info("[Step4] Run steps %s concurrently", [step_idx + 1 for step_idx in block])
+                    iterations = self._reason_block(problem, block)
+                else:
+                    iterations = [self._reason_step(problem, block[0])]
+
+                remaining_steps = self.navigator.reasoning_flow[block[-1] + 1:self.navigator.reasoning_rounds]
+                exit_reason = None
+                for iteration in iterations:
+                    exit_reason = exit_reason or self.early_exit.check(iteration["reasoning"], remaining_steps)
+                    iteration["reasoning"] = self.early_exit.strip_flag(iteration["reasoning"])
+
+                    # Update state
+                    self.navigator.reasoning_instructions.append(iteration["instruction"])
+                    self.navigator.instantiation.append(iteration["reasoning"])
+                    task_meta_data["step4"].append(iteration)
+
+                if exit_reason:
+                    # each skipped step would have cost an instruction and an interplay call
+                    task_meta_data["early_exit"] = {
+                        "reason": exit_reason,
+                        "after_iteration": block[-1] + 1,
+                        "skipped_steps": remaining_steps,
+                        "saved_llm_calls": 2 * len(remaining_steps)
+                    }
+                    self.early_exit_stats["exits"] += 1
+                    self.early_exit_stats["saved_llm_calls"] += 2 * len(remaining_steps)
+                    logger.info(
+                        "[Step4] Early exit after iteration %d/%d", block[-1] + 1, self.navigator.reasoning_rounds,
+                        extra={"early_exit": task_meta_data["early_exit"]}
+                    )
+                self._checkpoint(task_meta_data, f"step4.iteration_{block[-1] + 1}")
+                if exit_reason:
+                    break
+
+            logger.info("[Step4] Reasoning process finished")
+
+    def _reason_step(self, problem: str, step_idx: int) -> Dict[str, Any]:
+        """
+        Instruct and reason through one step on the current history, without updating it.
+        """
+        with span(f"step4.iteration_{step_idx + 1}", "iteration"):
             current_step = self.navigator.reasoning_flow[step_idx]
-            current_instruction = self.navigator.initialize_reason_problem(problem, current_step)
-            logger.info(f"Iteration {step_idx + 1}/{self.navigator.reasoning_rounds} instruction: \n{current_instruction}\n")
+            current_instruction = self.navigator.initialize_reason_problem(problem, current_step, step_idx)
+            logger.info(
+                "Iteration %d/%d instruction", step_idx + 1, self.navigator.reasoning_rounds,
+                extra={"instruction": current_instruction}
+            )
 
             current_thought, current_reasoning = self.inference.interplay(
                 current_instruction,
                 problem,
                 self.navigator.reasoning_instructions,
-                self.navigator.instantiation
+                self.navigator.instantiation,
+                request_final_flag=self.early_exit.mode == "flag",
+                step_idx=step_idx
             )
-
-            # Update state
-            self.navigator.reasoning_instructions.append(current_instruction)
-            self.navigator.instantiation.append(current_reasoning)
-            logger.info(f"Iteration {step_idx + 1}/{self.navigator.reasoning_rounds} inference llm's thought: \n{current_thought}\n")
-            logger.info(f"Iteration {step_idx + 1}/{self.navigator.reasoning_rounds} inference llm's reasoning: \n{current_reasoning}\n")
-
-            task_meta_data["step4"].append(
-                {
-                    "instruction": current_instruction,
-                    "thought": current_thought,
-                    "reasoning": current_reasoning
-                }
+            logger.info(
+                "Iteration %d/%d inference llm's reasoning", step_idx + 1, self.navigator.reasoning_rounds,
+                extra={"thought": current_thought, "reasoning": current_reasoning}
             )
 
-        logger.info(f"[Step4] Reasoning process finished")
+        return {
+            "instruction": current_instruction,
+            "thought": current_thought,
+            "reasoning": current_reasoning
+        }
 
-        return task_meta_data
+    def _reason_block(self, problem: str, block: List[int]) -> List[Dict[str, Any]]:
+        """
+        Reason through the independent steps of a block concurrently, returning them in step order.
+        """
+        if self._step_executor is None:
+            self._step_executor = ThreadPoolExecutor(
+                max_workers=self.max_parallel_steps,
+                thread_name_prefix="ReasonFlux-step"
+            )
+        # each step runs in its own copy of the current context, so its spans join the run trace
+        futures = [
+            self._step_executor.submit(contextvars.copy_context().run, self._reason_step, problem, step_idx)
+            for step_idx in block
+        ]
+        return [future.result() for future in futures]
     
 
@@ -0,0 +1,340 @@
+import sys, os
+import argparse
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+sys.path.append(os.getcwd())
+from ReasonFlux.config import ServerSettings
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.utils.client import initialize_agent
+from ReasonFlux.utils.common import logger
+
+
+class SolveRequest(BaseModel):
+    problem: str = Field(..., description="The problem to solve")
+    deadline: Optional[float] = Field(None, description="Seconds until the answer is no longer needed")
+    run_id: Optional[str] = Field(None, description="Run id for the checkpoint store")
+
+
+class SearchRequest(BaseModel):
+    """
+    Either `query`, matched against the leaf templates, or `queries`, one per level of
+    the hierarchical search.
+    """
+    query: Optional[str] = Field(None, description="Text matched against the leaf templates")
+    queries: Optional[List[str]] = Field(None, description="General category, specific direction and applied method")
+    top_k: int = Field(5, description="Number of leaf candidates returned for `query`")
+    top_k_per_level: Optional[List[int]] = Field(None, description="Candidates kept at each level for `queries`")
+    weight_per_level: Optional[List[float]] = Field(None, description="Weight of each level for `queries`")
+    deadline: Optional[float] = Field(None, description="Seconds until the answer is no longer needed")
+
+    @model_validator(mode="after")
+    def check_query(self) -> "SearchRequest":
+        if (self.query is None) == (self.queries is None):
+            raise ValueError("Exactly one of query and queries is required")
+        return self
+
+
+class LatencyWindow:
+    """Latencies of the most recent requests, summarized into percentiles"""
+    def __init__(self, size: int):
+        self.values: Deque[float] = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self.values.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        if not self.values:
+            return {"count": 0}
+        values = np.array(self.values)
+        return {
+            "count": len(values),
+            "mean": float(values.mean()),
+            "p50": float(np.percentile(values, 50)),
+            "p95": float(np.percentile(values, 95)),
+            "max": float(values.max())
+        }
+
+
+class ReasonFluxServer(BaseModel):
+    """
+    Serves `ReasonFlux.run` and the template search over HTTP.
+
+    Every pipeline holds the reasoning state of the problem it is solving, so each one
+    solves a single problem at a time on a worker thread. A solve request is admitted while
+    the running and waiting requests fit in `len(pipelines) + queue_size`, and waits in FIFO
+    order for a free pipeline; beyond that it is rejected at once with 429 and Retry-After.
+    A request that is still waiting at its deadline is dropped with 504. A run that exceeds
+    it is answered with 504 too, and its pipeline returns to the pool when the run finishes.
+
+    Searches run on a thread pool of their own, `search_workers` at a time, so they never
+    delay a solve. A search that exceeds its deadline is answered with 504 but keeps its slot
+    until it finishes, so abandoned searches still count against admission.
+
+    Attributes:
+        pipelines (List[ReasonFlux]): The pipelines, sharing the database and stores.
+        queue_size (int): Solve requests allowed to wait for a pipeline.
+        search_workers (int): Search requests run concurrently.
+        default_deadline (float): Deadline of a request that sets none, in seconds.
+        max_deadline (float): Upper bound of a requested deadline, in seconds.
+        retry_after (float): Retry-After header sent with 429 responses, in seconds.
+        latency_window (int): Number of recent requests the latency metrics are computed over.
+        counters (Dict[str, int]): Requests per outcome.
+    """
+    pipelines: List[ReasonFlux] = Field(..., description="The pipelines, sharing the database and stores")
+    queue_size: int = Field(16, description="Solve requests allowed to wait for a pipeline")
+    search_workers: int = Field(4, description="Search requests run concurrently")
+    default_deadline: float = Field(300.0, description="Deadline of a request that sets none, in seconds")
+    max_deadline: float = Field(900.0, description="Upper bound of a requested deadline, in seconds")
+    retry_after: float = Field(1.0, description="Retry-After header sent with 429 responses, in seconds")
+    latency_window: int = Field(1000, description="Number of recent requests the latency metrics are computed over")
+    counters: Dict[str, int] = Field(
+        default_factory=lambda: {
+            "admitted": 0, "rejected": 0, "expired": 0, "timed_out": 0,
+            "completed": 0, "no_template": 0, "failed": 0
+        },
+        description="Requests per outcome"
+    )
+
+    _idle: asyncio.Queue = PrivateAttr(default=None)
+    _search_slots: asyncio.Semaphore = PrivateAttr(default=None)
+    _executor: ThreadPoolExecutor = PrivateAttr(default=None)
+    _search_executor: ThreadPoolExecutor = PrivateAttr(default=None)
+    _waiting: int = PrivateAttr(default=0)
+    _running: int = PrivateAttr(default=0)
+    _searching: int = PrivateAttr(default=0)
+    _latencies: Dict[str, LatencyWindow] = PrivateAttr(default_factory=dict)
+
+    class Config:
+        arbitrary_types_allowed: bool = True
+
+    @classmethod
+    def from_settings(cls, settings: ServerSettings) -> "ReasonFluxServer":
+        """
+        Build `settings.workers` pipelines. The first one loads the database and stores from
+        their configuration files, the others share them and only get agents of their own.
+        """
+        first = ReasonFlux(
+            navigator_config_path=settings.navigator_config_path,
+            inference_config_path=settings.inference_config_path,
+            hierarchical_database_config_path=settings.hierarchical_database_config_path,
+            trajectory_store_config_path=settings.trajectory_store_config_path,
+            semantic_cache_config_path=settings.semantic_cache_config_path,
+            checkpoint_store_config_path=settings.checkpoint_store_config_path,
+            **settings.options
+        )
+        pipelines = [first]
+        for _ in range(settings.workers - 1):
+            pipelines.append(ReasonFlux(
+                navigator=initialize_agent(settings.navigator_config_path),
+                inference=initialize_agent(settings.inference_config_path),
+                hierarchical_database=first.hierarchical_database,
+                trajectory_store=first.trajectory_store,
+                semantic_cache=first.semantic_cache,
+                checkpoint_store=first.checkpoint_store,
+                **settings.options
+            ))
+        return cls(
+            pipelines=pipelines,
+            queue_size=settings.queue_size,
+            search_workers=settings.search_workers,
+            default_deadline=settings.default_deadline,
+            max_deadline=settings.max_deadline,
+            retry_after=settings.retry_after,
+            latency_window=settings.latency_window
+        )
+
+    @property
+    def capacity(self) -> int:
+        return len(self.pipelines) + self.queue_size
+
+    def _start(self) -> None:
+        # created on first use, inside the event loop serving the requests
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for pipeline in self.pipelines:
+                self._idle.put_nowait(pipeline)
+            self._search_slots = asyncio.Semaphore(self.search_workers)
+            self._executor = ThreadPoolExecutor(
+                max_workers=len(self.pipelines),
+                thread_name_prefix="ReasonFlux-server"
+            )
+            self._search_executor = ThreadPoolExecutor(
+                max_workers=self.search_workers,
+                thread_name_prefix="ReasonFlux-search"
+            )
+
+    def _record(self, name: str, value: float) -> None:
+        if name not in self._latencies:
+            self._latencies[name] = LatencyWindow(self.latency_window)
+        self._latencies[name].add(value)
+
+    def _deadline(self, requested: Optional[float]) -> float:
+        return min(requested or self.default_deadline, self.max_deadline)
+
+    def _error(self, status_code: int, outcome: str, detail: str, **headers) -> JSONResponse:
+        self.counters[outcome] += 1
+        return JSONResponse(status_code=status_code, content={"detail": detail}, headers=headers or None)
+
+    def _release(self, pipeline: ReasonFlux, start: float, future: asyncio.Future) -> None:
+        # runs on the event loop once the pipeline's run is over, even after a 504
+        self._running -= 1
+        self._idle.put_nowait(pipeline)
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self._record("run", time.perf_counter() - start)
+            for stage, duration in future.result()["timing"]["stages"].items():
+                self._record(stage, duration)
+
+    def _release_search(self, start: float, future: asyncio.Future) -> None:
+        # runs on the event loop once the search is over, even after a 504
+        self._searching -= 1
+        self._search_slots.release()
+        if not future.cancelled() and future.exception() is None:
+            self._record("search", time.perf_counter() - start)
+
+    async def solve(self, request: SolveRequest) -> JSONResponse:
+        """
+        Solve a problem on a free pipeline, within the request's deadline.
+
+        Returns:
+            JSONResponse: 200 with the run result, 404 if no template was found, 429 when the
+            queue is full, 504 when the deadline passed, 500 if the run failed.
+        """
+        self._start()
+        if self._waiting + self._running >= self.capacity:
+            logger.warning("Rejecting solve request, %d waiting and %d running", self._waiting, self._running)
+            return self._error(429, "rejected", "Server is saturated", **{"Retry-After": f"{self.retry_after:g}"})
+        self.counters["admitted"] += 1
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        deadline = start + self._deadline(request.deadline)
+        self._waiting += 1
+        try:
+            pipeline = await asyncio.wait_for(self._idle.get(), timeout=deadline - time.perf_counter())
+        except asyncio.TimeoutError:
+            return self._error(504, "expired", "Deadline passed while waiting for a pipeline")
+        finally:
+            self._waiting -= 1
+        self._record("queue_wait", time.perf_counter() - start)
+
+        self._running += 1
+        run_start = time.perf_counter()
+        future = loop.run_in_executor(self._executor, pipeline.run, request.problem, request.run_id)
+        future.add_done_callback(lambda future: self._release(pipeline, run_start, future))
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout=deadline - time.perf_counter())
+        except asyncio.TimeoutError:
+            logger.warning("Solve request exceeded its deadline, the run continues in the background")
+            return self._error(504, "timed_out", "Deadline passed while solving")
+        except Exception as e:
+            logger.error("Solve request failed: %s: %s", type(e).__name__, e)
+            return self._error(500, "failed", f"{type(e).__name__}: {e}")
+        if result is None:
+            return self._error(404, "no_template", "No template found for the problem")
+
+        self.counters["completed"] += 1
+        self._record("total", time.perf_counter() - start)
+        return JSONResponse(content=result)
+
+    async def search(self, request: SearchRequest) -> JSONResponse:
+        """
+        Retrieve templates without running the agents.
+
+        Returns:
+            JSONResponse: 200 with the candidates, 429 when the queue is full, 504 when the deadline passed.
+        """
+        self._start()
+        if self._searching >= self.search_workers + self.queue_size:
+            return self._error(429, "rejected", "Server is saturated", **{"Retry-After": f"{self.retry_after:g}"})
+        database = self.pipelines[0].hierarchical_database
+        if request.query is not None:
+            call = lambda: database.leaf_search(request.query, request.top_k)
+        else:
+            call = lambda: database.hierarchical_search(
+                queries=request.queries,
+                top_k_per_level=request.top_k_per_level or self.pipelines[0].top_k_per_level,
+                weight_per_level=request.weight_per_level or self.pipelines[0].weight_per_level
+            )
+
+        start = time.perf_counter()
+        deadline = start + self._deadline(request.deadline)
+        self._searching += 1
+        try:
+            await asyncio.wait_for(self._search_slots.acquire(), timeout=deadline - time.perf_counter())
+        except asyncio.TimeoutError:
+            self._searching -= 1
+            return self._error(504, "expired", "Deadline passed while waiting for a search slot")
+
+        search_start = time.perf_counter()
+        future = asyncio.get_running_loop().run_in_executor(self._search_executor, call)
+        future.add_done_callback(lambda future: self._release_search(search_start, future))
+        try:
+            results = await asyncio.wait_for(asyncio.shield(future), timeout=deadline - time.perf_counter())
+        except asyncio.TimeoutError:
+            logger.warning("Search request exceeded its deadline, the search continues in the background")
+            return self._error(504, "timed_out", "Deadline passed while searching")
+        return JSONResponse(content={"results": results or []})
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Queue depth, pipeline usage, requests per outcome and latency percentiles of the queue
+        wait, the whole request and every pipeline stage.
+        """
+        return {
+            "queue_depth": self._waiting,
+            "running": self._running,
+            "searching": self._searching,
+            "pipelines": len(self.pipelines),
+            "capacity": self.capacity,
+            "requests": dict(self.counters),
+            "latency": {name: window.summary() for name, window in self._latencies.items()}
+        }
+
+
+def create_app(server: ReasonFluxServer) -> FastAPI:
+    app = FastAPI(title="ReasonFlux")
+
+    @app.post("/v1/solve")
+    async def solve(request: SolveRequest):
+        return await server.solve(request)
+
+    @app.post("/v1/search")
+    async def search(request: SearchRequest):
+        return await server.search(request)
+
+    @app.get("/metrics")
+    async def metrics():
+        return server.metrics()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def config() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", type=str, default="ReasonFlux/config/server/server.yaml", help="Server configuration file")
+    return parser.parse_args()
+
+
+def main():
+    args = config()
+    settings = ServerSettings.from_yaml(args.config)
+    server = ReasonFluxServer.from_settings(settings)
+    logger.info("Serving %d pipelines on %s:%d", len(server.pipelines), settings.host, settings.port)
+    uvicorn.run(create_app(server), host=settings.host, port=settings.port)
+
+if __name__ == "__main__":
+    main()
+# python ReasonFlux/server.py --config ReasonFlux/config/server/server.yaml
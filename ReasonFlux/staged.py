@@ -0,0 +1,398 @@
+import sys, os
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+sys.path.append(os.getcwd())
+from ReasonFlux.config import StagedSettings
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.template_matcher.tag_index import query_tags
+from ReasonFlux.utils.client import initialize_agent
+from ReasonFlux.utils.common import get_uuid, logger
+from ReasonFlux.utils.scheduler import run_progress, set_run_progress
+from ReasonFlux.utils.tracing import RunTrace, SpanRecord, attach_run
+
+STAGES = ["step1", "step2", "step3", "step4"]
+# progress of a run at the start of each stage, as set by ReasonFlux._plan
+STAGE_PROGRESS = {"step1": 0.0, "step2": 0.2, "step3": 0.3, "step4": 0.4}
+
+
+class _Job:
+    """One problem moving through the stages, with the Navigator state it carries between workers"""
+    def __init__(self, task_meta_data: Dict[str, Any]):
+        self.task_meta_data = task_meta_data
+        self.navigator_state: Dict[str, Any] | None = None
+        self.run_trace = RunTrace()
+        self.future: Future = Future()
+        self.submitted = time.perf_counter()
+        self.enqueued = self.submitted
+        self.queue_seconds: Dict[str, float] = {}
+
+
+class StagedExecutor(BaseModel):
+    """
+    Solves many problems by passing them through one queue and worker pool per stage.
+
+    Unlike running `ReasonFlux.run` in a pool, where every worker waits on one stage of
+    one problem at a time, each stage gets workers sized to its own bottleneck: Step1,
+    Step3 and Step4 workers each own a pipeline, i.e. agents of their own, and load the
+    Navigator state the problem carries from the previous stage. Step2 workers gather up to
+    `step2_batch_size` problems, waiting at most `step2_max_wait_ms` for the batch to fill,
+    and search them with `HierarchicalVectorDatabase.hierarchical_search_batch`. Each queue
+    holds at most `queue_size` problems, so a slow stage holds back the ones before it and
+    `submit` blocks once Step1 is full.
+
+    Results are the same as those of `ReasonFlux.run`, with the time spent waiting in front
+    of each stage under "timing.queues". Checkpoints and the trajectory store are used as
+    by `run`; the semantic cache and the speculative retrieval are not.
+
+    Attributes:
+        pipelines (Dict[str, List[ReasonFlux]]): The pipelines of the step1, step3 and step4 workers, one per worker.
+        step2_workers (int): Number of Step2 workers.
+        step2_batch_size (int): Problems searched together by a Step2 worker at most.
+        step2_max_wait_ms (float): How long a Step2 worker waits to fill a batch, in milliseconds.
+        queue_size (int): Problems waiting in front of each stage at most.
+        stats (Dict[str, Dict[str, float]]): Per stage, the problems processed, the busy and queued seconds, and the Step2 batches.
+    """
+    pipelines: Dict[str, List[ReasonFlux]] = Field(
+        ...,
+        description="The pipelines of the step1, step3 and step4 workers, one per worker, sharing the database and stores"
+    )
+    step2_workers: int = Field(1, description="Number of Step2 workers")
+    step2_batch_size: int = Field(32, description="Problems searched together by a Step2 worker at most")
+    step2_max_wait_ms: float = Field(20.0, description="How long a Step2 worker waits to fill a batch, in milliseconds")
+    queue_size: int = Field(64, description="Problems waiting in front of each stage at most")
+    stats: Dict[str, Dict[str, float]] = Field(
+        default_factory=lambda: {
+            stage: {"processed": 0, "busy_seconds": 0.0, "queue_seconds": 0.0, **({"batches": 0} if stage == "step2" else {})}
+            for stage in STAGES
+        },
+        description="Per stage, the problems processed, the busy and queued seconds, and the Step2 batches"
+    )
+
+    _queues: Dict[str, queue.Queue] = PrivateAttr(default=None)
+    _threads: List[threading.Thread] = PrivateAttr(default_factory=list)
+    _condition: threading.Condition = PrivateAttr(default_factory=threading.Condition)
+    _pending: int = PrivateAttr(default=0)
+
+    class Config:
+        arbitrary_types_allowed: bool = True
+
+    @model_validator(mode="after")
+    def check_pipelines(self) -> "StagedExecutor":
+        for stage in ("step1", "step3", "step4"):
+            if not self.pipelines.get(stage):
+                raise ValueError(f"{stage} needs at least one pipeline")
+        return self
+
+    @classmethod
+    def from_settings(cls, settings: StagedSettings) -> "StagedExecutor":
+        """
+        Build one pipeline per Step1, Step3 and Step4 worker. The first one loads the database
+        and stores from their configuration files, the others share them and only get agents
+        of their own.
+        """
+        first = ReasonFlux(
+            navigator_config_path=settings.navigator_config_path,
+            inference_config_path=settings.inference_config_path,
+            hierarchical_database_config_path=settings.hierarchical_database_config_path,
+            trajectory_store_config_path=settings.trajectory_store_config_path,
+            checkpoint_store_config_path=settings.checkpoint_store_config_path,
+            **settings.options
+        )
+        pipelines = {}
+        for stage, workers in (
+            ("step1", settings.step1_workers),
+            ("step3", settings.step3_workers),
+            ("step4", settings.step4_workers)
+        ):
+            pipelines[stage] = [
+                first if stage == "step1" and worker == 0 else ReasonFlux(
+                    navigator=initialize_agent(settings.navigator_config_path),
+                    inference=initialize_agent(settings.inference_config_path),
+                    hierarchical_database=first.hierarchical_database,
+                    trajectory_store=first.trajectory_store,
+                    checkpoint_store=first.checkpoint_store,
+                    **settings.options
+                )
+                for worker in range(workers)
+            ]
+        return cls(
+            pipelines=pipelines,
+            step2_workers=settings.step2_workers,
+            step2_batch_size=settings.step2_batch_size,
+            step2_max_wait_ms=settings.step2_max_wait_ms,
+            queue_size=settings.queue_size
+        )
+
+    @property
+    def _reference(self) -> ReasonFlux:
+        # the database, the search parameters and the stores are shared by every pipeline
+        return self.pipelines["step1"][0]
+
+    def _start(self) -> None:
+        with self._condition:
+            if self._queues is not None:
+                return
+            self._queues = {stage: queue.Queue(maxsize=self.queue_size) for stage in STAGES}
+            workers = [
+                (stage, self._work, (stage, pipeline))
+                for stage in ("step1", "step3", "step4")
+                for pipeline in self.pipelines[stage]
+            ] + [("step2", self._search, ()) for _ in range(self.step2_workers)]
+            for idx, (stage, target, args) in enumerate(workers):
+                thread = threading.Thread(
+                    target=target,
+                    args=args,
+                    name=f"ReasonFlux-{stage}-{idx}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, problem: str, run_id: Optional[str] = None) -> Future:
+        """
+        Queue a problem for Step1, blocking while the Step1 queue is full.
+
+        Args:
+            problem (str): The problem description to reason about.
+            run_id (Optional[str]): Id of the run for checkpointing, a new one is generated if not given.
+
+        Returns:
+            Future: Resolves to the result of the run, None if no template was found, or the error that stopped it.
+        """
+        self._start()
+        task_meta_data = {"problem": problem}
+        if self._reference.checkpoint_store is not None:
+            task_meta_data["run_id"] = run_id or get_uuid()
+        job = _Job(task_meta_data)
+        with self._condition:
+            self._pending += 1
+        self._queues["step1"].put(job)
+        return job.future
+
+    def run_batch(self, problems: List[str]) -> List[Dict[str, Any] | None]:
+        """
+        Solve the problems and return their results in order, raising the first error in that order.
+        """
+        futures = [self.submit(problem) for problem in problems]
+        return [future.result() for future in futures]
+
+    def queue_depths(self) -> Dict[str, int]:
+        if self._queues is None:
+            return {stage: 0 for stage in STAGES}
+        return {stage: stage_queue.qsize() for stage, stage_queue in self._queues.items()}
+
+    def close(self) -> None:
+        """
+        Wait for the submitted problems to finish, then stop the workers.
+        """
+        if self._queues is None:
+            return
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending == 0)
+        for stage in STAGES:
+            workers = self.step2_workers if stage == "step2" else len(self.pipelines[stage])
+            for _ in range(workers):
+                self._queues[stage].put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+        self._queues = None
+
+    def __enter__(self) -> "StagedExecutor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _forward(self, stage: str, job: _Job) -> None:
+        job.enqueued = time.perf_counter()
+        self._queues[stage].put(job)
+
+    def _finish(self, job: _Job, result: Dict[str, Any] | None = None, error: Exception | None = None) -> None:
+        checkpoint_store = self._reference.checkpoint_store
+        if error is not None:
+            if checkpoint_store is not None:
+                checkpoint_store.mark_failed(job.task_meta_data["run_id"], f"{type(error).__name__}: {error}")
+            job.future.set_exception(error)
+        else:
+            if result is None and checkpoint_store is not None:
+                checkpoint_store.mark_failed(job.task_meta_data["run_id"], "No search result found")
+            job.future.set_result(result)
+        with self._condition:
+            self._pending -= 1
+            self._condition.notify_all()
+
+    def _record(self, stage: str, jobs: List[_Job], busy: float) -> None:
+        with self._condition:
+            self.stats[stage]["processed"] += len(jobs)
+            self.stats[stage]["busy_seconds"] += busy
+            self.stats[stage]["queue_seconds"] += sum(job.queue_seconds[stage] for job in jobs)
+
+    def _work(self, stage: str, pipeline: ReasonFlux) -> None:
+        """
+        Worker of Step1, Step3 or Step4, running one problem at a time on its own pipeline.
+        """
+        steps: Dict[str, Callable[[_Job], str | None]] = {
+            "step1": lambda job: self._step1(pipeline, job),
+            "step3": lambda job: self._step3(pipeline, job),
+            "step4": lambda job: self._step4(pipeline, job)
+        }
+        while True:
+            job = self._queues[stage].get()
+            if job is None:
+                return
+            job.queue_seconds[stage] = time.perf_counter() - job.enqueued
+            start = time.perf_counter()
+            try:
+                with attach_run(job.run_trace), run_progress():
+                    set_run_progress(STAGE_PROGRESS[stage])
+                    next_stage = steps[stage](job)
+            except Exception as e:
+                logger.error("[%s] Run failed: %s", stage, e, extra={"problem": job.task_meta_data["problem"]})
+                next_stage = None
+                self._finish(job, error=e)
+            self._record(stage, [job], time.perf_counter() - start)
+            if next_stage is not None:
+                self._forward(next_stage, job)
+
+    def _step1(self, pipeline: ReasonFlux, job: _Job) -> str:
+        pipeline.navigator.reset()
+        pipeline._step1(job.task_meta_data["problem"], job.task_meta_data)
+        pipeline._checkpoint(job.task_meta_data, "step1")
+        job.navigator_state = pipeline.navigator.state()
+        return "step2"
+
+    def _step3(self, pipeline: ReasonFlux, job: _Job) -> str:
+        pipeline.navigator.restore(job.navigator_state)
+        pipeline._step3(job.task_meta_data)
+        pipeline._checkpoint(job.task_meta_data, "step3")
+        job.navigator_state = pipeline.navigator.state()
+        return "step4"
+
+    def _step4(self, pipeline: ReasonFlux, job: _Job) -> None:
+        pipeline.navigator.restore(job.navigator_state)
+        pipeline._solve(job.task_meta_data["problem"], job.task_meta_data)
+        timing = job.run_trace.summary()
+        timing["total"] = time.perf_counter() - job.submitted
+        timing["queues"] = dict(job.queue_seconds)
+        self._finish(job, pipeline._complete(job.task_meta_data, timing))
+        return None
+
+    def _next_batch(self) -> tuple[List[_Job], bool]:
+        """
+        Take a batch from the Step2 queue, and whether the worker was told to stop.
+        """
+        stage_queue = self._queues["step2"]
+        job = stage_queue.get()
+        if job is None:
+            return [], True
+        batch = [job]
+        deadline = time.monotonic() + self.step2_max_wait_ms / 1000
+        while len(batch) < self.step2_batch_size:
+            try:
+                job = stage_queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _search(self) -> None:
+        """
+        Worker of Step2, searching the templates of a batch of problems at a time.
+        """
+        reference = self._reference
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                self._search_batch(reference, batch)
+            if stop:
+                return
+
+    def _search_batch(self, reference: ReasonFlux, batch: List[_Job]) -> None:
+        start = time.perf_counter()
+        for job in batch:
+            job.queue_seconds["step2"] = start - job.enqueued
+        jobs, queries_list, tags_list = [], [], []
+        for job in batch:
+            try:
+                queries_list.append(ReasonFlux._step2_queries(job.navigator_state["template"]))
+                tags_list.append(query_tags(job.navigator_state["template"].get('Examined Knowledge')))
+                jobs.append(job)
+            except Exception as e:
+                self._finish(job, error=e)
+
+        logger.info("[Step2] Hierarchical template search of %d problems", len(jobs))
+        try:
+            with run_progress():
+                set_run_progress(STAGE_PROGRESS["step2"])
+                search_results = reference.hierarchical_database.hierarchical_search_batch(
+                    queries_list,
+                    top_k_per_level=reference.top_k_per_level,
+                    weight_per_level=reference.weight_per_level,
+                    tags_list=tags_list
+                )
+        except Exception as e:
+            logger.error("[step2] Search of %d problems failed: %s", len(jobs), e)
+            for job in jobs:
+                self._finish(job, error=e)
+            search_results = []
+        duration = time.perf_counter() - start
+
+        for job, search_result in zip(jobs, search_results):
+            # the batch is one stage span of every run in it
+            job.run_trace.spans.append(
+                SpanRecord(name="step2", kind="stage", duration=duration, attributes={"batch_size": len(jobs)})
+            )
+            try:
+                with attach_run(job.run_trace):
+                    if not reference._accept_search(job.task_meta_data, search_result):
+                        self._finish(job, None)
+                        continue
+                    reference._checkpoint(job.task_meta_data, "step2")
+            except Exception as e:
+                self._finish(job, error=e)
+                continue
+            self._forward("step3", job)
+
+        with self._condition:
+            self.stats["step2"]["batches"] += 1
+        self._record("step2", batch, duration)
+
+
+def config() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Solve a file of problems with the staged executor")
+    parser.add_argument("--config", type=str, default="ReasonFlux/config/staged/staged.yaml", help="Staged executor configuration file")
+    parser.add_argument("--input", type=str, required=True, help="JSONL file with a \"problem\" field per line")
+    parser.add_argument("--output", type=str, required=True, help="JSONL file the results are written to, in input order")
+    return parser.parse_args()
+
+
+def main():
+    args = config()
+    settings = StagedSettings.from_yaml(args.config)
+    with open(args.input, "r") as f:
+        problems = [json.loads(line)["problem"] for line in f if line.strip()]
+
+    with StagedExecutor.from_settings(settings) as executor:
+        futures = [executor.submit(problem) for problem in problems]
+        with open(args.output, "w") as f:
+            for problem, future in zip(problems, futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"problem": problem, "error": f"{type(e).__name__}: {e}"}
+                f.write(json.dumps(result if result is not None else {"problem": problem, "result": None}, ensure_ascii=False) + "\n")
+        logger.info("Solved %d problems", len(problems), extra={"stats": executor.stats})
+
+if __name__ == "__main__":
+    main()
+# python ReasonFlux/staged.py --config ReasonFlux/config/staged/staged.yaml --input problems.jsonl --output output/staged.jsonl
@@ -0,0 +1,10 @@
+from ReasonFlux.storage.checkpoint_store import CheckpointStore
+from ReasonFlux.storage.trajectory_store import TrajectoryStore, problem_hash
+from ReasonFlux.storage.work_queue import WorkQueue
+
+__all__ = [
+    "CheckpointStore",
+    "TrajectoryStore",
+    "problem_hash",
+    "WorkQueue"
+]
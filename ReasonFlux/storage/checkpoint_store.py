@@ -0,0 +1,120 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+
+class CheckpointStore(BaseModel):
+    """
+    Latest state of every run, so an interrupted run can be resumed.
+
+    One row per run id holds the problem, the last completed stage (e.g. "step2" or
+    "step4.iteration_3"), the run's status ("running", "failed" or "completed") and a JSON
+    state with the partial `task_meta_data` and the Navigator state. Each checkpoint
+    replaces the previous one of the run in a single SQLite transaction.
+
+    Attributes:
+        data_dir (str): Directory holding `checkpoints.sqlite3`.
+    """
+    data_dir: str = Field(..., description="Directory holding checkpoints.sqlite3")
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _connection: sqlite3.Connection = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._connection = sqlite3.connect(
+            os.path.join(self.data_dir, "checkpoints.sqlite3"),
+            check_same_thread=False
+        )
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                run_id TEXT PRIMARY KEY,
+                problem TEXT NOT NULL,
+                stage TEXT,
+                status TEXT NOT NULL,
+                error TEXT,
+                state TEXT NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def save(self, run_id: str, problem: str, stage: str, state: Dict[str, Any], status: str = "running") -> None:
+        """
+        Record the state of a run after `stage` completed.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO checkpoints (run_id, problem, stage, status, error, state, updated) "
+                "VALUES (?, ?, ?, ?, NULL, ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET stage = excluded.stage, status = excluded.status, "
+                "error = NULL, state = excluded.state, updated = excluded.updated",
+                (run_id, problem, stage, status, json.dumps(state, ensure_ascii=False, default=str), time.time())
+            )
+            self._connection.commit()
+
+    def mark_failed(self, run_id: str, error: str) -> None:
+        """
+        Flag a run as failed, keeping its last checkpoint.
+        """
+        with self._lock:
+            self._connection.execute(
+                "UPDATE checkpoints SET status = 'failed', error = ?, updated = ? WHERE run_id = ?",
+                (error, time.time(), run_id)
+            )
+            self._connection.commit()
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The checkpoint of a run: "run_id", "problem", "stage", "status", "error" and "state",
+        or None if the run is unknown.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT run_id, problem, stage, status, error, state FROM checkpoints WHERE run_id = ?",
+                (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "run_id": row[0],
+            "problem": row[1],
+            "stage": row[2],
+            "status": row[3],
+            "error": row[4],
+            "state": json.loads(row[5])
+        }
+
+    def runs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Id, problem, stage, status and error of the stored runs, oldest update first.
+        """
+        query = "SELECT run_id, problem, stage, status, error FROM checkpoints"
+        parameters = []
+        if status is not None:
+            query += " WHERE status = ?"
+            parameters.append(status)
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY updated", parameters).fetchall()
+        return [
+            {"run_id": run_id, "problem": problem, "stage": stage, "status": status, "error": error}
+            for run_id, problem, stage, status, error in rows
+        ]
+
+    def delete(self, run_id: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,240 @@
+import fcntl
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import zstandard
+from pydantic import BaseModel, Field, PrivateAttr
+
+from ReasonFlux.utils.common import logger
+
+
+def problem_hash(problem: str) -> str:
+    """
+    Hash of a problem text, insensitive to surrounding and repeated whitespace.
+    """
+    return hashlib.sha256(" ".join(problem.split()).encode("utf-8")).hexdigest()
+
+
+class TrajectoryStore(BaseModel):
+    """
+    Append-only store of `ReasonFlux.run` results.
+
+    Every record is written as one compact JSON line in its own zstd frame, appended to the
+    active segment file (`segment_000000.jsonl.zst`, ...), and a new segment is started once
+    the active one exceeds `segment_bytes`. A segment is a valid zstd stream of JSON lines, so
+    it can be decompressed and read line by line without loading it whole. A SQLite index maps
+    each record to its segment, offset and length, by problem hash and by retrieved template name.
+
+    Several processes, also on different nodes sharing `data_dir`, may append to one store:
+    an append holds an exclusive lock on `append.lock` and writes at the real end of the
+    active segment, so the offsets in the index stay correct.
+
+    Attributes:
+        data_dir (str): Directory holding the segments and the index.
+        segment_bytes (int): Size after which a new segment is started.
+        compression_level (int): zstd compression level.
+    """
+    data_dir: str = Field(..., description="Directory holding the segments and the index")
+    segment_bytes: int = Field(64 * 1024 * 1024, description="Size after which a new segment is started")
+    compression_level: int = Field(10, description="zstd compression level")
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _connection: sqlite3.Connection = PrivateAttr(default=None)
+    _compressor: zstandard.ZstdCompressor = PrivateAttr(default=None)
+    _segment: int = PrivateAttr(default=0)
+    _segment_file: io.BufferedWriter = PrivateAttr(default=None)
+    _lock_file: io.BufferedWriter = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._compressor = zstandard.ZstdCompressor(level=self.compression_level)
+        self._connection = sqlite3.connect(
+            os.path.join(self.data_dir, "index.sqlite3"),
+            check_same_thread=False
+        )
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                problem_hash TEXT NOT NULL,
+                template_name TEXT,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS records_problem_hash ON records (problem_hash);
+            CREATE INDEX IF NOT EXISTS records_template_name ON records (template_name);
+            """
+        )
+        segments = self.segments()
+        self._segment = segments[-1] if segments else 0
+        self._open_segment()
+        self._lock_file = open(os.path.join(self.data_dir, "append.lock"), "ab")
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.data_dir, f"segment_{segment:06d}.jsonl.zst")
+
+    def _open_segment(self) -> None:
+        if self._segment_file is not None:
+            self._segment_file.close()
+        self._segment_file = open(self._segment_path(self._segment), "ab")
+
+    def segments(self) -> List[int]:
+        """
+        The numbers of the segment files, in write order.
+        """
+        return sorted(
+            int(name[len("segment_"):-len(".jsonl.zst")])
+            for name in os.listdir(self.data_dir)
+            if name.startswith("segment_") and name.endswith(".jsonl.zst")
+        )
+
+    def append(self, task_meta_data: Dict[str, Any]) -> int:
+        """
+        Append a run result.
+
+        Args:
+            task_meta_data (Dict[str, Any]): The result of `ReasonFlux.run`.
+
+        Returns:
+            int: The id of the record.
+        """
+        line = json.dumps(task_meta_data, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+        frame = self._compressor.compress(line.encode("utf-8"))
+        template = (task_meta_data.get("step2") or {}).get("template") or {}
+
+        with self._lock:
+            # other processes may append to the store too, so the segment and the offset are
+            # taken under a lock shared with them, from the files rather than from this handle
+            fcntl.lockf(self._lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(self._segment_path(self._segment + 1)):
+                    while os.path.exists(self._segment_path(self._segment + 1)):
+                        self._segment += 1
+                    self._open_segment()
+                offset = self._segment_file.seek(0, os.SEEK_END)
+                if offset >= self.segment_bytes:
+                    self._segment += 1
+                    self._open_segment()
+                    offset = self._segment_file.seek(0, os.SEEK_END)
+                self._segment_file.write(frame)
+                self._segment_file.flush()
+                cursor = self._connection.execute(
+                    "INSERT INTO records (problem_hash, template_name, segment, offset, length, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        problem_hash(task_meta_data.get("problem", "")),
+                        template.get("template_name"),
+                        self._segment,
+                        offset,
+                        len(frame),
+                        time.time()
+                    )
+                )
+                self._connection.commit()
+            finally:
+                fcntl.lockf(self._lock_file, fcntl.LOCK_UN)
+        return cursor.lastrowid
+
+    def _read(self, segment: int, offset: int, length: int) -> Dict[str, Any]:
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            frame = f.read(length)
+        return json.loads(zstandard.ZstdDecompressor().decompress(frame))
+
+    def get(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Read one record by id, or None if there is no such record.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT segment, offset, length FROM records WHERE id = ?", (record_id,)
+            ).fetchone()
+        return self._read(*row) if row else None
+
+    def find(
+        self,
+        problem: Optional[str] = None,
+        template_name: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Read the records of a problem and/or of a retrieved template, oldest first.
+
+        Args:
+            problem (str, optional): The problem text, matched by hash.
+            template_name (str, optional): The `template_name` of the template retrieved in Step2.
+            limit (int, optional): Maximum number of records.
+
+        Yields:
+            Dict[str, Any]: The matching records.
+        """
+        conditions, parameters = [], []
+        if problem is not None:
+            conditions.append("problem_hash = ?")
+            parameters.append(problem_hash(problem))
+        if template_name is not None:
+            conditions.append("template_name = ?")
+            parameters.append(template_name)
+        query = "SELECT segment, offset, length FROM records"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+        for row in rows:
+            yield self._read(*row)
+
+    def template_counts(self) -> Dict[str, int]:
+        """
+        Number of records per retrieved template name, from the index alone.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT template_name, COUNT(*) FROM records GROUP BY template_name"
+            ).fetchall()
+        return {name: count for name, count in rows}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def iter_records(self, segments: Optional[List[int]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream every record of the given segments (all by default), decompressing one
+        chunk at a time, for analytics that scan the whole store.
+
+        Args:
+            segments (List[int], optional): The segments to read.
+
+        Yields:
+            Dict[str, Any]: The records, in write order.
+        """
+        for segment in segments if segments is not None else self.segments():
+            with open(self._segment_path(segment), "rb") as f:
+                reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+                for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                    if line.strip():
+                        yield json.loads(line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+        logger.info("Trajectory store closed: %s", self.data_dir)
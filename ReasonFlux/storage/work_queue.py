@@ -0,0 +1,230 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+
+class WorkQueue(BaseModel):
+    """
+    Durable queue of problems that worker processes, on one or several nodes, lease from.
+
+    Every problem is a row of `queue.sqlite3` in `data_dir`, "pending" until a worker leases
+    it. A lease lasts `lease_seconds` and is renewed by the worker's heartbeat while the
+    problem is being solved. A problem whose lease runs out, because its worker crashed or
+    lost the queue, is leased again by another worker, and a failed problem is put back,
+    until it has been attempted `max_attempts` times; it is then "failed". Results are stored
+    in the queue, so every node writes to the same place, and `results` reads them in
+    submission order.
+
+    Leasing happens in one `BEGIN IMMEDIATE` transaction, so concurrent workers never lease
+    the same problem. Workers on several nodes need `data_dir` on a shared filesystem with
+    working file locks (e.g. NFSv4); the queue uses SQLite's rollback journal, as WAL does
+    not work over network filesystems.
+
+    Attributes:
+        data_dir (str): Directory holding `queue.sqlite3`.
+        lease_seconds (float): How long a lease lasts without a heartbeat.
+        max_attempts (int): Leases of a problem before it is given up as failed.
+    """
+    data_dir: str = Field(..., description="Directory holding queue.sqlite3")
+    lease_seconds: float = Field(300.0, description="How long a lease lasts without a heartbeat")
+    max_attempts: int = Field(3, description="Leases of a problem before it is given up as failed")
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _connection: sqlite3.Connection = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._connection = sqlite3.connect(
+            os.path.join(self.data_dir, "queue.sqlite3"),
+            timeout=60,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                position INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL UNIQUE,
+                batch TEXT NOT NULL,
+                problem TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_expires REAL,
+                error TEXT,
+                result TEXT,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, position);
+            CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, position);
+            """
+        )
+
+    def _transaction(self, statements) -> Any:
+        """
+        Run `statements(cursor)` in one write transaction, taking the database lock up front.
+        """
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(cursor)
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            return result
+
+    def enqueue(self, problems: List[str], batch: str) -> List[str]:
+        """
+        Add problems under the ids `<batch>:<index>`. Problems already in the queue are kept
+        as they are, so enqueueing the same batch again after a coordinator restart adds nothing.
+
+        Returns:
+            List[str]: The job ids, in order.
+
+        Raises:
+            ValueError: If the batch is already in the queue with other problems, e.g. an
+                edited input file enqueued under the same name; its rows, results and
+                checkpoints belong to the old problems.
+        """
+        job_ids = [f"{batch}:{index:06d}" for index in range(len(problems))]
+        now = time.time()
+
+        def _insert(cursor):
+            stored = dict(cursor.execute("SELECT job_id, problem FROM jobs WHERE batch = ?", (batch,)).fetchall())
+            changed = [job_id for job_id, problem in zip(job_ids, problems) if stored.get(job_id, problem) != problem]
+            if changed or len(stored) > len(problems):
+                where = f" (first difference at {changed[0]})" if changed else ""
+                raise ValueError(f"Batch {batch} is already in the queue with other problems{where}, "
+                                 f"enqueue them under a new batch name")
+            cursor.executemany(
+                "INSERT OR IGNORE INTO jobs (job_id, batch, problem, status, updated) VALUES (?, ?, ?, 'pending', ?)",
+                [(job_id, batch, problem, now) for job_id, problem in zip(job_ids, problems)]
+            )
+        self._transaction(_insert)
+        return job_ids
+
+    def lease(self, worker: str, count: int = 1) -> List[Dict[str, Any]]:
+        """
+        Lease up to `count` problems, oldest first: pending ones and those whose lease ran out.
+        An expired problem without attempts left is marked failed instead.
+
+        Returns:
+            List[Dict[str, Any]]: "job_id", "problem" and "attempts" (counting this one) of each leased problem.
+        """
+        def _lease(cursor):
+            now = time.time()
+            cursor.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Lease expired', worker = NULL, updated = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            rows = cursor.execute(
+                "SELECT job_id, problem, attempts FROM jobs "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY position LIMIT ?",
+                (now, count)
+            ).fetchall()
+            cursor.executemany(
+                "UPDATE jobs SET status = 'leased', worker = ?, attempts = attempts + 1, lease_expires = ?, updated = ? "
+                "WHERE job_id = ?",
+                [(worker, now + self.lease_seconds, now, job_id) for job_id, _, _ in rows]
+            )
+            return [{"job_id": job_id, "problem": problem, "attempts": attempts + 1} for job_id, problem, attempts in rows]
+        return self._transaction(_lease)
+
+    def heartbeat(self, worker: str, job_ids: List[str]) -> None:
+        """
+        Renew the leases `worker` still holds on `job_ids`.
+        """
+        if not job_ids:
+            return
+
+        def _renew(cursor):
+            now = time.time()
+            cursor.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE job_id = ? AND status = 'leased' AND worker = ?",
+                [(now + self.lease_seconds, now, job_id, worker) for job_id in job_ids]
+            )
+        self._transaction(_renew)
+
+    def complete(self, job_id: str, worker: str, result: Any) -> bool:
+        """
+        Store the result of a problem leased by `worker`.
+
+        Returns:
+            bool: False if the lease was lost to another worker, whose result is kept instead.
+        """
+        def _complete(cursor):
+            cursor.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_expires = NULL, updated = ? "
+                "WHERE job_id = ? AND status = 'leased' AND worker = ?",
+                (json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id, worker)
+            )
+            return cursor.rowcount == 1
+        return self._transaction(_complete)
+
+    def fail(self, job_id: str, worker: str, error: str) -> Optional[str]:
+        """
+        Give back a problem leased by `worker` after an error: pending again if it has attempts
+        left, failed otherwise.
+
+        Returns:
+            Optional[str]: The new status, or None if the lease was lost to another worker.
+        """
+        def _fail(cursor):
+            cursor.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                "worker = NULL, lease_expires = NULL, error = ?, updated = ? "
+                "WHERE job_id = ? AND status = 'leased' AND worker = ?",
+                (self.max_attempts, error, time.time(), job_id, worker)
+            )
+            if cursor.rowcount != 1:
+                return None
+            return cursor.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0]
+        return self._transaction(_fail)
+
+    def counts(self, batch: Optional[str] = None) -> Dict[str, int]:
+        """
+        Number of problems per status: "pending", "leased", "done" and "failed".
+        """
+        query = "SELECT status, COUNT(*) FROM jobs"
+        parameters = []
+        if batch is not None:
+            query += " WHERE batch = ?"
+            parameters.append(batch)
+        with self._lock:
+            rows = self._connection.execute(query + " GROUP BY status", parameters).fetchall()
+        return {"pending": 0, "leased": 0, "done": 0, "failed": 0, **dict(rows)}
+
+    def results(self, batch: str) -> Iterator[Dict[str, Any]]:
+        """
+        "job_id", "problem", "status", "attempts", "error" and "result" of every problem of a
+        batch, in submission order.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT job_id, problem, status, attempts, error, result FROM jobs WHERE batch = ? ORDER BY position",
+                (batch,)
+            ).fetchall()
+        for job_id, problem, status, attempts, error, result in rows:
+            yield {
+                "job_id": job_id,
+                "problem": problem,
+                "status": status,
+                "attempts": attempts,
+                "error": error,
+                "result": json.loads(result) if result is not None else None
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
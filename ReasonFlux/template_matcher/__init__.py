@@ -1,3 +1,5 @@
+from ReasonFlux.template_matcher.batcher import EmbeddingBatcher
+
 from ReasonFlux.template_matcher.service import (
     EmbeddingService,
     OllamaEmbeddingService,
@@ -6,13 +8,22 @@ from ReasonFlux.template_matcher.service import (
 )
 
 from ReasonFlux.template_matcher.database import (
-    HierarchicalVectorDatabase
+    HierarchicalVectorDatabase,
+    IndexParams
 )
 
+from ReasonFlux.template_matcher.semantic_cache import SemanticCache
+
+from ReasonFlux.template_matcher.tag_index import TagIndex
+
 __all__ = [
+    "EmbeddingBatcher",
     "EmbeddingService",
     "OllamaEmbeddingService",
     "OpenAIEmbeddingService",
     "JinaAIEmbeddingService",
-    "HierarchicalVectorDatabase"
+    "HierarchicalVectorDatabase",
+    "IndexParams",
+    "SemanticCache",
+    "TagIndex"
 ]
\ No newline at end of file
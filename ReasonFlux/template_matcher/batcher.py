@@ -0,0 +1,102 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+
+class _Batch:
+    """Texts gathered for one embedding request, and its outcome"""
+    def __init__(self):
+        self.texts: List[str] = []
+        self.vectors: List[Any] = []
+        self.error: BaseException | None = None
+        self.done = threading.Event()
+
+
+class EmbeddingBatcher(BaseModel):
+    """
+    Gathers the texts encoded by concurrent callers into batched embedding requests.
+
+    A batch is sent at once when no other batch is in flight, so a lone caller never waits.
+    While one is in flight, the first caller of the next batch waits up to `max_wait_ms`
+    for other callers to add their texts, until the batch holds `max_batch` texts, or until
+    the batch in flight is answered. It then sends one request for the distinct texts of the
+    batch and hands every caller its own vectors. Callers block until their batch is
+    answered, and an error of the request is raised in all of them.
+
+    Attributes:
+        max_wait_ms (float): How long the first text of a batch waits for others, in milliseconds.
+        max_batch (int): Number of texts that sends a batch at once.
+        stats (Dict[str, int]): Number of encode requests, texts and batched embedding requests.
+    """
+    max_wait_ms: float = Field(5.0, description="How long the first text of a batch waits for others, in milliseconds")
+    max_batch: int = Field(64, description="Number of texts that sends a batch at once")
+    stats: Dict[str, int] = Field(
+        default_factory=lambda: {"requests": 0, "texts": 0, "batches": 0},
+        description="Number of encode requests, texts and batched embedding requests"
+    )
+
+    _condition: threading.Condition = PrivateAttr(default_factory=threading.Condition)
+    _open: _Batch | None = PrivateAttr(default=None)
+    _in_flight: int = PrivateAttr(default=0)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def submit(self, texts: List[str], embed: Callable[[List[str]], List[Any]]) -> List[Any]:
+        """
+        Encode `texts` as part of the current batch.
+
+        Args:
+            texts (List[str]): The texts of this caller.
+            embed (Callable): Sends one embedding request for a list of texts.
+
+        Returns:
+            List[Any]: The vectors of `texts`, in order.
+        """
+        with self._condition:
+            self.stats["requests"] += 1
+            self.stats["texts"] += len(texts)
+            if self._open is None:
+                self._open = _Batch()
+            batch = self._open
+            offset = len(batch.texts)
+            batch.texts.extend(texts)
+            leader = offset == 0
+            if len(batch.texts) >= self.max_batch:
+                # full, the leader sends it now
+                self._open = None
+                self._condition.notify_all()
+            if leader:
+                deadline = time.monotonic() + self.max_wait_ms / 1000
+                while self._open is batch and self._in_flight > 0 and (remaining := deadline - time.monotonic()) > 0:
+                    self._condition.wait(timeout=remaining)
+                if self._open is batch:
+                    self._open = None
+                self.stats["batches"] += 1
+                self._in_flight += 1
+
+        if leader:
+            try:
+                self._send(batch, embed)
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+        else:
+            batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.vectors[offset:offset + len(texts)]
+
+    @staticmethod
+    def _send(batch: _Batch, embed: Callable[[List[str]], List[Any]]) -> None:
+        try:
+            distinct = list(dict.fromkeys(batch.texts))
+            vectors = dict(zip(distinct, embed(distinct)))
+            batch.vectors = [vectors[text] for text in batch.texts]
+        except BaseException as e:
+            batch.error = e
+        finally:
+            batch.done.set()
@@ -1,15 +1,73 @@
+import os
+import re
 import chromadb
+import numpy as np
 from chromadb.api import ClientAPI
 from pydantic import BaseModel, Field, model_validator
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Literal, Optional
 
+from ReasonFlux.template_matcher.batcher import EmbeddingBatcher
 from ReasonFlux.template_matcher.service import (
     EmbeddingService,
     OpenAIEmbeddingService,
     OllamaEmbeddingService,
     JinaAIEmbeddingService
 )
+from ReasonFlux.template_matcher.tag_index import TagIndex, leaf_tags, normalize_tag, query_tags
+from ReasonFlux.utils.client_registry import client_registry
 from ReasonFlux.utils.common import get_uuid, logger
+from ReasonFlux.utils.tracing import span
+
+
+# "level_<i>", or "level_<i>_<id of the level-0 node>" for a shard of a lower level
+LEVEL_COLLECTION_PATTERN = re.compile(r"^level_(\d+)(?:_(.+))?$")
+
+TAG_INDEX_FILE = "tag_index.json"
+
+
+def _distance_to_similarity(distance: float, space: str = "l2") -> float:
+    # chroma's l2 is the squared euclidean distance, its cosine and ip are 1 - cosine and 1 - dot product
+    if space == "l2":
+        return 1 / (1 + distance)
+    return 1 - distance
+
+
+def exact_distances(embeddings: np.ndarray, query: np.ndarray, space: str = "l2") -> np.ndarray:
+    """
+    Distances of `query` to every row of `embeddings`, as chroma computes them in `space`.
+    """
+    embeddings, query = np.asarray(embeddings, dtype=np.float64), np.asarray(query, dtype=np.float64)
+    if space == "l2":
+        return np.sum((embeddings - query) ** 2, axis=1)
+    if space == "cosine":
+        return 1 - embeddings @ query / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query))
+    return 1 - embeddings @ query
+
+
+class IndexParams(BaseModel):
+    """
+    Distance space and HNSW parameters of the collections of one level.
+
+    Chroma fixes them when a collection is created, so they apply to collections created
+    afterwards; rebuild the database to change them for existing levels.
+
+    Attributes:
+        space (str): Distance space, "l2", "cosine" or "ip".
+        M (int, optional): Links per node of the HNSW graph, None for chroma's default.
+        construction_ef (int, optional): Candidate list size while building, None for chroma's default.
+        search_ef (int, optional): Candidate list size while searching, None for chroma's default.
+    """
+    space: Literal["l2", "cosine", "ip"] = Field("l2", description="Distance space, l2, cosine or ip")
+    M: Optional[int] = Field(None, description="Links per node of the HNSW graph, None for chroma's default")
+    construction_ef: Optional[int] = Field(None, description="Candidate list size while building, None for chroma's default")
+    search_ef: Optional[int] = Field(None, description="Candidate list size while searching, None for chroma's default")
+
+    def metadata(self) -> Dict[str, Any]:
+        metadata = {"hnsw:space": self.space}
+        for key, value in (("hnsw:M", self.M), ("hnsw:construction_ef", self.construction_ef), ("hnsw:search_ef", self.search_ef)):
+            if value is not None:
+                metadata[key] = value
+        return metadata
 
 
 class HierarchicalVectorDatabase(BaseModel):
@@ -21,6 +79,22 @@ class HierarchicalVectorDatabase(BaseModel):
     embedding service to convert text into vectors and ChromaDB as the underlying
     vector database.
 
+    With `shard_by_category`, every level below the first is split into one collection per
+    level-0 node, holding only that category's nodes. A search then queries the shard of the
+    chosen category, so a filtered child query scans that category instead of the whole level.
+
+    Ingestion also fills `tag_index`, an inverted index from the `knowledge_tag` of every leaf
+    to the leaf IDs, saved next to the collections. Given query tags, a search can use it on
+    the last level: "filter" scores only the children of a parent that share a tag with the
+    query, and "boost" scores them in addition to the vector results and raises their
+    similarity by `tag_boost` times the fraction of query tags they carry. Tags carried by
+    more than `max_tag_candidates` leaves are ignored, and a parent without matching
+    children, or a query without informative tags, is searched as usual.
+
+    `index_per_level` sets the distance space and HNSW parameters of each level's collections,
+    the last entry applying to deeper levels. Similarities are computed from the distances
+    in the space of the collection that returned them.
+
     Attributes:
         data_dir (str): The directory where the vector database is stored.
         collections (dict): The collections of the vector database.
@@ -29,6 +103,13 @@ class HierarchicalVectorDatabase(BaseModel):
         chroma_client (ClientAPI): The ChromaDB client used by the vector database.
         embedding_params (dict): The parameters of the embedding function.
         persist (bool): Whether to persist the database.
+        shard_by_category (bool): Whether the levels below the first are split into one collection per level-0 node.
+        index_per_level (List[IndexParams]): Distance space and HNSW parameters per level, empty for chroma's defaults.
+        tag_index (TagIndex): Leaf IDs per normalized knowledge tag.
+        tag_mode (str): How query tags are used on the last level: "off", "filter" or "boost".
+        tag_boost (float): Similarity added to a leaf carrying every query tag in "boost" mode.
+        max_tag_candidates (int): Largest number of leaves a tag may carry and still be used.
+        tag_stats (Dict[str, int]): Searches with tags, and how many used tagged candidates or fell back to the full search.
     """
     data_dir:str = Field(
         default="data",
@@ -70,6 +151,41 @@ class HierarchicalVectorDatabase(BaseModel):
         description="Whether to persist the database"
     )
 
+    shard_by_category: bool = Field(
+        default=False,
+        description="Whether the levels below the first are split into one collection per level-0 node"
+    )
+
+    index_per_level: List[IndexParams] = Field(
+        default_factory=list,
+        description="Distance space and HNSW parameters per level, the last one applying to deeper levels, empty for chroma's defaults"
+    )
+
+    tag_index: TagIndex = Field(
+        default_factory=TagIndex,
+        description="Leaf IDs per normalized knowledge tag"
+    )
+
+    tag_mode: Literal["off", "filter", "boost"] = Field(
+        default="off",
+        description="How query tags are used on the last level: off, filter or boost"
+    )
+
+    tag_boost: float = Field(
+        default=0.1,
+        description="Similarity added to a leaf carrying every query tag in boost mode"
+    )
+
+    max_tag_candidates: int = Field(
+        default=256,
+        description="Largest number of leaves a tag may carry and still be used"
+    )
+
+    tag_stats: Dict[str, int] = Field(
+        default_factory=lambda: {"searches": 0, "narrowed": 0, "fallbacks": 0},
+        description="Searches with tags, and how many used tagged candidates or fell back to the full search"
+    )
+
     class Config:
         arbitrary_types_allowed: bool = True
 
@@ -81,7 +197,13 @@ class HierarchicalVectorDatabase(BaseModel):
                     self.embedding_service = OpenAIEmbeddingService(
                         api_key=self.embedding_params["api_key"],
                         api_base=self.embedding_params["api_base"],
-                        model_name=self.embedding_params["model"]
+                        model_name=self.embedding_params["model"],
+                        http_client=client_registry.get_http_client(
+                            self.embedding_params["api_base"],
+                            self.embedding_params["api_key"],
+                            self.embedding_params["model"],
+                            self.embedding_params.get("http_pool")
+                        )
                     )
                 case "jina":
                     self.embedding_service = JinaAIEmbeddingService(
@@ -95,28 +217,83 @@ class HierarchicalVectorDatabase(BaseModel):
                     )
                 case _:
                     raise ValueError("Invalid embedding provider")
+            if self.embedding_params.get("batching"):
+                self.embedding_service.batcher = EmbeddingBatcher(**self.embedding_params["batching"])
+            self.embedding_service.max_request_texts = self.embedding_params.get("max_request_texts")
         if self.chroma_client is None or not isinstance(self.chroma_client, ClientAPI):
             if self.persist:
                 self.chroma_client = chromadb.PersistentClient(path = self.data_dir)
             else:
                 self.chroma_client = chromadb.EphemeralClient()
             self._load_from_chroma_client()
+            self._load_tag_index()
         return self
 
+    def _load_tag_index(self):
+        """
+        Load the tag index saved with the collections, or rebuild it from the leaf payloads.
+        """
+        path = os.path.join(self.data_dir, TAG_INDEX_FILE)
+        if self.persist and os.path.exists(path):
+            self.tag_index = TagIndex.load(path)
+            return
+        for level in range(self.max_level):
+            for collection in self.level_collections(level):
+                leaves = collection.get(where={"data": {"$ne": ""}}, include=["metadatas"])
+                for leaf_id, meta_data in zip(leaves["ids"], leaves["metadatas"]):
+                    self.tag_index.add(leaf_id, meta_data["parent"], leaf_tags(meta_data["data"]))
+        if len(self.tag_index):
+            logger.info("Rebuilt the tag index of %d leaves", len(self.tag_index))
+            self._save_tag_index()
+
+    def _save_tag_index(self):
+        if self.persist:
+            os.makedirs(self.data_dir, exist_ok=True)
+            self.tag_index.save(os.path.join(self.data_dir, TAG_INDEX_FILE))
+
     def _load_from_chroma_client(self):
         """
-        Load the collections and set max_level from the ChromaDB client.
+        Load the level collections and their shards, and set max_level from the ChromaDB client.
+
+        Raises:
+            ValueError: If `shard_by_category` is set for a database built without shards.
+        """
+        sharded = unsharded = False
+        for collection_name in self.chroma_client.list_collections():
+            match = LEVEL_COLLECTION_PATTERN.match(collection_name)
+            if match is None:
+                continue
+            self.collections[collection_name] = self.chroma_client.get_collection(collection_name)
+            self.max_level = max(self.max_level, int(match.group(1)) + 1)
+            if match.group(2):
+                sharded = True
+            elif match.group(1) != "0":
+                unsharded = True
+        if sharded:
+            self.shard_by_category = True
+        elif unsharded and self.shard_by_category:
+            raise ValueError(f"The database in {self.data_dir} was built without shards, rebuild it to shard by category")
+
+    def _collection_name(self, level: int, root_id: str | None) -> str:
         """
-        i = 0
-        all_collections = self.chroma_client.list_collections()
-        while True:
-            collection_name = f"level_{i}"
-            if collection_name in all_collections:
-                self.collections[collection_name] = self.chroma_client.get_collection(collection_name)
-            else:
-                break
-            i += 1
-        self.max_level = i
+        Name of the collection holding the nodes of `level` under the level-0 node `root_id`.
+        """
+        if self.shard_by_category and level > 0:
+            return f"level_{level}_{root_id}"
+        return f"level_{level}"
+
+    def _space(self, collection_name: str) -> str:
+        return (self.collections[collection_name].metadata or {}).get("hnsw:space", "l2")
+
+    def level_collections(self, level: int) -> list:
+        """
+        The collections holding the nodes of a level: the level itself, or all of its shards.
+        """
+        if self.shard_by_category and level > 0:
+            prefix = f"level_{level}_"
+            return [collection for name, collection in self.collections.items() if name.startswith(prefix)]
+        collection = self.collections.get(f"level_{level}")
+        return [collection] if collection is not None else []
 
     def add_recursive_dict(self, data: Dict[str, Any]):
         """
@@ -126,12 +303,14 @@ class HierarchicalVectorDatabase(BaseModel):
             data (Dict[str, Any]): The recursive dictionary to add to the database.
         """
         level = self._determine_depth(data)
-        for i in range(level):
+        # shards are created when their category is added
+        for i in range(1 if self.shard_by_category else level):
             collection_name = f"level_{i}"
             if collection_name not in self.collections:
                 self._create_collection(collection_name)
         self.max_level = max(self.max_level, level)
         self._recursive_add(data, 0)
+        self._save_tag_index()
 
     def _determine_depth(self, data: Dict[str, Any], current_depth: int = 0) -> int:
         """
@@ -157,10 +336,21 @@ class HierarchicalVectorDatabase(BaseModel):
         Create a new collection in the database.
         :param collection_name: The name of the collection.
         """
-        logger.info(f"Creating collection: {collection_name}")
+        logger.info("Creating collection: %s", collection_name)
         if collection_name not in self.collections:
-            self.collections[collection_name] = self.chroma_client.get_or_create_collection(collection_name)
-        logger.info(f"Collection created: {collection_name}")
+            level = int(LEVEL_COLLECTION_PATTERN.match(collection_name).group(1))
+            index_params = self.index_per_level[min(level, len(self.index_per_level) - 1)] if self.index_per_level else None
+            self.collections[collection_name] = self.chroma_client.get_or_create_collection(
+                collection_name,
+                metadata=index_params.metadata() if index_params else None
+            )
+            if index_params and self._space(collection_name) != index_params.space:
+                # get_or_create keeps the metadata of an existing collection
+                logger.warning(
+                    "Collection %s already exists with space %s, not %s; rebuild the database to change it",
+                    collection_name, self._space(collection_name), index_params.space
+                )
+        logger.info("Collection created: %s", collection_name)
 
     def _delete_collection(self, collection_name: str):
         """
@@ -169,13 +359,13 @@ class HierarchicalVectorDatabase(BaseModel):
         Args:
             collection_name (str): The name of the collection.
         """
-        logger.info(f"Deleting collection: {collection_name}")
+        logger.info("Deleting collection: %s", collection_name)
         if collection_name in self.collections:
             self.chroma_client.delete_collection(collection_name)
             del self.collections[collection_name]
-        logger.info(f"Collection deleted: {collection_name}")
+        logger.info("Collection deleted: %s", collection_name)
 
-    def _recursive_add(self, data: Dict[str, Any], current_level: int, parent_id:str = None):
+    def _recursive_add(self, data: Dict[str, Any], current_level: int, parent_id:str = None, root_id: str = None):
         """
         Recursively build the database.
 
@@ -183,19 +373,21 @@ class HierarchicalVectorDatabase(BaseModel):
             data (Dict[str, Any]): The recursive dictionary.
             current_level (int): Current level in the hierarchy.
             parent_id (str): The parent ID for the current level.
+            root_id (str): The ID of the level-0 node above the current level, for sharding.
         """
         documents = []
         node_ids = []
         embeddings = []
         meta_data_list = [] 
 
-        for key, value in data.items():
+        # the keys of a level are encoded together, in as few requests as the provider allows
+        key_embeddings = self.embedding_service.encode_batch(list(data))
+        for (key, value), current_embedding in zip(data.items(), key_embeddings):
             current_meta_data = []
             current_node_id = str(get_uuid())
-            current_embedding = self.embedding_service.encode(key)
 
             if isinstance(value, dict):
-                self._recursive_add(value, current_level + 1, current_node_id)
+                self._recursive_add(value, current_level + 1, current_node_id, root_id or current_node_id)
                 current_meta_data ={
                     "parent": parent_id or "",
                     "depth": current_level,
@@ -207,6 +399,7 @@ class HierarchicalVectorDatabase(BaseModel):
                     "depth": current_level,
                     "data": str(value)
                 }
+                self.tag_index.add(current_node_id, parent_id or "", leaf_tags(str(value)))
             
             documents.append(key)
             node_ids.append(current_node_id)
@@ -214,7 +407,10 @@ class HierarchicalVectorDatabase(BaseModel):
             meta_data_list.append(current_meta_data)
         
         # 向对应层添加数据
-        self.collections[f"level_{current_level}"].add(
+        collection_name = self._collection_name(current_level, root_id)
+        if collection_name not in self.collections:
+            self._create_collection(collection_name)
+        self.collections[collection_name].add(
             documents=documents,
             ids=node_ids,
             embeddings=embeddings,
@@ -228,7 +424,8 @@ class HierarchicalVectorDatabase(BaseModel):
         top_k_per_level: list[int],
         weight_per_level: list[float],
         search_level: int = None,
-        final_count: int = 1
+        final_count: int = 1,
+        tags: Optional[List[str]] = None
     )-> List[Dict[str,Any]] | None:
         """
         Perform a hierarchical search across multiple levels of the database.
@@ -243,80 +440,256 @@ class HierarchicalVectorDatabase(BaseModel):
             weight_per_level (list[float]): Weights assigned to results from each level.
             search_level (int, optional): The maximum level to search. Defaults to self.max_level.
             final_count (int, optional): Number of final results to return. Defaults to 1.
+            tags (List[str], optional): Knowledge tags of the query, used on the last level according to `tag_mode`.
 
         Returns:
             List[Dict[str, Any]] | None: List of top results with their metadata and distances, or None if an error occurs.
         """
-        def _distance_to_similarity(distance: float) -> float:
-            return 1 / (1 + distance)
-
         if search_level is None:
-            logger.info(f"search level is None, using max level: {self.max_level}")
+            logger.info("search level is None, using max level: %s", self.max_level)
             search_level = self.max_level
         
         if search_level > self.max_level:
-            logger.error(f"search level is out of range, max level is {self.max_level}")
+            logger.error("search level is out of range, max level is %s", self.max_level)
             return None
 
         if len(queries) != len(top_k_per_level) or len(queries) != len(weight_per_level):
             logger.error("queries, top_k_per_level, weight_per_level should have the same length")
             return None
         
-        parent_id_sim_list = []
-        tmp_cand = []
+        return self.hierarchical_search_batch(
+            [queries],
+            top_k_per_level,
+            weight_per_level,
+            search_level=search_level,
+            final_count=final_count,
+            tags_list=[tags]
+        )[0]
+
+    def hierarchical_search_batch(
+        self,
+        queries_list: List[List[str]],
+        top_k_per_level: list[int],
+        weight_per_level: list[float],
+        search_level: int = None,
+        final_count: int = 1,
+        tags_list: Optional[List[Optional[List[str]]]] = None
+    ) -> List[List[Dict[str, Any]] | None]:
+        """
+        Perform the hierarchical search of several problems together.
+
+        Each problem gets the same results as `hierarchical_search`, but the queries of a
+        level are encoded together, in as few embedding requests as `max_request_texts` allows, the first level is searched with one
+        vector query, and problems that share a parent candidate share its filtered query.
+        With `shard_by_category`, the filtered query goes to the shard of the parent's category.
+
+        Args:
+            queries_list (List[List[str]]): The per-level queries of each problem.
+            top_k_per_level (list[int]): Number of top results to retrieve from each level.
+            weight_per_level (list[float]): Weights assigned to results from each level.
+            search_level (int, optional): The maximum level to search. Defaults to self.max_level.
+            final_count (int, optional): Number of final results per problem. Defaults to 1.
+            tags_list (List[List[str]], optional): Knowledge tags of each problem, used on the last level according to `tag_mode`.
+
+        Returns:
+            List[List[Dict[str, Any]] | None]: The results of each problem, in order, or None for a problem whose queries are invalid.
+        """
+        if search_level is None:
+            search_level = self.max_level
+        if search_level > self.max_level:
+            logger.error("search level is out of range, max level is %s", self.max_level)
+            return [None] * len(queries_list)
+
+        valid = []
+        for queries in queries_list:
+            if len(queries) != len(top_k_per_level) or len(queries) != len(weight_per_level):
+                logger.error("queries, top_k_per_level, weight_per_level should have the same length")
+                valid.append(False)
+            else:
+                valid.append(True)
+        problems = [idx for idx, is_valid in enumerate(valid) if is_valid]
+        if not problems:
+            return [None] * len(queries_list)
+
+        # candidates of the previous non-empty level, and of the current level, per problem
+        parents: Dict[int, List[tuple]] = {idx: [] for idx in problems}
+        candidates: Dict[int, List[Dict[str, Any]]] = {idx: [] for idx in problems}
+        # level-0 node above each candidate, which names the shard of its children
+        roots: Dict[str, str] = {}
+        # leaves sharing an informative tag with each problem, with the number of shared tags
+        matched: Dict[int, Dict[str, int]] = {idx: {} for idx in problems}
+        tag_counts: Dict[int, int] = {}
+        if self.tag_mode != "off" and tags_list:
+            for idx in problems:
+                tags = {normalize_tag(tag) for tag in query_tags(tags_list[idx])} - {""}
+                if not tags:
+                    continue
+                self.tag_stats["searches"] += 1
+                tag_counts[idx] = len(tags)
+                matched[idx] = self.tag_index.lookup(tags, self.max_tag_candidates)
+                if not matched[idx]:
+                    self.tag_stats["fallbacks"] += 1
+
         for search_idx in range(search_level):
-            if tmp_cand:
-                parent_id_sim_list = [
-                    (cand["id"], cand["similarity"]) for cand in tmp_cand
-                ]
-                tmp_cand.clear()
-            collection_name = f"level_{search_idx}"
+            for idx in problems:
+                if candidates[idx]:
+                    parents[idx] = [(cand["id"], cand["similarity"]) for cand in candidates[idx]]
+                    candidates[idx] = []
             current_k = top_k_per_level[search_idx]
             current_weight = weight_per_level[search_idx]
-            current_embedding = self.embedding_service.encode(queries[search_idx])
-            
-            if parent_id_sim_list:
-                seen_ids = set()
-                for parent_id, parent_sim in parent_id_sim_list:
+            embeddings = dict(zip(
+                problems,
+                self.embedding_service.encode_batch([queries_list[idx][search_idx] for idx in problems])
+            ))
+
+            # children of a parent that share a tag with the problem, scored outside the vector index
+            last_level = search_idx == search_level - 1
+            tagged: Dict[tuple, List[str]] = {}
+            if last_level:
+                for idx in problems:
+                    if not matched[idx]:
+                        continue
+                    for parent_id, _ in parents[idx] or [(None, 0)]:
+                        children = [
+                            leaf_id for leaf_id in matched[idx]
+                            if self.tag_index.parents[leaf_id] == (parent_id or "")
+                        ]
+                        if children:
+                            tagged[(parent_id, idx)] = children
+                self.tag_stats["narrowed"] += len({idx for _, idx in tagged})
+
+            # one query per parent, for every problem that has it as a candidate
+            groups: Dict[Any, List[int]] = {}
+            for idx in problems:
+                for parent_id, _ in parents[idx] or [(None, 0)]:
+                    if self.tag_mode == "filter" and (parent_id, idx) in tagged:
+                        continue
+                    groups.setdefault(parent_id, []).append(idx)
+            results = {}
+            for parent_id, members in groups.items():
+                collection_name = self._collection_name(search_idx, roots.get(parent_id))
+                if collection_name not in self.collections:
+                    # a category without nodes at this level has no shard
+                    for idx in members:
+                        results[(parent_id, idx)] = {"ids": [], "documents": [], "distances": [], "metadatas": [], "space": "l2"}
+                    continue
+                with span("chroma.query", "vector_query", collection=collection_name, n_results=current_k, batch=len(members)):
                     query_res = self.collections[collection_name].query(
-                        query_embeddings=[current_embedding],
-                        n_results = current_k,
-                        where={"parent": {"$eq": parent_id}}
+                        query_embeddings=[embeddings[idx] for idx in members],
+                        n_results=current_k,
+                        **({"where": {"parent": {"$eq": parent_id}}} if parent_id is not None else {})
                     )
-                    for res_idx in range(0, len(query_res['ids'][0])):
-                        if query_res['ids'][0][res_idx] in seen_ids:
+                for row, idx in enumerate(members):
+                    results[(parent_id, idx)] = {
+                        **{key: query_res[key][row] for key in ("ids", "documents", "distances", "metadatas")},
+                        "space": self._space(collection_name)
+                    }
+                for node_id in (node_id for row in query_res["ids"] for node_id in row):
+                    roots[node_id] = roots.get(parent_id, node_id)
+            for (parent_id, idx), children in tagged.items():
+                scored = self._score_leaves(
+                    self._collection_name(search_idx, roots.get(parent_id)),
+                    children,
+                    embeddings[idx],
+                    current_k
+                )
+                if (parent_id, idx) in results:
+                    # boost: the tagged children are scored in addition to the vector results
+                    scored = {
+                        **{key: results[(parent_id, idx)][key] + scored[key] for key in ("ids", "documents", "distances", "metadatas")},
+                        "space": scored["space"]
+                    }
+                results[(parent_id, idx)] = scored
+
+            for idx in problems:
+                seen_ids = set()
+                for parent_id, parent_sim in parents[idx] or [(None, 0)]:
+                    query_res = results[(parent_id, idx)]
+                    for res_idx in range(len(query_res["ids"])):
+                        if query_res["ids"][res_idx] in seen_ids:
                             continue
-                        tmp_cand.append(
+                        similarity = _distance_to_similarity(query_res["distances"][res_idx], query_res["space"])*current_weight + parent_sim
+                        if last_level and self.tag_mode == "boost" and idx in tag_counts:
+                            similarity += self.tag_boost * matched[idx].get(query_res["ids"][res_idx], 0) / tag_counts[idx]
+                        candidates[idx].append(
                             {
-                                "doc": query_res['documents'][0][res_idx],
-                                "id": query_res['ids'][0][res_idx],
-                                "similarity": _distance_to_similarity(query_res['distances'][0][res_idx])*current_weight + parent_sim,
-                                "meta_data": query_res['metadatas'][0][res_idx],
+                                "doc": query_res["documents"][res_idx],
+                                "id": query_res["ids"][res_idx],
+                                "similarity": similarity,
+                                "meta_data": query_res["metadatas"][res_idx],
                             }
                         )
-                        seen_ids.add(query_res['ids'][0][res_idx])
-            else:
-                seen_ids = set()
-                query_res = self.collections[collection_name].query(
-                    query_embeddings=[current_embedding],
-                    n_results = current_k
-                )
-                for res_idx in range(0, len(query_res['ids'][0])):
-                    if query_res['ids'][0][res_idx] in seen_ids:
-                        continue
-                    tmp_cand.append(
-                        {
-                            "doc": query_res['documents'][0][res_idx],
-                            "id": query_res['ids'][0][res_idx],
-                            "similarity":  _distance_to_similarity(query_res['distances'][0][res_idx])*current_weight,
-                            "meta_data": query_res['metadatas'][0][res_idx],
-                        }
-                    )
-                    seen_ids.add(query_res['ids'][0][res_idx])                
-            pass
+                        seen_ids.add(query_res["ids"][res_idx])
+
+        return [
+            sorted(candidates[idx], key=lambda x: x["similarity"], reverse=True)[:final_count] if is_valid else None
+            for idx, is_valid in enumerate(valid)
+        ]
+
+    def _score_leaves(self, collection_name: str, leaf_ids: List[str], embedding: Any, top_k: int) -> Dict[str, list]:
+        """
+        Score a few leaves by their exact distance in the space of the collection, and return
+        the `top_k` closest in the layout of a query result row.
+        """
+        if collection_name not in self.collections:
+            return {"ids": [], "documents": [], "distances": [], "metadatas": [], "space": "l2"}
+        space = self._space(collection_name)
+        with span("chroma.get", "vector_query", collection=collection_name, n_results=len(leaf_ids)):
+            leaves = self.collections[collection_name].get(ids=leaf_ids, include=["embeddings", "documents", "metadatas"])
+        if not leaves["ids"]:
+            return {"ids": [], "documents": [], "distances": [], "metadatas": [], "space": space}
+        distances = exact_distances(leaves["embeddings"], embedding, space)
+        order = np.argsort(distances, kind="stable")[:top_k]
+        return {
+            "ids": [leaves["ids"][i] for i in order],
+            "documents": [leaves["documents"][i] for i in order],
+            "distances": [float(distances[i]) for i in order],
+            "metadatas": [leaves["metadatas"][i] for i in order],
+            "space": space
+        }
+
+    def leaf_search(
+        self,
+        query: str,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]] | None:
+        """
+        Search the leaf level directly, without walking down the hierarchy.
+
+        Unlike `hierarchical_search`, this only needs a single embedding and a single
+        query, so it can be started before the per-level queries are known.
+
+        Args:
+            query (str): The query text.
+            top_k (int, optional): Number of leaf candidates to return. Defaults to 5.
 
-        final_res = sorted(tmp_cand, key=lambda x: x["similarity"], reverse=True)[:final_count]
-        return final_res
+        Returns:
+            List[Dict[str, Any]] | None: Leaf candidates sorted by similarity, or None if the database is empty.
+        """
+        if self.max_level == 0:
+            logger.error("leaf search on an empty database")
+            return None
+
+        query_embedding = self.embedding_service.encode(query)
+        candidates = []
+        # a sharded leaf level is searched shard by shard and merged
+        for collection in self.level_collections(self.max_level - 1):
+            space = self._space(collection.name)
+            with span("chroma.query", "vector_query", collection=collection.name, n_results=top_k):
+                query_res = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=top_k
+                )
+            candidates.extend(
+                {
+                    "doc": query_res['documents'][0][res_idx],
+                    "id": query_res['ids'][0][res_idx],
+                    "similarity": _distance_to_similarity(query_res['distances'][0][res_idx], space),
+                    "meta_data": query_res['metadatas'][0][res_idx],
+                }
+                for res_idx in range(len(query_res['ids'][0]))
+            )
+        return sorted(candidates, key=lambda x: x["similarity"], reverse=True)[:top_k]
     
     def clear(self):
         """
@@ -326,4 +699,6 @@ class HierarchicalVectorDatabase(BaseModel):
         for collection_name in list(self.collections.keys()):
             self._delete_collection(collection_name)
         self.max_level = 0
+        self.tag_index.clear()
+        self._save_tag_index()
         logger.info("Database cleared successfully.")
\ No newline at end of file
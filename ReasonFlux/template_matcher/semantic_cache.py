@@ -0,0 +1,105 @@
+import json
+from typing import Any, Dict
+
+from chromadb.api import ClientAPI
+from pydantic import BaseModel, Field, PrivateAttr
+
+from ReasonFlux.storage import problem_hash
+from ReasonFlux.template_matcher.service import EmbeddingService
+from ReasonFlux.utils.common import logger
+from ReasonFlux.utils.tracing import span
+
+
+class SemanticCache(BaseModel):
+    """
+    Cache of solved problems in a dedicated vector collection.
+
+    Every completed run is stored under the hash of its problem, with the problem embedding
+    and the full result. A lookup first checks for the exact problem, which needs no
+    embedding, then for the nearest solved problem by cosine similarity. The cache shares
+    the chroma client and embedding service of the hierarchical database, but its collection
+    is not one of the `level_i` collections, so template search is unaffected.
+
+    Attributes:
+        chroma_client (ClientAPI): The ChromaDB client holding the cache collection.
+        embedding_service (EmbeddingService): The embedding service used for problems.
+        collection_name (str): Name of the cache collection.
+        similarity_threshold (float): Minimum cosine similarity (0-1) for reusing a similar problem's plan.
+        stats (Dict[str, int]): Number of lookups, exact hits and similar hits.
+    """
+    chroma_client: ClientAPI = Field(..., description="The ChromaDB client holding the cache collection")
+    embedding_service: EmbeddingService = Field(..., description="The embedding service used for problems")
+    collection_name: str = Field("solved_problems", description="Name of the cache collection")
+    similarity_threshold: float = Field(0.95, description="Minimum cosine similarity (0-1) for reusing a similar problem's plan")
+    stats: Dict[str, int] = Field(
+        default_factory=lambda: {"lookups": 0, "exact": 0, "similar": 0},
+        description="Number of lookups, exact hits and similar hits"
+    )
+
+    _collection: Any = PrivateAttr(default=None)
+
+    class Config:
+        arbitrary_types_allowed: bool = True
+
+    def model_post_init(self, __context: Any) -> None:
+        self._collection = self.chroma_client.get_or_create_collection(
+            self.collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def lookup(self, problem: str) -> Dict[str, Any] | None:
+        """
+        Find a solved problem that is the same as, or similar enough to, `problem`.
+
+        Args:
+            problem (str): The incoming problem.
+
+        Returns:
+            Dict[str, Any] | None: "kind" ("exact" or "similar"), "similarity", the cached
+            "problem" and its "result", or None on a miss.
+        """
+        self.stats["lookups"] += 1
+        exact = self._collection.get(ids=[problem_hash(problem)], include=["documents", "metadatas"])
+        if exact["ids"]:
+            self.stats["exact"] += 1
+            return {
+                "kind": "exact",
+                "similarity": 1.0,
+                "problem": exact["documents"][0],
+                "result": json.loads(exact["metadatas"][0]["result"])
+            }
+
+        if self._collection.count() == 0:
+            return None
+        embedding = self.embedding_service.encode(problem)
+        with span("chroma.query", "vector_query", collection=self.collection_name, n_results=1):
+            query_res = self._collection.query(query_embeddings=[embedding], n_results=1)
+        similarity = 1 - query_res["distances"][0][0]
+        if similarity < self.similarity_threshold:
+            logger.info("Semantic cache miss, nearest similarity %.4f", similarity)
+            return None
+        self.stats["similar"] += 1
+        return {
+            "kind": "similar",
+            "similarity": similarity,
+            "problem": query_res["documents"][0][0],
+            "result": json.loads(query_res["metadatas"][0][0]["result"])
+        }
+
+    def add(self, problem: str, result: Dict[str, Any]) -> None:
+        """
+        Store the result of a completed run, replacing any previous result of the same problem.
+        """
+        self._collection.upsert(
+            ids=[problem_hash(problem)],
+            embeddings=[self.embedding_service.encode(problem)],
+            documents=[problem],
+            metadatas=[{"result": json.dumps(result, ensure_ascii=False, default=str)}]
+        )
+
+    def clear(self) -> None:
+        """
+        Drop every cached problem.
+        """
+        self.chroma_client.delete_collection(self.collection_name)
+        self.model_post_init(None)
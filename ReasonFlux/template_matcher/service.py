@@ -1,7 +1,13 @@
 from abc import ABC
+from typing import List, Optional
 from pydantic import BaseModel, Field
+import httpx
 import numpy as np
+import openai
 from chromadb.utils import embedding_functions
+from ReasonFlux.template_matcher.batcher import EmbeddingBatcher
+from ReasonFlux.utils.scheduler import call_scheduler
+from ReasonFlux.utils.tracing import span
 
 class EmbeddingService(BaseModel, ABC):
     """
@@ -11,18 +17,61 @@ class EmbeddingService(BaseModel, ABC):
     It defines the basic structure and methods that should be implemented by
     any concrete embedding service.
 
+    Every request goes through the process-wide call scheduler, keyed by `endpoint` and `model`.
+    With a batcher, texts encoded concurrently, e.g. by the searches of concurrent runs, are
+    sent together in batched requests. Texts beyond `max_request_texts` are split over
+    several requests, as providers cap the inputs of one request.
+
     Attributes:
         embedding_function (embedding_functions.EmbeddingFunction): The embedding function used by the embedding service.
+        endpoint (str): The API base URL of the embedding model, for rate limiting.
+        model (str): The name of the embedding model, for rate limiting.
+        batcher (EmbeddingBatcher, optional): Gathers concurrent encode calls into batched requests.
+        max_request_texts (int, optional): Most texts sent in one request, None for no limit.
     """
     embedding_function: embedding_functions.EmbeddingFunction = Field(
         default=None,
         description="The embedding function used by the embedding service"
     )
+    endpoint: str = Field("", description="The API base URL of the embedding model, for rate limiting")
+    model: str = Field("", description="The name of the embedding model, for rate limiting")
+    batcher: Optional[EmbeddingBatcher] = Field(None, description="Gathers concurrent encode calls into batched requests")
+    max_request_texts: Optional[int] = Field(None, description="Most texts sent in one request, None for no limit")
     class Config:
         arbitrary_types_allowed: bool = True
 
+    def _embed(self, texts: List[str]) -> List:
+        size = self.max_request_texts or max(len(texts), 1)
+        vectors = []
+        for start in range(0, len(texts), size):
+            chunk = texts[start:start + size]
+            vectors.extend(call_scheduler.call(
+                self.endpoint,
+                self.model,
+                lambda: self.embedding_function(chunk),
+                tokens=sum(len(text) // 4 + 1 for text in chunk),
+                coalesce_key=("embedding", self.endpoint, self.model, tuple(chunk))
+            ))
+        return vectors
+
     def encode(self, text: str) -> np.ndarray:
-        return np.array(self.embedding_function([text])[0])
+        with span("embedding.encode", "embedding", service=type(self).__name__):
+            if self.batcher is not None:
+                return np.array(self.batcher.submit([text], self._embed)[0])
+            return np.array(self._embed([text])[0])
+
+    def encode_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Encode several texts together, sending each distinct text once, in requests of at most
+        `max_request_texts` texts.
+        """
+        distinct = list(dict.fromkeys(texts))
+        with span("embedding.encode_batch", "embedding", service=type(self).__name__, texts=len(distinct)):
+            if self.batcher is not None:
+                vectors = dict(zip(distinct, self.batcher.submit(distinct, self._embed)))
+            else:
+                vectors = dict(zip(distinct, self._embed(distinct)))
+        return [np.array(vectors[text]) for text in texts]
 
 
 class OpenAIEmbeddingService(EmbeddingService):
@@ -37,18 +86,27 @@ class OpenAIEmbeddingService(EmbeddingService):
         api_key (str): The API key for OpenAI.
         api_base (str): The base URL for OpenAI.
         model_name (str): The name of the OpenAI embedding model.
+        http_client (httpx.Client, optional): A shared HTTP client to send the requests through.
     """
     def __init__(self,
         api_key:str,
         api_base:str,
-        model_name: str = "text-embedding-v3"
+        model_name: str = "text-embedding-v3",
+        http_client: httpx.Client | None = None
     ):
-        super().__init__()
+        super().__init__(endpoint=api_base, model=model_name)
         self.embedding_function = embedding_functions.OpenAIEmbeddingFunction(
             api_key = api_key,
             api_base = api_base,
             model_name=model_name
         )
+        if http_client is not None:
+            # chromadb does not accept an HTTP client, so swap in an openai client built on the shared one
+            self.embedding_function._client = openai.OpenAI(
+                api_key=api_key,
+                base_url=api_base,
+                http_client=http_client
+            ).embeddings
 
 class JinaAIEmbeddingService(EmbeddingService):
     """
@@ -67,7 +125,7 @@ class JinaAIEmbeddingService(EmbeddingService):
         api_key:str,
         model_name: str = "jinaai/jina-embeddings-v3"
     ):
-        super().__init__()
+        super().__init__(endpoint="https://api.jina.ai/v1/embeddings", model=model_name)
         self.embedding_function = embedding_functions.JinaEmbeddingFunction(
             model_name=model_name,
             api_key=api_key
@@ -90,7 +148,7 @@ class OllamaEmbeddingService(EmbeddingService):
         url:str,
         model_name: str = "llama2"
     ):
-        super().__init__()
+        super().__init__(endpoint=url, model=model_name)
         self.embedding_function = embedding_functions.OllamaEmbeddingFunction(
             url=url,
             model_name=model_name
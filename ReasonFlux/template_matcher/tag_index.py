@@ -0,0 +1,91 @@
+import json
+import os
+from typing import Any, Dict, Iterable, List, Set
+
+from pydantic import BaseModel, Field
+
+
+def normalize_tag(tag: str) -> str:
+    return " ".join(str(tag).split()).casefold()
+
+
+def leaf_tags(data: str) -> List[str]:
+    """
+    The `knowledge_tag` list of a leaf payload, or an empty list if it has none.
+    """
+    try:
+        payload = json.loads(data)
+    except (TypeError, ValueError):
+        return []
+    tags = payload.get("knowledge_tag", []) if isinstance(payload, dict) else []
+    return [tag for tag in tags if isinstance(tag, str)] if isinstance(tags, list) else []
+
+
+def query_tags(tags: Any) -> List[str]:
+    """
+    The tags of a query as a list: "Examined Knowledge" comes from the model's JSON, so a
+    single string is taken as one tag and any other non-list value as no tags.
+    """
+    if isinstance(tags, str):
+        return [tags]
+    return [tag for tag in tags if isinstance(tag, str)] if isinstance(tags, list) else []
+
+
+class TagIndex(BaseModel):
+    """
+    Inverted index from normalized knowledge tags to the IDs of the leaves carrying them.
+
+    Attributes:
+        postings (Dict[str, Set[str]]): Leaf IDs per normalized tag.
+        parents (Dict[str, str]): Parent ID of every indexed leaf, "" for a leaf at level 0.
+    """
+    postings: Dict[str, Set[str]] = Field(default_factory=dict, description="Leaf IDs per normalized tag")
+    parents: Dict[str, str] = Field(default_factory=dict, description="Parent ID of every indexed leaf")
+
+    def add(self, leaf_id: str, parent_id: str, tags: Iterable[str]) -> None:
+        normalized = {normalize_tag(tag) for tag in tags if normalize_tag(tag)}
+        if not normalized:
+            return
+        self.parents[leaf_id] = parent_id
+        for tag in normalized:
+            self.postings.setdefault(tag, set()).add(leaf_id)
+
+    def lookup(self, tags: Iterable[str], max_postings: int) -> Dict[str, int]:
+        """
+        Leaves sharing at least one tag with `tags`, and how many they share.
+
+        Tags carried by more than `max_postings` leaves do not narrow the search and are ignored.
+
+        Args:
+            tags (Iterable[str]): The tags of the query, e.g. the Navigator's "Examined Knowledge".
+            max_postings (int): Largest number of leaves a tag may carry to be used.
+
+        Returns:
+            Dict[str, int]: The overlap per leaf ID, empty if no tag is informative.
+        """
+        overlap: Dict[str, int] = {}
+        for tag in {normalize_tag(tag) for tag in tags}:
+            leaves = self.postings.get(tag, ())
+            if len(leaves) > max_postings:
+                continue
+            for leaf_id in leaves:
+                overlap[leaf_id] = overlap.get(leaf_id, 0) + 1
+        return overlap
+
+    def clear(self) -> None:
+        self.postings.clear()
+        self.parents.clear()
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.model_dump_json())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TagIndex":
+        with open(path, "r") as f:
+            return cls.model_validate_json(f.read())
+
+    def __len__(self) -> int:
+        return len(self.parents)
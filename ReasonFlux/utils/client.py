@@ -1,19 +1,28 @@
 from ReasonFlux.config import (
     AgentSettings,
+    CheckpointStoreSettings,
     EmbeddingSettings,
-    HierarchicalDataBaseSettings
+    HierarchicalDataBaseSettings,
+    SchedulerSettings,
+    SemanticCacheSettings,
+    TrajectoryStoreSettings
 )
 
-from ReasonFlux.agent import BaseAgent, Navigator, Inference
+from ReasonFlux.agent import BaseAgent, Navigator, Inference, RetryPolicy, TemplateProjection
 
 from ReasonFlux.template_matcher import (
     EmbeddingService,
     OpenAIEmbeddingService,
     OllamaEmbeddingService,
     JinaAIEmbeddingService,
-    HierarchicalVectorDatabase
+    HierarchicalVectorDatabase,
+    SemanticCache
 )
 
+from ReasonFlux.storage import CheckpointStore, TrajectoryStore
+
+from ReasonFlux.utils.scheduler import CallScheduler, call_scheduler
+
 
 
 def initialize_agent(config_file:str) -> BaseAgent:
@@ -35,8 +44,11 @@ def initialize_agent(config_file:str) -> BaseAgent:
     """
     agent_settings:AgentSettings = AgentSettings.from_yaml(config_file)
 
+    extra_params = {}
     if agent_settings.type == "navigator":
         AgentType = Navigator
+        if agent_settings.template_projection is not None:
+            extra_params["template_projection"] = TemplateProjection(**agent_settings.template_projection.model_dump())
     elif agent_settings.type == "inference":
         AgentType = Inference
     else:
@@ -55,11 +67,18 @@ def initialize_agent(config_file:str) -> BaseAgent:
             "temperature": agent_settings.llm.temperature,
             "max_tokens": agent_settings.llm.max_tokens,
             "timeout": agent_settings.llm.timeout,
-            "max_retries": agent_settings.llm.max_retries,
             "vision": agent_settings.llm.enable_vision,
             "function_calling": agent_settings.llm.enable_function_calling,
-            "json_output": agent_settings.llm.enable_json_output
-        }
+            "json_output": agent_settings.llm.enable_json_output,
+            "http_pool": agent_settings.llm.http_pool.model_dump()
+        },
+        stage_params={
+            stage: stage_settings.model_dump(exclude_none=True)
+            for stage, stage_settings in agent_settings.stages.items()
+        },
+        retry_policy=RetryPolicy(**agent_settings.retry.model_dump()),
+        prompt_layout=agent_settings.prompt_layout,
+        **extra_params
     )
 
     return agent
@@ -123,11 +142,94 @@ def initialize_hierarchical_database(config_file: str):
     hierarchical_settings:HierarchicalDataBaseSettings = HierarchicalDataBaseSettings.from_yaml(config_file)
     hierarchical_database = HierarchicalVectorDatabase(
         data_dir=hierarchical_settings.data_dir,
+        shard_by_category=hierarchical_settings.shard_by_category,
+        index_per_level=[params.model_dump() for params in hierarchical_settings.index_per_level],
+        tag_mode=hierarchical_settings.tag_mode,
+        tag_boost=hierarchical_settings.tag_boost,
+        max_tag_candidates=hierarchical_settings.max_tag_candidates,
         embedding_params={
             "api_key": hierarchical_settings.embedding_service.api_key,
             "api_base": hierarchical_settings.embedding_service.api_base,
             "model": hierarchical_settings.embedding_service.model,
-            "provider": hierarchical_settings.embedding_service.provider
+            "provider": hierarchical_settings.embedding_service.provider,
+            "http_pool": hierarchical_settings.embedding_service.http_pool.model_dump(),
+            "batching": (
+                hierarchical_settings.embedding_service.batching.model_dump()
+                if hierarchical_settings.embedding_service.batching else None
+            ),
+            "max_request_texts": hierarchical_settings.embedding_service.max_request_texts
         }
     )
-    return hierarchical_database
\ No newline at end of file
+    return hierarchical_database
+
+def initialize_trajectory_store(config_file: str) -> TrajectoryStore:
+    """
+    Initialize a trajectory store based on the provided configuration file.
+
+    Args:
+        config_file (str): The path to the configuration file.
+
+    Returns:
+        TrajectoryStore: The initialized trajectory store instance.
+    """
+    store_settings:TrajectoryStoreSettings = TrajectoryStoreSettings.from_yaml(config_file)
+    return TrajectoryStore(**store_settings.model_dump())
+
+def initialize_semantic_cache(config_file: str, hierarchical_database: HierarchicalVectorDatabase) -> SemanticCache:
+    """
+    Initialize a semantic cache based on the provided configuration file.
+
+    The cache lives in the chroma client of the hierarchical database and embeds problems
+    with its embedding service.
+
+    Args:
+        config_file (str): The path to the configuration file.
+        hierarchical_database (HierarchicalVectorDatabase): The database the cache shares its client with.
+
+    Returns:
+        SemanticCache: The initialized semantic cache instance.
+    """
+    cache_settings:SemanticCacheSettings = SemanticCacheSettings.from_yaml(config_file)
+    return SemanticCache(
+        chroma_client=hierarchical_database.chroma_client,
+        embedding_service=hierarchical_database.embedding_service,
+        **cache_settings.model_dump()
+    )
+
+def initialize_checkpoint_store(config_file: str) -> CheckpointStore:
+    """
+    Initialize a checkpoint store based on the provided configuration file.
+
+    Args:
+        config_file (str): The path to the configuration file.
+
+    Returns:
+        CheckpointStore: The initialized checkpoint store instance.
+    """
+    checkpoint_settings:CheckpointStoreSettings = CheckpointStoreSettings.from_yaml(config_file)
+    return CheckpointStore(**checkpoint_settings.model_dump())
+
+def initialize_scheduler(config_file: str) -> CallScheduler:
+    """
+    Configure the process-wide call scheduler based on the provided configuration file.
+
+    The rate limits of the file replace those of the same endpoint and model, other limits
+    are kept.
+
+    Args:
+        config_file (str): The path to the configuration file.
+
+    Returns:
+        CallScheduler: The process-wide call scheduler.
+    """
+    scheduler_settings:SchedulerSettings = SchedulerSettings.from_yaml(config_file)
+    call_scheduler.coalesce = scheduler_settings.coalesce
+    for limit in scheduler_settings.limits:
+        call_scheduler.configure(
+            limit.base_url,
+            limit.model,
+            requests_per_minute=limit.requests_per_minute,
+            tokens_per_minute=limit.tokens_per_minute,
+            burst_seconds=limit.burst_seconds
+        )
+    return call_scheduler
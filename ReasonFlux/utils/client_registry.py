@@ -0,0 +1,97 @@
+import threading
+from typing import Dict, Tuple
+
+import httpx
+from pydantic import BaseModel, Field, PrivateAttr
+
+from ReasonFlux.utils.common import logger
+
+
+DEFAULT_HTTP_POOL = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0
+}
+
+
+class ClientRegistry(BaseModel):
+    """
+    Process-wide registry of keep-alive HTTP clients.
+
+    Agents and embedding services that talk to the same endpoint with the same credentials
+    and model share one `httpx.Client`, so they share its connection pool and TLS sessions
+    instead of opening their own. Clients are created on first use and live until `close`.
+
+    Attributes:
+        clients (dict): The shared clients, keyed by (base_url, api_key, model).
+        pools (dict): The pool settings each client was created with.
+    """
+    clients: Dict[Tuple[str, str, str], httpx.Client] = Field(
+        default_factory=dict,
+        description="The shared clients, keyed by (base_url, api_key, model)"
+    )
+
+    pools: Dict[Tuple[str, str, str], dict] = Field(
+        default_factory=dict,
+        description="The pool settings each client was created with"
+    )
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def get_http_client(
+        self,
+        base_url: str,
+        api_key: str,
+        model: str,
+        pool: dict | None = None
+    ) -> httpx.Client:
+        """
+        Return the shared client for an endpoint, creating it if needed.
+
+        Args:
+            base_url (str): The API base URL.
+            api_key (str): The API key.
+            model (str): The model name.
+            pool (dict, optional): `max_connections`, `max_keepalive_connections` and
+                `keepalive_expiry` of the pool. Only used when the client is created.
+
+        Returns:
+            httpx.Client: The shared client.
+        """
+        key = (base_url, api_key, model)
+        pool = {**DEFAULT_HTTP_POOL, **(pool or {})}
+        with self._lock:
+            client = self.clients.get(key)
+            if client is not None and not client.is_closed:
+                if pool != self.pools[key]:
+                    logger.warning("HTTP client for %s at %s already exists, ignoring pool settings %s", model, base_url, pool)
+                return client
+
+            logger.info("Creating shared HTTP client for %s at %s with pool %s", model, base_url, pool)
+            client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=pool["max_connections"],
+                    max_keepalive_connections=pool["max_keepalive_connections"],
+                    keepalive_expiry=pool["keepalive_expiry"]
+                ),
+                follow_redirects=True
+            )
+            self.clients[key] = client
+            self.pools[key] = pool
+            return client
+
+    def close(self):
+        """
+        Close every shared client and forget them.
+        """
+        with self._lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+            self.pools.clear()
+
+
+client_registry = ClientRegistry()
@@ -1,12 +1,62 @@
+import atexit
+import copy
+import json
+import queue
+import random
+import sys
 import uuid
 import logging
+import logging.handlers
+from typing import Any, Dict
+
 import colorama
 from colorama import Fore, Style
 
-# Initialize colorama
-colorama.init(autoreset=True)
+from ReasonFlux.config import LoggingSettings
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has, anything else on a record was passed through `extra`.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+def record_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    """
+    The structured fields of a record, i.e. the `extra` passed to the logging call.
+    """
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+def limit_field(value: Any, max_chars: int) -> Any:
+    """
+    Keep a field as it is when its JSON form fits in `max_chars`, else truncate it to a string.
+    A limit of 0 disables truncation.
+    """
+    if not max_chars:
+        return value
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if len(text) <= max_chars:
+        return value
+    return f"{text[:max_chars]}... [{len(text) - max_chars} more chars]"
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text formatter that appends the structured fields of a record, each on its own line"""
+    def __init__(self, fmt: str = LOG_FORMAT, max_field_chars: int = 2000):
+        super().__init__(fmt)
+        self.max_field_chars = max_field_chars
+
+    def format(self, record):
+        text = super().format(record)
+        for key, value in record_fields(record).items():
+            value = limit_field(value, self.max_field_chars)
+            if not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False, indent=2, default=str)
+            text += f"\n  {key}: {value}"
+        return text
+
 
-class ColorFormatter(logging.Formatter):
+class ColorFormatter(TextFormatter):
     """Custom formatter to set colors and bold text for different log levels"""
     COLOR_CODES = {
         logging.DEBUG: Fore.CYAN,
@@ -19,18 +69,70 @@ class ColorFormatter(logging.Formatter):
     def format(self, record):
         color_code = self.COLOR_CODES.get(record.levelno, "")
         return color_code + super().format(record) + Style.RESET_ALL
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the structured fields as top-level keys"""
+    def __init__(self, max_field_chars: int = 2000):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record_fields(record).items():
+            entry[key] = limit_field(value, self.max_field_chars)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class PayloadSampler(logging.Filter):
+    """Keeps the structured fields of only a fraction of the records at INFO and below"""
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        if record.levelno <= logging.INFO and random.random() >= self.sample_rate:
+            for key in record_fields(record):
+                delattr(record, key)
+        return True
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves the exception of a record to the listener's formatter.
+
+    The stock `prepare` renders the traceback into the message and drops `exc_info`, so a
+    JSON record would carry it in "message" instead of "exception".
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
 def get_uuid():
     return str(uuid.uuid4())
 
 def get_logger(name):
-    """Get a logger with colored and bold text output"""
+    """Get a logger with plain text output, see `configure_logging` for the other modes"""
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)  # Set the log level
 
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.DEBUG)
 
-    formatter = ColorFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    formatter = TextFormatter()
     console_handler.setFormatter(formatter)
 
     logger.addHandler(console_handler)
@@ -38,12 +140,74 @@ def get_logger(name):
 
 logger = get_logger("ReasonFlux")
 
+_listener: logging.handlers.QueueListener | None = None
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(settings: LoggingSettings | None = None, stream=None) -> None:
+    """
+    Replace the handlers of the ReasonFlux logger.
+
+    In asynchronous mode the calling thread only puts the record on a queue; a background
+    listener formats it and writes it to the stream, so workers never wait on each other's
+    stream I/O. Structured fields passed through `extra` are formatted by the listener,
+    truncated to `max_field_chars` and, at INFO and below, kept for `sample_rate` of the records.
+
+    Args:
+        settings (LoggingSettings, optional): The logging settings. Defaults to `LoggingSettings()`.
+        stream (optional): The stream to write to. Defaults to stderr.
+    """
+    settings = settings or LoggingSettings()
+    _stop_listener()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    logger.setLevel(settings.level)
+
+    if settings.format == "json":
+        formatter = JsonFormatter(settings.max_field_chars)
+    elif settings.color:
+        colorama.init()
+        formatter = ColorFormatter(max_field_chars=settings.max_field_chars)
+    else:
+        formatter = TextFormatter(max_field_chars=settings.max_field_chars)
+    stream_handler = logging.StreamHandler(stream or sys.stderr)
+    stream_handler.setFormatter(formatter)
+    if settings.sample_rate < 1.0:
+        stream_handler.addFilter(PayloadSampler(settings.sample_rate))
+
+    if settings.asynchronous:
+        global _listener
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(RecordQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        logger.addHandler(stream_handler)
+
+
+def flush_logging() -> None:
+    """
+    Write out every queued record in asynchronous mode.
+    """
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+atexit.register(_stop_listener)
+
 if __name__ == "__main__":
     logger.info("Hello, World!")
     logger.debug("This is a debug message.")
     logger.warning("This is a warning message.")
     logger.error("This is an error message.")
     logger.critical("This is a critical message.")
-    logger.info("Hello, World!")
-    logger.debug("This is a debug message.")
-    logger.warning("This is a warning message.")
\ No newline at end of file
+    configure_logging(LoggingSettings(format="json", asynchronous=True))
+    logger.info("Retrieved template", extra={"similarity": 0.93, "template": {"template_name": "Example"}})
+    logger.warning("This is a warning message.")
@@ -0,0 +1,251 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from copy import deepcopy
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from ReasonFlux.utils.common import logger
+
+
+# How far the current run is, from 0 to 1. Calls of runs closer to completion go first.
+_run_progress: ContextVar[float] = ContextVar("reasonflux_run_progress", default=0.0)
+
+
+def set_run_progress(progress: float) -> None:
+    """
+    Record how far the run in the current context is, from 0 (just started) to 1.
+    """
+    _run_progress.set(progress)
+
+
+@contextmanager
+def run_progress():
+    """
+    Scope the progress of a run to a block, starting at 0.
+    """
+    token = _run_progress.set(0.0)
+    try:
+        yield
+    finally:
+        _run_progress.reset(token)
+
+
+class TokenBucket(BaseModel):
+    """
+    Refills at `rate_per_minute` up to `capacity`, and is drawn from by every call.
+
+    Attributes:
+        rate_per_minute (float): Units added per minute.
+        capacity (float): Units the bucket holds at most, i.e. the largest burst.
+        level (float): Units currently available.
+        updated (float): Monotonic time of the last refill.
+    """
+    rate_per_minute: float = Field(..., description="Units added per minute")
+    capacity: float = Field(..., description="Units the bucket holds at most")
+    level: float = Field(0.0, description="Units currently available")
+    updated: float = Field(default_factory=time.monotonic, description="Monotonic time of the last refill")
+
+    def model_post_init(self, __context: Any) -> None:
+        self.level = self.capacity
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate_per_minute / 60)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` units are available. Amounts above the capacity wait for a full bucket.
+        """
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) * 60 / self.rate_per_minute
+
+    def consume(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimit(BaseModel):
+    """
+    Request and token limits of one (endpoint, model).
+
+    Attributes:
+        requests (TokenBucket): Bucket of requests, if limited.
+        tokens (TokenBucket): Bucket of tokens, if limited.
+    """
+    requests: Optional[TokenBucket] = Field(None, description="Bucket of requests, if limited")
+    tokens: Optional[TokenBucket] = Field(None, description="Bucket of tokens, if limited")
+
+    def delay(self, tokens: int, now: float) -> float:
+        return max(
+            self.requests.delay(1, now) if self.requests else 0.0,
+            self.tokens.delay(tokens, now) if self.tokens else 0.0
+        )
+
+    def consume(self, tokens: int) -> None:
+        if self.requests:
+            self.requests.consume(1)
+        if self.tokens:
+            self.tokens.consume(tokens)
+
+
+class CallScheduler(BaseModel):
+    """
+    Process-wide gate in front of every LLM and embedding call.
+
+    Calls to an (endpoint, model) with a rate limit wait in a priority queue until both its
+    request and token buckets allow them, so concurrent runs share the provider's limits
+    instead of tripping them and retrying together. The queue favours calls of runs closer
+    to completion (see `set_run_progress`), then arrival order. With `coalesce`, a call
+    identical to one in flight waits for that call and gets a copy of its result instead of
+    reaching the provider. Calls to an (endpoint, model) without a limit are not queued.
+
+    Attributes:
+        limits (dict): The rate limits, keyed by (endpoint, model).
+        coalesce (bool): Whether identical in-flight calls share one provider call.
+        stats (dict): Number of calls, coalesced calls and delayed calls, and the total wait in seconds.
+    """
+    limits: Dict[Tuple[str, str], RateLimit] = Field(
+        default_factory=dict,
+        description="The rate limits, keyed by (endpoint, model)"
+    )
+    coalesce: bool = Field(False, description="Whether identical in-flight calls share one provider call")
+    stats: Dict[str, float] = Field(
+        default_factory=lambda: {"calls": 0, "coalesced": 0, "delayed": 0, "wait_seconds": 0.0},
+        description="Number of calls, coalesced calls and delayed calls, and the total wait in seconds"
+    )
+
+    _condition: threading.Condition = PrivateAttr(default_factory=threading.Condition)
+    _queues: Dict[Tuple[str, str], List[Tuple[float, int]]] = PrivateAttr(default_factory=dict)
+    _sequence: Any = PrivateAttr(default_factory=itertools.count)
+    _in_flight: Dict[Any, Future] = PrivateAttr(default_factory=dict)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def configure(
+        self,
+        endpoint: str,
+        model: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        burst_seconds: float = 60.0
+    ) -> None:
+        """
+        Set the rate limit of an (endpoint, model), replacing any previous one.
+
+        Args:
+            endpoint (str): The API base URL.
+            model (str): The model name.
+            requests_per_minute (float, optional): Request limit, None for no limit.
+            tokens_per_minute (float, optional): Token limit, None for no limit.
+            burst_seconds (float): Seconds' worth of the limits that may be used at once.
+        """
+        def bucket(rate: Optional[float]) -> Optional[TokenBucket]:
+            if rate is None:
+                return None
+            return TokenBucket(rate_per_minute=rate, capacity=max(rate * burst_seconds / 60, 1.0))
+
+        with self._condition:
+            self.limits[(endpoint, model)] = RateLimit(
+                requests=bucket(requests_per_minute),
+                tokens=bucket(tokens_per_minute)
+            )
+
+    def reset(self) -> None:
+        """
+        Remove every rate limit, stop coalescing and clear the stats.
+        """
+        with self._condition:
+            self.limits.clear()
+            self.coalesce = False
+            self.stats.update(calls=0, coalesced=0, delayed=0, wait_seconds=0.0)
+            self._condition.notify_all()
+
+    def call(
+        self,
+        endpoint: str,
+        model: str,
+        fn: Callable[[], Any],
+        tokens: int = 0,
+        coalesce_key: Any = None
+    ) -> Any:
+        """
+        Run `fn` in the calling thread once the rate limit of (endpoint, model) allows it.
+
+        Args:
+            endpoint (str): The API base URL.
+            model (str): The model name.
+            fn (Callable): Sends the request and returns its result.
+            tokens (int): Estimated tokens of the request, drawn from the token bucket.
+            coalesce_key (optional): Identity of the request; calls with the same key share one call.
+
+        Returns:
+            Any: The result of `fn`, or a copy of the result of the identical call in flight.
+        """
+        leader = None
+        with self._condition:
+            self.stats["calls"] += 1
+            if self.coalesce and coalesce_key is not None:
+                follower = self._in_flight.get(coalesce_key)
+                if follower is None:
+                    leader = self._in_flight[coalesce_key] = Future()
+                else:
+                    self.stats["coalesced"] += 1
+        if self.coalesce and coalesce_key is not None and leader is None:
+            return deepcopy(follower.result())
+
+        try:
+            self._acquire((endpoint, model), tokens)
+            result = fn()
+        except BaseException as e:
+            if leader is not None:
+                leader.set_exception(e)
+            raise
+        else:
+            if leader is not None:
+                leader.set_result(result)
+            return result
+        finally:
+            if leader is not None:
+                with self._condition:
+                    del self._in_flight[coalesce_key]
+
+    def _acquire(self, key: Tuple[str, str], tokens: int) -> None:
+        with self._condition:
+            if key not in self.limits:
+                return
+            queue = self._queues.setdefault(key, [])
+            entry = (-_run_progress.get(), next(self._sequence))
+            heapq.heappush(queue, entry)
+            start = time.monotonic()
+            try:
+                while True:
+                    limit = self.limits.get(key)
+                    if limit is None:
+                        break
+                    if queue[0] == entry:
+                        delay = limit.delay(tokens, time.monotonic())
+                        if delay <= 0:
+                            limit.consume(tokens)
+                            break
+                        self._condition.wait(timeout=delay)
+                    else:
+                        self._condition.wait()
+            finally:
+                queue.remove(entry)
+                heapq.heapify(queue)
+                self._condition.notify_all()
+            waited = time.monotonic() - start
+            if waited > 0.001:
+                self.stats["delayed"] += 1
+                self.stats["wait_seconds"] += waited
+                logger.debug("Call to %s at %s waited %.3fs for its rate limit", key[1], key[0], waited)
+
+
+call_scheduler = CallScheduler()
@@ -0,0 +1,197 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Literal
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from opentelemetry import metrics, trace
+from pydantic import BaseModel, Field
+
+tracer = trace.get_tracer("ReasonFlux")
+meter = metrics.get_meter("ReasonFlux")
+span_duration = meter.create_histogram(
+    "reasonflux.span.duration",
+    unit="s",
+    description="Duration of ReasonFlux stages, LLM calls, embedding calls and vector queries"
+)
+
+SpanKind = Literal["run", "stage", "iteration", "llm", "embedding", "vector_query"]
+
+
+class SpanRecord(BaseModel):
+    """
+    A finished span, as kept in the per-run trace.
+
+    Attributes:
+        name (str): Name of the span.
+        kind (str): What the span measures: run, stage, iteration, llm, embedding or vector_query.
+        duration (float): Wall-clock duration in seconds.
+        attributes (dict): Attributes set on the span.
+    """
+    name: str = Field(..., description="Name of the span")
+    kind: SpanKind = Field(..., description="What the span measures")
+    duration: float = Field(0.0, description="Wall-clock duration in seconds")
+    attributes: Dict[str, Any] = Field(default_factory=dict, description="Attributes set on the span")
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+        trace.get_current_span().set_attribute(f"reasonflux.{key}", value)
+
+
+class RunTrace(BaseModel):
+    """
+    Spans recorded during one `ReasonFlux.run`, summarized into `task_meta_data["timing"]`.
+
+    Attributes:
+        spans (List[SpanRecord]): The finished spans, in completion order.
+    """
+    spans: List[SpanRecord] = Field(default_factory=list, description="The finished spans, in completion order")
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the spans per stage and per kind of call.
+
+        Returns:
+            Dict[str, Any]: Total, per-stage and per-iteration durations, every LLM call with its
+            latency, tokens and retries, and the count and total time of embedding calls and vector queries.
+        """
+        def _total(kind: str) -> Dict[str, Any]:
+            records = [record for record in self.spans if record.kind == kind]
+            return {
+                "count": len(records),
+                "total": sum(record.duration for record in records)
+            }
+
+        return {
+            "total": sum(record.duration for record in self.spans if record.kind == "run"),
+            "stages": {record.name: record.duration for record in self.spans if record.kind == "stage"},
+            "iterations": [record.duration for record in self.spans if record.kind == "iteration"],
+            "llm_calls": [
+                {"name": record.name, "duration": record.duration, **record.attributes}
+                for record in self.spans if record.kind == "llm"
+            ],
+            "embedding": _total("embedding"),
+            "vector_query": _total("vector_query"),
+        }
+
+
+_current_run: ContextVar[RunTrace | None] = ContextVar("reasonflux_run_trace", default=None)
+
+
+@contextmanager
+def span(name: str, kind: SpanKind, **attributes):
+    """
+    Measure a block as an OpenTelemetry span and record it in the current run trace.
+
+    Args:
+        name (str): Name of the span.
+        kind (str): What the span measures.
+        **attributes: Initial span attributes.
+
+    Yields:
+        SpanRecord: The record, whose attributes can still be set inside the block.
+    """
+    record = SpanRecord(name=name, kind=kind)
+    with tracer.start_as_current_span(name, attributes={"reasonflux.kind": kind}):
+        for key, value in attributes.items():
+            record.set_attribute(key, value)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.duration = time.perf_counter() - start
+            span_duration.record(record.duration, {"name": name, "kind": kind})
+            run_trace = _current_run.get()
+            if run_trace is not None:
+                run_trace.spans.append(record)
+
+
+@contextmanager
+def trace_run(name: str = "reason_flux.run"):
+    """
+    Start a per-run trace that every span opened in this context, including threads
+    started with a copy of it, is recorded into.
+
+    Yields:
+        RunTrace: The trace of the run.
+    """
+    run_trace = RunTrace()
+    token = _current_run.set(run_trace)
+    try:
+        with span(name, "run"):
+            yield run_trace
+    finally:
+        _current_run.reset(token)
+
+
+@contextmanager
+def attach_run(run_trace: RunTrace):
+    """
+    Record the spans opened in this context into an existing run trace, e.g. when the
+    stages of one run are executed by different threads.
+
+    Yields:
+        RunTrace: The trace of the run.
+    """
+    token = _current_run.set(run_trace)
+    try:
+        yield run_trace
+    finally:
+        _current_run.reset(token)
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    Collect the token usage reported by the provider for every generation of a chain, including
+    the prompt tokens it served from its prompt cache.
+    """
+    def __init__(self):
+        super().__init__()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+
+    def on_llm_end(self, response: LLMResult, **kwargs) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.prompt_tokens += usage.get("input_tokens", 0)
+                    self.completion_tokens += usage.get("output_tokens", 0)
+                    self.cached_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+
+def configure_tracing(exporter: Literal["console", "otlp"] = "otlp", endpoint: str | None = None) -> None:
+    """
+    Install an OpenTelemetry SDK tracer and meter provider that export ReasonFlux spans and metrics.
+
+    Without this (or an equivalent setup by the host application) the spans are no-ops and
+    only the per-run summary in `task_meta_data["timing"]` is produced.
+
+    Args:
+        exporter (str): "otlp" to send to an OTLP/gRPC collector, "console" to print to stdout.
+        endpoint (str, optional): The OTLP collector endpoint, defaults to the exporter's own default.
+    """
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        span_exporter = OTLPSpanExporter(endpoint=endpoint)
+        metric_exporter = OTLPMetricExporter(endpoint=endpoint)
+    else:
+        span_exporter = ConsoleSpanExporter()
+        metric_exporter = ConsoleMetricExporter()
+
+    resource = Resource.create({"service.name": "ReasonFlux"})
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(tracer_provider)
+    metrics.set_meter_provider(
+        MeterProvider(resource=resource, metric_readers=[PeriodicExportingMetricReader(metric_exporter)])
+    )
@@ -0,0 +1,151 @@
+import sys, os
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+sys.path.append(os.getcwd())
+from ReasonFlux.template_matcher import HierarchicalVectorDatabase
+from benchmarks.synthetic import FakeEmbeddingService, count_nodes, sample_paths, synthetic_library
+
+
+def config() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline microbenchmark of hierarchical template ingestion and retrieval")
+    parser.add_argument("--leaves", type=int, nargs="+", default=[1000, 10000], help="Library sizes (number of templates) to benchmark, up to 10^6")
+    parser.add_argument("--depths", type=int, nargs="+", default=[3], help="Hierarchy depths to benchmark, format_library.json has 3")
+    parser.add_argument("--top_k", type=int, nargs="+", default=[1, 2, 3, 5, 10], help="Candidates kept per level during search")
+    parser.add_argument("--queries", type=int, default=200, help="Number of search queries per setting")
+    parser.add_argument("--dimensions", type=int, default=1024, help="Dimension of the fake embeddings")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic library and queries")
+    parser.add_argument("--shard_by_category", action="store_true", help="Split the levels below the first into one collection per category")
+    parser.add_argument("--output", type=str, default=None, help="Result file, defaults to output/benchmarks/retrieval_<commit>.json")
+    return parser.parse_args()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size of the process, which includes chromadb's native HNSW index.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def directory_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+    )
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "mean_ms": float(latencies_ms.mean()),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def bench_library(leaves: int, depth: int, args: argparse.Namespace) -> Dict[str, Any]:
+    library = synthetic_library(leaves, depth, seed=args.seed)
+    nodes = count_nodes(library)
+    print(f"[leaves={leaves} depth={depth}] {nodes} nodes")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        database = HierarchicalVectorDatabase(
+            data_dir=data_dir,
+            embedding_service=FakeEmbeddingService(args.dimensions),
+            chroma_client=chromadb.PersistentClient(path=data_dir, settings=Settings(anonymized_telemetry=False)),
+            shard_by_category=args.shard_by_category
+        )
+
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        database.add_recursive_dict(library)
+        ingestion_seconds = time.perf_counter() - start
+        rss_after = rss_bytes()
+        print(f"  ingestion: {nodes / ingestion_seconds:.1f} nodes/s")
+
+        paths = sample_paths(library, args.queries, seed=args.seed)
+        search = []
+        for top_k in args.top_k:
+            latencies = []
+            for path in paths:
+                start = time.perf_counter()
+                database.hierarchical_search(
+                    queries=path,
+                    top_k_per_level=[top_k] * depth,
+                    weight_per_level=[1.0] * depth,
+                    search_level=depth
+                )
+                latencies.append(time.perf_counter() - start)
+            summary = {"top_k": top_k, "queries": len(paths), **latency_summary(latencies)}
+            print(f"  search top_k={top_k}: p50 {summary['p50_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms")
+            search.append(summary)
+
+        disk = directory_bytes(data_dir)
+
+    return {
+        "leaves": leaves,
+        "depth": depth,
+        "nodes": nodes,
+        "ingestion": {
+            "seconds": ingestion_seconds,
+            "nodes_per_second": nodes / ingestion_seconds
+        },
+        "memory": {
+            "rss_bytes_per_node": max(rss_after - rss_before, 0) / nodes,
+            "disk_bytes_per_node": disk / nodes
+        },
+        "search": search
+    }
+
+
+def main():
+    args = config()
+    commit = git_commit()
+    results = [
+        bench_library(leaves, depth, args)
+        for depth in args.depths
+        for leaves in args.leaves
+    ]
+    report = {
+        "benchmark": "retrieval",
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results
+    }
+
+    output = args.output or f"output/benchmarks/retrieval_{commit}.json"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
+# python benchmarks/bench_retrieval.py --leaves 1000 10000 100000 --depths 3 --top_k 1 3 5
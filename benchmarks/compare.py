@@ -0,0 +1,59 @@
+import argparse
+import json
+from typing import Any, Dict
+
+# Fields that identify a measurement rather than being one.
+KEY_FIELDS = ("leaves", "depth", "top_k", "queries", "nodes", "concurrency", "runs")
+
+
+def config() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files, e.g. from two commits")
+    parser.add_argument("baseline", type=str, help="Result file of the baseline")
+    parser.add_argument("candidate", type=str, help="Result file to compare against the baseline")
+    parser.add_argument("--threshold", type=float, default=5.0, help="Only show changes larger than this many percent")
+    return parser.parse_args()
+
+
+def flatten(value: Any, prefix: str = "") -> Dict[str, float]:
+    """
+    Flatten a result tree into {path: number}. List items are labeled by their key fields,
+    so the same measurement gets the same path in both files.
+    """
+    flat = {}
+    if isinstance(value, dict):
+        for key, child in value.items():
+            if key in KEY_FIELDS:
+                continue
+            flat.update(flatten(child, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            if isinstance(child, dict):
+                label = ",".join(f"{key}={child[key]}" for key in KEY_FIELDS if key in child) or str(index)
+            else:
+                label = str(index)
+            flat.update(flatten(child, f"{prefix}[{label}]"))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix] = float(value)
+    return flat
+
+
+def main():
+    args = config()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"{baseline.get('commit')} -> {candidate.get('commit')}")
+    base_flat = flatten(baseline["results"])
+    cand_flat = flatten(candidate["results"])
+    for path in sorted(base_flat.keys() & cand_flat.keys()):
+        before, after = base_flat[path], cand_flat[path]
+        change = (after - before) / before * 100 if before else float("inf") if after else 0.0
+        if abs(change) >= args.threshold:
+            print(f"{path}: {before:.4g} -> {after:.4g} ({change:+.1f}%)")
+
+if __name__ == "__main__":
+    main()
+# python benchmarks/compare.py output/benchmarks/retrieval_<base>.json output/benchmarks/retrieval_<new>.json
+# python benchmarks/compare.py output/benchmarks/load_<base>.json output/benchmarks/load_<new>.json
@@ -0,0 +1,192 @@
+import sys, os
+import argparse
+import json
+import logging
+import platform
+import queue
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+sys.path.append(os.getcwd())
+from ReasonFlux.agent import BaseAgent, Navigator, Inference
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.template_matcher import EmbeddingBatcher, HierarchicalVectorDatabase, OpenAIEmbeddingService
+from ReasonFlux.utils.client_registry import client_registry
+from benchmarks.bench_retrieval import git_commit
+from benchmarks.simulated_server import BackgroundServer, SimulationSettings, create_app
+from benchmarks.synthetic import FakeEmbeddingService, synthetic_library
+
+API_KEY = "sk-simulated"
+STAGES = ["step1", "step2", "step3", "step4"]
+
+
+def config() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sweep concurrent ReasonFlux.run pipelines against a simulated LLM server")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Concurrency levels to sweep")
+    parser.add_argument("--runs_per_worker", type=int, default=3, help="Runs per concurrent pipeline at each level")
+    parser.add_argument("--library", type=str, default="data/format_library.json", help="Template library, ignored with --synthetic_leaves")
+    parser.add_argument("--synthetic_leaves", type=int, default=0, help="Use a synthetic library of this many templates instead")
+    parser.add_argument("--server_url", type=str, default=None, help="Use an already running simulated server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the in-process simulated server")
+    parser.add_argument("--model", type=str, default="qwen-max", help="Model name sent to the server")
+    parser.add_argument("--embedding_max_wait_ms", type=float, default=0, help="Batch concurrent query embeddings, 0 sends one request per query")
+    parser.add_argument("--output", type=str, default=None, help="Result file, defaults to output/benchmarks/load_<commit>.json")
+    for name, field in SimulationSettings.model_fields.items():
+        parser.add_argument(f"--{name}", type=type(field.default), default=field.default, help=field.description)
+    return parser.parse_args()
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    values = np.array(values)
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+    }
+
+
+def build_database(
+    library: Dict[str, Any],
+    data_dir: str,
+    base_url: str,
+    dimensions: int,
+    pool: dict,
+    max_wait_ms: float = 0
+) -> HierarchicalVectorDatabase:
+    """
+    Ingest the library offline with the same vectors the server returns, then point the
+    database's embedding service at the server for the runs.
+    """
+    database = HierarchicalVectorDatabase(
+        data_dir=data_dir,
+        embedding_service=FakeEmbeddingService(dimensions),
+        chroma_client=chromadb.PersistentClient(path=data_dir, settings=Settings(anonymized_telemetry=False))
+    )
+    database.add_recursive_dict(library)
+    database.embedding_service = OpenAIEmbeddingService(
+        api_key=API_KEY,
+        api_base=base_url,
+        model_name="text-embedding-v3",
+        http_client=client_registry.get_http_client(base_url, API_KEY, "text-embedding-v3", pool)
+    )
+    if max_wait_ms > 0:
+        database.embedding_service.batcher = EmbeddingBatcher(max_wait_ms=max_wait_ms)
+    return database
+
+
+def build_pipeline(base_url: str, model: str, database: HierarchicalVectorDatabase, pool: dict) -> ReasonFlux:
+    client_params = {
+        **BaseAgent.model_fields["client_params"].default,
+        "api_key": API_KEY,
+        "base_url": base_url,
+        "model": model,
+        "http_pool": pool
+    }
+    return ReasonFlux(
+        navigator=Navigator(name="Navigator", max_steps=3, client_params=client_params),
+        inference=Inference(name="Inference", max_steps=3, client_params=client_params),
+        hierarchical_database=database
+    )
+
+
+def run_level(concurrency: int, args: argparse.Namespace, base_url: str, database: HierarchicalVectorDatabase, pool: dict) -> Dict[str, Any]:
+    # every worker owns a pipeline, since a pipeline's agents hold the state of the problem being solved
+    pipelines = queue.Queue()
+    for _ in range(concurrency):
+        pipelines.put(build_pipeline(base_url, args.model, database, pool))
+
+    problems = [
+        f"Problem {concurrency}-{i}: given a1={i % 7 + 1} and a(n+1)=2a(n)+{i % 5 + 1}, find the general term."
+        for i in range(concurrency * args.runs_per_worker)
+    ]
+    end_to_end, stages, errors = [], {stage: [] for stage in STAGES}, []
+
+    def _solve(problem: str):
+        pipeline = pipelines.get()
+        try:
+            start = time.perf_counter()
+            meta_data = pipeline.run(problem)
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return
+        finally:
+            pipelines.put(pipeline)
+        if meta_data is None:
+            errors.append("no search result")
+            return
+        end_to_end.append(elapsed)
+        for stage, duration in meta_data["timing"]["stages"].items():
+            stages[stage].append(duration)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(_solve, problems))
+    wall = time.perf_counter() - start
+
+    result = {
+        "concurrency": concurrency,
+        "runs": len(problems),
+        "errors": len(errors),
+        "wall_seconds": wall,
+        "throughput_runs_per_second": len(end_to_end) / wall,
+        "end_to_end": percentiles(end_to_end),
+        "stages": {stage: percentiles(durations) for stage, durations in stages.items()},
+        "error_samples": errors[:5]
+    }
+    print(
+        f"concurrency={concurrency}: {result['throughput_runs_per_second']:.2f} runs/s, "
+        f"p50 {result['end_to_end'].get('p50', 0):.2f}s, p99 {result['end_to_end'].get('p99', 0):.2f}s, "
+        f"{len(errors)} errors"
+    )
+    return result
+
+
+def main():
+    args = config()
+    logging.getLogger("ReasonFlux").setLevel(logging.WARNING)
+
+    if args.synthetic_leaves:
+        library = synthetic_library(args.synthetic_leaves)
+    else:
+        with open(args.library, "r") as f:
+            library = json.load(f)
+    settings = SimulationSettings(**{name: getattr(args, name) for name in SimulationSettings.model_fields})
+    pool = {"max_connections": 2 * max(args.concurrency), "max_keepalive_connections": 2 * max(args.concurrency)}
+
+    server = nullcontext() if args.server_url else BackgroundServer(create_app(library, settings), port=args.port)
+    with server, tempfile.TemporaryDirectory() as data_dir:
+        base_url = args.server_url or server.base_url
+        database = build_database(library, data_dir, base_url, settings.embedding_dimensions, pool, args.embedding_max_wait_ms)
+        results = [run_level(concurrency, args, base_url, database, pool) for concurrency in args.concurrency]
+
+    commit = git_commit()
+    report = {
+        "benchmark": "load",
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+        "embedding_batches": database.embedding_service.batcher.stats if database.embedding_service.batcher else None
+    }
+    output = args.output or f"output/benchmarks/load_{commit}.json"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
+# python benchmarks/load_test.py --concurrency 1 4 16 --ttft_ms 300 --tokens_per_second 50 --error_rate 0.02
@@ -0,0 +1,247 @@
+import sys, os
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+sys.path.append(os.getcwd())
+from benchmarks.synthetic import FakeEmbeddingFunction
+
+
+class SimulationSettings(BaseModel):
+    """
+    Behaviour of the simulated OpenAI-compatible server.
+
+    Attributes:
+        ttft_ms (float): Median time to first token of a chat completion, in milliseconds.
+        ttft_sigma (float): Sigma of the lognormal time-to-first-token distribution, 0 makes it constant.
+        tokens_per_second (float): Decoding speed used to turn completion tokens into latency.
+        think_tokens (int): Approximate length of the padding put in every <think> section.
+        embedding_latency_ms (float): Median latency of an embedding request, in milliseconds.
+        embedding_sigma (float): Sigma of the lognormal embedding latency distribution.
+        embedding_dimensions (int): Dimension of the returned embeddings.
+        error_rate (float): Fraction of requests answered with `error_status`.
+        error_status (int): HTTP status of injected errors, 429 or 5xx.
+        retry_after (float): Retry-After header sent with injected 429 errors, in seconds.
+        seed (int): Seed of the latency and error generator.
+    """
+    ttft_ms: float = Field(300.0, description="Median time to first token, in milliseconds")
+    ttft_sigma: float = Field(0.5, description="Sigma of the lognormal time-to-first-token distribution")
+    tokens_per_second: float = Field(50.0, description="Decoding speed")
+    think_tokens: int = Field(100, description="Approximate length of the padding in every <think> section")
+    embedding_latency_ms: float = Field(30.0, description="Median latency of an embedding request, in milliseconds")
+    embedding_sigma: float = Field(0.3, description="Sigma of the lognormal embedding latency distribution")
+    embedding_dimensions: int = Field(1024, description="Dimension of the returned embeddings")
+    error_rate: float = Field(0.0, description="Fraction of requests answered with error_status")
+    error_status: int = Field(429, description="HTTP status of injected errors")
+    retry_after: float = Field(0.1, description="Retry-After header of injected 429 errors, in seconds")
+    seed: int = Field(0, description="Seed of the latency and error generator")
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _library_paths(library: Dict[str, Any], prefix: List[str] = None) -> List[List[str]]:
+    prefix = prefix or []
+    paths = []
+    for key, value in library.items():
+        if isinstance(value, dict):
+            paths.extend(_library_paths(value, prefix + [key]))
+        else:
+            paths.append(prefix + [key])
+    return paths
+
+
+class SimulatedModel:
+    """
+    Produces answers the ReasonFlux prompts and parsers accept.
+
+    The Step1 template always names a category, direction and method that exist in the
+    library, so the hierarchical search finds real templates.
+    """
+    def __init__(self, library: Dict[str, Any], settings: SimulationSettings):
+        self.library = library
+        self.paths = [path for path in _library_paths(library) if len(path) >= 3]
+        self.settings = settings
+        self.filler = " ".join(["considering"] * settings.think_tokens)
+
+    def _path_for(self, problem: str) -> List[str]:
+        digest = int(hashlib.sha256(problem.encode("utf-8")).hexdigest(), 16)
+        return self.paths[digest % len(self.paths)]
+
+    def _template(self, path: List[str]) -> Dict[str, Any]:
+        node = self.library
+        for key in path:
+            node = node[key]
+        return json.loads(node)
+
+    def respond(self, messages: List[Dict[str, Any]]) -> str:
+        system = messages[0]["content"] if messages else ""
+        last = messages[-1]["content"] if messages else ""
+        if system.startswith("Please construct a reasoning trajectory"):
+            path = self._path_for(last)
+            template = self._template(path)
+            answer = {
+                "Problem": last,
+                "General Knowledge Category": path[-3],
+                "Specific Direction": path[-2],
+                "Applied Method": path[-1],
+                "Examined Knowledge": template.get("knowledge_tag", []),
+                "reason_flow": template.get("reason_flow", ["Analyze the problem", "Solve it"])
+            }
+            return f"<think>{self.filler}</think>\n```json\n{json.dumps(answer, ensure_ascii=False)}\n```"
+        if system.startswith("As a math problem-solving tutor"):
+            flow = json.loads(system.split("Original Reason Flow:\n", 1)[1].split("\n\nStandard Solution Template:", 1)[0])
+            steps = "\n".join(f"{i + 1}. {step}" for i, step in enumerate(flow))
+            return f"<think>{self.filler}</think>\n{steps}"
+        if system.startswith("Please extract the reasoning flows"):
+            text = system.split("Input Reasoning Flow:\n", 1)[1].split("\n\nNote that", 1)[0]
+            steps = [line.split(". ", 1)[-1] for line in text.splitlines() if line.strip()]
+            return json.dumps(steps, ensure_ascii=False)
+        if system.startswith("You are a math tutor"):
+            return f"Apply the current step to the problem and report the intermediate result. {self.filler}"
+        return f"<think>{self.filler}</think>\nThe intermediate result of this step is \\boxed{{42}}."
+
+
+def create_app(library: Dict[str, Any], settings: SimulationSettings) -> FastAPI:
+    """
+    Build a FastAPI app that speaks the OpenAI chat-completions and embeddings APIs.
+
+    Args:
+        library (Dict[str, Any]): The template library the database was built from.
+        settings (SimulationSettings): Latency, token rate and error injection settings.
+
+    Returns:
+        FastAPI: The app.
+    """
+    app = FastAPI(title="ReasonFlux simulated LLM server")
+    model = SimulatedModel(library, settings)
+    embedding_function = FakeEmbeddingFunction(settings.embedding_dimensions)
+    rng = random.Random(settings.seed)
+    stats = {"chat": 0, "embeddings": 0, "errors": 0}
+
+    def _lognormal(median_ms: float, sigma: float) -> float:
+        return median_ms / 1000 * (rng.lognormvariate(0, sigma) if sigma > 0 else 1.0)
+
+    def _injected_error() -> JSONResponse | None:
+        if rng.random() >= settings.error_rate:
+            return None
+        stats["errors"] += 1
+        headers = {"retry-after": str(settings.retry_after)} if settings.error_status == 429 else {}
+        return JSONResponse(
+            status_code=settings.error_status,
+            headers=headers,
+            content={"error": {"message": "injected error", "type": "simulated", "code": settings.error_status}}
+        )
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["chat"] += 1
+        error = _injected_error()
+        if error is not None:
+            await asyncio.sleep(_lognormal(settings.ttft_ms, settings.ttft_sigma))
+            return error
+
+        content = model.respond(body.get("messages", []))
+        prompt_tokens = sum(_count_tokens(str(message.get("content", ""))) for message in body.get("messages", []))
+        completion_tokens = _count_tokens(content)
+        await asyncio.sleep(
+            _lognormal(settings.ttft_ms, settings.ttft_sigma) + completion_tokens / settings.tokens_per_second
+        )
+        return {
+            "id": f"chatcmpl-sim-{stats['chat']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "simulated"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        stats["embeddings"] += 1
+        error = _injected_error()
+        if error is not None:
+            return error
+
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(_lognormal(settings.embedding_latency_ms, settings.embedding_sigma))
+        vectors = embedding_function(inputs)
+        tokens = sum(_count_tokens(text) for text in inputs)
+        return {
+            "object": "list",
+            "model": body.get("model", "simulated"),
+            "data": [
+                {"object": "embedding", "index": index, "embedding": np.asarray(vector).tolist()}
+                for index, vector in enumerate(vectors)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+class BackgroundServer:
+    """
+    Run an app with uvicorn in a daemon thread, for use from a load generator in the same process.
+    """
+    def __init__(self, app: FastAPI, host: str = "127.0.0.1", port: int = 8765):
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.base_url = f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "BackgroundServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def config() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Simulated OpenAI-compatible LLM and embedding server for ReasonFlux load tests")
+    parser.add_argument("--library", type=str, default="data/format_library.json", help="The formatted template library")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    for name, field in SimulationSettings.model_fields.items():
+        parser.add_argument(f"--{name}", type=type(field.default), default=field.default, help=field.description)
+    return parser.parse_args()
+
+
+def main():
+    args = config()
+    with open(args.library, "r") as f:
+        library = json.load(f)
+    settings = SimulationSettings(**{name: getattr(args, name) for name in SimulationSettings.model_fields})
+    uvicorn.run(create_app(library, settings), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
+# python benchmarks/simulated_server.py --library data/format_library.json --ttft_ms 300 --tokens_per_second 50 --error_rate 0.02
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import math
+import random
+from typing import Any, Dict, List
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+from ReasonFlux.template_matcher import EmbeddingService
+
+
+class FakeEmbeddingFunction(EmbeddingFunction):
+    """
+    Deterministic, offline embedding function.
+
+    Each text is mapped to a unit vector drawn from a generator seeded by the text's hash,
+    so identical texts always get identical vectors and no provider is called.
+    """
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+
+    def __call__(self, input):
+        embeddings = []
+        for text in input:
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+            embeddings.append((vector / np.linalg.norm(vector)).tolist())
+        return embeddings
+
+
+class FakeEmbeddingService(EmbeddingService):
+    """
+    Embedding service backed by `FakeEmbeddingFunction`, for benchmarks that must not depend
+    on a provider's latency or quota.
+
+    Attributes:
+        dimensions (int): The dimension of the vectors, text-embedding-v3 uses 1024.
+    """
+    def __init__(self, dimensions: int = 1024):
+        super().__init__()
+        self.embedding_function = FakeEmbeddingFunction(dimensions)
+
+
+def _template(name: str, rng: random.Random) -> Dict[str, Any]:
+    """
+    A template with the fields and rough size of the ones in data/format_library.json.
+    """
+    steps = rng.randint(4, 8)
+    return {
+        "template_name": name,
+        "template_type": "Problem Solving Method",
+        "knowledge_tag": [f"Tag {rng.randint(0, 499)}" for _ in range(rng.randint(2, 5))],
+        "description": f"Systematically solve problems of type {name} by a fixed sequence of transformations.",
+        "application_scenario": [f"Scenario {i} where {name} applies" for i in range(3)],
+        "reason_flow": [f"Step {i + 1}: apply transformation {i + 1} of {name}" for i in range(steps)],
+        "example_application": {
+            "example_problem": f"Example problem for {name} with parameters {rng.random():.4f}.",
+            "solution_steps": [f"[Step {i + 1}] worked step {i + 1}" for i in range(steps * 2)],
+            "final_answer": f"x = {rng.randint(-100, 100)}"
+        }
+    }
+
+
+def branching_factors(leaves: int, depth: int) -> List[int]:
+    """
+    Branching factor per level so that the tree has at least `leaves` leaves.
+    """
+    branching = max(2, math.ceil(leaves ** (1 / depth)))
+    return [branching] * depth
+
+
+def synthetic_library(leaves: int, depth: int = 3, seed: int = 0) -> Dict[str, Any]:
+    """
+    Generate a nested dictionary shaped like data/format_library.json.
+
+    Inner levels are named like categories and directions, leaves map a template name to
+    its JSON string, exactly as scripts/format_template.py produces them.
+
+    Args:
+        leaves (int): Number of leaves (templates) to generate.
+        depth (int, optional): Number of levels including the leaf level. Defaults to 3.
+        seed (int, optional): Seed of the generator. Defaults to 0.
+
+    Returns:
+        Dict[str, Any]: The nested dictionary.
+    """
+    rng = random.Random(seed)
+    factors = branching_factors(leaves, depth)
+    remaining = [leaves]
+
+    def _build(level: int, prefix: str) -> Dict[str, Any]:
+        node = {}
+        for i in range(factors[level]):
+            if remaining[0] == 0:
+                break
+            name = f"{prefix}{level}-{i}"
+            if level == depth - 1:
+                template_name = f"Method {name}"
+                node[template_name] = json.dumps(_template(template_name, rng), ensure_ascii=False)
+                remaining[0] -= 1
+            else:
+                child = _build(level + 1, f"{name}/")
+                if child:
+                    node[f"Category {name}" if level == 0 else f"Direction {name}"] = child
+        return node
+
+    return _build(0, "")
+
+
+def sample_paths(library: Dict[str, Any], count: int, seed: int = 0) -> List[List[str]]:
+    """
+    Sample root-to-leaf key paths of the library, used as hierarchical search queries.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        node, path = library, []
+        while isinstance(node, dict):
+            key = rng.choice(list(node))
+            path.append(key)
+            node = node[key]
+        paths.append(path)
+    return paths
+
+
+def count_nodes(library: Dict[str, Any]) -> int:
+    return sum(1 + (count_nodes(value) if isinstance(value, dict) else 0) for value in library.values())
@@ -0,0 +1,218 @@
+import sys, os
+import argparse
+import json
+import platform
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+sys.path.append(os.getcwd())
+from ReasonFlux.template_matcher import EmbeddingService, IndexParams
+from ReasonFlux.template_matcher.database import exact_distances
+from ReasonFlux.utils.client import initialize_hierarchical_database
+from benchmarks.bench_retrieval import git_commit, latency_summary
+from benchmarks.synthetic import FakeEmbeddingService, synthetic_library
+
+
+def config() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sweep HNSW M and search_ef per level, reporting recall against exact search and latency")
+    parser.add_argument("--library", type=str, default="data/format_library.json", help="Template library, ignored with --synthetic_leaves")
+    parser.add_argument("--synthetic_leaves", type=int, default=0, help="Use a synthetic library of this many templates instead")
+    parser.add_argument("--depth", type=int, default=3, help="Depth of the synthetic library")
+    parser.add_argument("--database_config", type=str, default=None, help="Embed with the embedding service of this database config instead of fake embeddings")
+    parser.add_argument("--dimensions", type=int, default=1024, help="Dimension of the fake embeddings")
+    parser.add_argument("--space", type=str, default="l2", choices=["l2", "cosine", "ip"], help="Distance space")
+    parser.add_argument("--M", type=int, nargs="+", default=[8, 16, 32], help="HNSW links per node to sweep")
+    parser.add_argument("--ef_search", type=int, nargs="+", default=[10, 20, 50, 100], help="HNSW search_ef values to sweep")
+    parser.add_argument("--construction_ef", type=int, default=100, help="HNSW construction_ef")
+    parser.add_argument("--top_k", type=int, default=3, help="Candidates per query, recall is measured at this k")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per level")
+    parser.add_argument("--noise", type=float, default=0.5, help="Norm of the noise added to a node vector to make a query, relative to the vector")
+    parser.add_argument("--target_recall", type=float, default=0.95, help="Recall the recommended setting of each level must reach")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic library and the queries")
+    parser.add_argument("--output", type=str, default=None, help="Result file, defaults to output/benchmarks/hnsw_<commit>.json")
+    return parser.parse_args()
+
+
+def level_nodes(library: Dict[str, Any]) -> List[Tuple[List[str], List[int]]]:
+    """
+    The keys of the library per level, i.e. the documents of each level collection, and the
+    index of each key's parent in the level above (-1 on the first level).
+    """
+    levels: List[Tuple[List[str], List[int]]] = []
+
+    def _walk(node: Dict[str, Any], level: int, parent: int) -> None:
+        if len(levels) <= level:
+            levels.append(([], []))
+        texts, parents = levels[level]
+        for key, value in node.items():
+            index = len(texts)
+            texts.append(key)
+            parents.append(parent)
+            if isinstance(value, dict):
+                _walk(value, level + 1, index)
+
+    _walk(library, 0, -1)
+    return levels
+
+
+def level_texts(library: Dict[str, Any]) -> List[List[str]]:
+    """
+    The keys of the library per level, i.e. the documents of each level collection.
+    """
+    return [texts for texts, _ in level_nodes(library)]
+
+
+def make_queries(vectors: np.ndarray, count: int, noise: float, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Perturb randomly chosen node vectors, so a query is close to, but not exactly, a node.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The queries, and the index of the node each one perturbs.
+    """
+    picked = rng.integers(0, len(vectors), size=count)
+    perturbation = rng.standard_normal(vectors[picked].shape)
+    perturbation *= (noise * np.linalg.norm(vectors[picked], axis=1) / np.linalg.norm(perturbation, axis=1))[:, None]
+    return vectors[picked] + perturbation, picked
+
+
+def tune_level(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    args: argparse.Namespace,
+    client: Any,
+    parents: Optional[List[int]] = None,
+    query_parents: Optional[List[int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Build the level once per (M, search_ef) and measure recall@top_k and query latency.
+
+    With `parents`, the levels below the first, every query is filtered to the children of
+    its entry of `query_parents` as `hierarchical_search` does, and recall is measured against
+    exact search among those children.
+    """
+    if parents is None:
+        candidates = [np.arange(len(vectors))] * len(queries)
+        filters = [None] * len(queries)
+    else:
+        children: Dict[int, List[int]] = {}
+        for index, parent in enumerate(parents):
+            children.setdefault(parent, []).append(index)
+        candidates = [np.array(children[parent]) for parent in query_parents]
+        filters = [{"parent": str(parent)} for parent in query_parents]
+    exact = []
+    for query, members in zip(queries, candidates):
+        order = np.argsort(exact_distances(vectors[members], query, args.space), kind="stable")
+        exact.append(set(members[order[:args.top_k]].tolist()))
+    ids = [str(i) for i in range(len(vectors))]
+    metadatas = [{"parent": str(parent)} for parent in parents] if parents is not None else None
+    rows = []
+    for M in args.M:
+        for ef_search in args.ef_search:
+            params = IndexParams(space=args.space, M=M, construction_ef=args.construction_ef, search_ef=ef_search)
+            # chroma fixes the HNSW parameters at creation, so every setting gets its own collection
+            collection = client.create_collection(f"tune_{M}_{ef_search}", metadata=params.metadata())
+            start = time.perf_counter()
+            batch = client.get_max_batch_size()
+            for offset in range(0, len(vectors), batch):
+                collection.add(
+                    ids=ids[offset:offset + batch],
+                    embeddings=vectors[offset:offset + batch].tolist(),
+                    metadatas=metadatas[offset:offset + batch] if metadatas else None
+                )
+            build_seconds = time.perf_counter() - start
+
+            latencies, recalls = [], []
+            for query, expected, where in zip(queries, exact, filters):
+                start = time.perf_counter()
+                result = collection.query(query_embeddings=[query.tolist()], n_results=len(expected), where=where, include=[])
+                latencies.append(time.perf_counter() - start)
+                recalls.append(len(expected & {int(i) for i in result["ids"][0]}) / len(expected))
+            client.delete_collection(collection.name)
+
+            row = {
+                "M": M,
+                "ef_search": ef_search,
+                "recall": float(np.mean(recalls)),
+                "build_seconds": build_seconds,
+                **latency_summary(latencies)
+            }
+            print(f"  M={M:<3} ef_search={ef_search:<4} recall@{args.top_k} {row['recall']:.4f}  p50 {row['p50_ms']:.2f} ms  p99 {row['p99_ms']:.2f} ms")
+            rows.append(row)
+    return rows
+
+
+def recommend(rows: List[Dict[str, Any]], target_recall: float) -> Dict[str, Any]:
+    """
+    The fastest setting reaching the target recall, or the most accurate one if none does.
+    """
+    reaching = [row for row in rows if row["recall"] >= target_recall]
+    if reaching:
+        return min(reaching, key=lambda row: (row["p50_ms"], row["M"], row["ef_search"]))
+    return max(rows, key=lambda row: (row["recall"], -row["p50_ms"]))
+
+
+def embedding_service(args: argparse.Namespace) -> EmbeddingService:
+    if args.database_config:
+        return initialize_hierarchical_database(args.database_config).embedding_service
+    return FakeEmbeddingService(args.dimensions)
+
+
+def tune(library: Dict[str, Any], args: argparse.Namespace) -> List[Dict[str, Any]]:
+    service = embedding_service(args)
+    rng = np.random.default_rng(args.seed)
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    results = []
+    for level, (texts, parents) in enumerate(level_nodes(library)):
+        print(f"[level {level}] {len(texts)} nodes")
+        vectors = np.array(service.encode_batch(texts), dtype=np.float32)
+        queries, picked = make_queries(vectors, args.queries, args.noise, rng)
+        if level == 0:
+            rows = tune_level(vectors, queries, args, client)
+        else:
+            # below the first level the search only looks among the children of a parent candidate
+            rows = tune_level(vectors, queries, args, client, parents, [parents[index] for index in picked])
+        best = recommend(rows, args.target_recall)
+        results.append({"level": level, "nodes": len(texts), "sweep": rows, "recommended": best})
+    return results
+
+
+def main():
+    args = config()
+    if args.synthetic_leaves:
+        library = synthetic_library(args.synthetic_leaves, args.depth, seed=args.seed)
+    else:
+        with open(args.library, "r") as f:
+            library = json.load(f)
+
+    results = tune(library, args)
+    print("\nindex_per_level:")
+    for result in results:
+        best = result["recommended"]
+        print(
+            f"  - {{space: {args.space}, M: {best['M']}, construction_ef: {args.construction_ef}, search_ef: {best['ef_search']}}}"
+            f"  # level {result['level']}: recall {best['recall']:.4f}, p50 {best['p50_ms']:.2f} ms"
+        )
+
+    commit = git_commit()
+    report = {
+        "benchmark": "hnsw",
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results
+    }
+    output = args.output or f"output/benchmarks/hnsw_{commit}.json"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
+# python benchmarks/tune_hnsw.py --synthetic_leaves 10000 --space cosine --M 8 16 32 --ef_search 10 20 50 100
@@ -30,8 +30,8 @@ def main():
     database.add_recursive_dict(template_data)
     print(f"Database creation completed. Database path: {database.data_dir}")
     for i in range(database.max_level):
-        level_name = f"level_{i}"
-        print(f"Level {i}: {database.collections[level_name].count()} nodes")
+        collections = database.level_collections(i)
+        print(f"Level {i}: {sum(collection.count() for collection in collections)} nodes in {len(collections)} collection(s)")
 
 if __name__ == "__main__":
     main()
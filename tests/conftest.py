@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+sys.path.append(os.getcwd())
+from chromadb.api.types import EmbeddingFunction
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_openai import ChatOpenAI
+
+from ReasonFlux.agent import Navigator, Inference
+from ReasonFlux.template_matcher import EmbeddingService, HierarchicalVectorDatabase
+
+# Offline stand-ins for the embedding provider and the chat model, so the pipeline
+# can be exercised without a DashScope key.
+
+class HashEmbeddingFunction(EmbeddingFunction):
+    """Identical texts get identical unit vectors, everything else is pseudo-random."""
+    def __call__(self, input):
+        embeddings = []
+        for text in input:
+            digest = hashlib.sha256(text.encode("utf-8")).digest()
+            vector = np.frombuffer(digest, dtype=np.uint8).astype(np.float32) - 127.5
+            embeddings.append((vector / np.linalg.norm(vector)).tolist())
+        return embeddings
+
+
+class HashEmbeddingService(EmbeddingService):
+    def __init__(self):
+        super().__init__()
+        self.embedding_function = HashEmbeddingFunction()
+
+
+TEMPLATES = {
+    "Sequences and Series": {
+        "Recursive sequences": {
+            "Constructing Geometric Sequences": {
+                "template_name": "Constructing Geometric Sequences",
+                "knowledge_tag": ["Recurrence Relations", "Geometric Sequences"],
+                "reason_flow": [
+                    "Observe the recurrence structure",
+                    "Introduce an auxiliary sequence",
+                    "Derive the general term"
+                ],
+                "example_application": {
+                    "example_problem": "a1=1, a(n+1)=2a(n)+1, find a(n).",
+                    "solution_steps": ["Let b(n)=a(n)+1", "b(n) is geometric", "a(n)=2^n-1"],
+                    "final_answer": "a(n)=2^n-1"
+                }
+            },
+            "Accumulation Method": {
+                "template_name": "Accumulation Method",
+                "knowledge_tag": ["Recurrence Relations", "Summation"],
+                "reason_flow": ["Write the differences", "Sum the differences"],
+                "example_application": {}
+            }
+        }
+    },
+    "Trigonometric Functions": {
+        "Identities": {
+            "Auxiliary Angle Formula": {
+                "template_name": "Auxiliary Angle Formula",
+                "knowledge_tag": ["Trigonometric Identities"],
+                "reason_flow": ["Combine the terms", "Read off the amplitude"],
+                "example_application": {}
+            }
+        }
+    }
+}
+
+
+def format_library(templates=TEMPLATES):
+    """Same transformation as scripts/format_template.py: leaves become JSON strings."""
+    return {
+        category: {
+            direction: {name: json.dumps(template, ensure_ascii=False) for name, template in methods.items()}
+            for direction, methods in directions.items()
+        }
+        for category, directions in templates.items()
+    }
+
+
+def navigator_template(applied_method="Constructing Geometric Sequences"):
+    return {
+        "Problem": "a1=3, a(n+1)=2a(n)+5, find a(n).",
+        "General Knowledge Category": "Sequences and Series",
+        "Specific Direction": "Recursive sequences",
+        "Applied Method": applied_method,
+        "Examined Knowledge": ["Recurrence Relations", "Geometric Sequences"],
+        "reason_flow": ["Identify the recurrence", "Construct the auxiliary sequence", "Solve for a(n)"]
+    }
+
+
+def scripted_responder(template):
+    """Answer each pipeline prompt the way a well-behaved model would."""
+    def respond(messages):
+        system = messages[0].content
+        if system.startswith("Please construct a reasoning trajectory"):
+            return f"<think>plan</think>\n```json\n{json.dumps(template)}\n```"
+        if system.startswith("As a math problem-solving tutor"):
+            return "<think>adjust</think>\n1. Observe the recurrence\n2. Hypothesize a geometric form\n3. Derive the general term"
+        if system.startswith("Please extract the reasoning flows"):
+            return '["Observe the recurrence", "Hypothesize a geometric form", "Derive the general term"]'
+        if system.startswith("You are a math tutor"):
+            return f"Instruction {len(messages)}"
+        return f"<think>step {len(messages)}</think>\nPartial work for step {len(messages)}"
+    return respond
+
+
+class ScriptedChatOpenAI(ChatOpenAI):
+    """ChatOpenAI that never leaves the process and records every prompt it receives."""
+    responder: object = None
+    calls: list = []
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append(messages)
+        content = self.responder(messages)
+        usage = {
+            "input_tokens": sum(len(message.content) for message in messages),
+            "output_tokens": len(content),
+            "total_tokens": sum(len(message.content) for message in messages) + len(content)
+        }
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=usage))])
+
+
+def scripted_client(responder):
+    return ScriptedChatOpenAI(api_key="sk-test", model="qwen-max", responder=responder, calls=[])
+
+
+@pytest.fixture
+def embedding_service():
+    return HashEmbeddingService()
+
+
+@pytest.fixture
+def database(tmp_path, embedding_service):
+    db = HierarchicalVectorDatabase(
+        data_dir=str(tmp_path / "database"),
+        embedding_service=embedding_service
+    )
+    db.add_recursive_dict(format_library())
+    return db
+
+
+@pytest.fixture
+def make_agents():
+    def make(template=None):
+        responder = scripted_responder(template or navigator_template())
+        navigator = Navigator(name="Navigator", model_client=scripted_client(responder))
+        inference = Inference(name="Inference", model_client=scripted_client(responder))
+        return navigator, inference
+    return make
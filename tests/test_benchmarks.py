@@ -0,0 +1,79 @@
+import sys,os
+sys.path.append(os.getcwd())
+from argparse import Namespace
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+from benchmarks.bench_retrieval import bench_library
+from benchmarks.compare import flatten
+from benchmarks.load_test import build_database, run_level
+from benchmarks.simulated_server import BackgroundServer, SimulationSettings, create_app
+from benchmarks.synthetic import FakeEmbeddingService, count_nodes, sample_paths, synthetic_library
+from benchmarks.tune_hnsw import level_nodes, level_texts, recommend, tune, tune_level
+
+
+def test_synthetic_library_shape():
+    library = synthetic_library(50, depth=3)
+    paths = sample_paths(library, 10)
+    assert all(len(path) == 3 and path[-1].startswith("Method ") for path in paths)
+    leaves = sum(len(directions) for categories in library.values() for directions in categories.values())
+    assert leaves == 50
+    assert count_nodes(library) > 50
+    assert synthetic_library(50, depth=3) == library
+
+
+def test_fake_embedding_is_deterministic():
+    service = FakeEmbeddingService(dimensions=16)
+    assert service.encode("a").shape == (16,)
+    assert (service.encode("a") == service.encode("a")).all()
+    assert not (service.encode("a") == service.encode("b")).all()
+
+
+def test_bench_library_reports_metrics():
+    args = Namespace(top_k=[1, 2], queries=5, dimensions=16, seed=0, shard_by_category=False)
+    result = bench_library(30, 3, args)
+    assert result["ingestion"]["nodes_per_second"] > 0
+    assert [row["top_k"] for row in result["search"]] == [1, 2]
+    assert result["search"][0]["p99_ms"] >= result["search"][0]["p50_ms"]
+    assert "[leaves=30,depth=3,nodes=%d].search[top_k=2,queries=5].p50_ms" % result["nodes"] in flatten([result])
+
+
+def test_tune_hnsw_recommends_per_level():
+    library = synthetic_library(30, depth=3)
+    assert [len(texts) for texts in level_texts(library)][-1] == 30
+    args = Namespace(database_config=None, dimensions=16, space="cosine", M=[4, 16], ef_search=[10, 40],
+                     construction_ef=40, top_k=2, queries=5, noise=0.3, target_recall=0.9, seed=0)
+    results = tune(library, args)
+    assert len(results) == 3
+    assert all(len(result["sweep"]) == 4 and 0 <= result["recommended"]["recall"] <= 1 for result in results)
+    rows = [{"M": 4, "ef_search": 10, "recall": 0.8, "p50_ms": 1.0}, {"M": 16, "ef_search": 40, "recall": 1.0, "p50_ms": 2.0}]
+    assert recommend(rows, 0.9)["M"] == 16
+    assert recommend(rows, 0.5)["M"] == 4
+
+
+def test_tune_hnsw_filters_levels_by_parent():
+    library = {"A": {"a1": "x", "a2": "y"}, "B": {"b1": "z"}}
+    (_, roots), (texts, parents) = level_nodes(library)
+    assert roots == [-1, -1] and texts == ["a1", "a2", "b1"] and parents == [0, 0, 1]
+
+    # the query sits on b1, but filtered to A's children only a1 and a2 are expected
+    vectors = np.array([[1, 0], [0, 1], [0.9, 0.1]], dtype=np.float32)
+    args = Namespace(space="l2", M=[16], ef_search=[10], construction_ef=40, top_k=1)
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    rows = tune_level(vectors, np.array([[0.9, 0.1]]), args, client, parents, [0])
+    assert rows[0]["recall"] == 1.0
+
+
+def test_load_level_against_simulated_server(tmp_path):
+    library = synthetic_library(20, depth=3)
+    settings = SimulationSettings(ttft_ms=1, ttft_sigma=0, tokens_per_second=1e6, think_tokens=5,
+                                  embedding_latency_ms=1, embedding_sigma=0, embedding_dimensions=16)
+    pool = {"max_connections": 4, "max_keepalive_connections": 4}
+    with BackgroundServer(create_app(library, settings), port=8791) as server:
+        database = build_database(library, str(tmp_path), server.base_url, 16, pool)
+        args = Namespace(model="qwen-max", runs_per_worker=2)
+        result = run_level(2, args, server.base_url, database, pool)
+    assert result["errors"] == 0, result["error_samples"]
+    assert result["runs"] == 4
+    assert set(result["stages"]) == {"step1", "step2", "step3", "step4"}
+    assert "[concurrency=2,runs=4].end_to_end.p99" in flatten([result])
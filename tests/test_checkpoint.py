@@ -0,0 +1,89 @@
+import sys,os
+sys.path.append(os.getcwd())
+import pytest
+from conftest import navigator_template, scripted_responder
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.storage import CheckpointStore
+from ReasonFlux.utils.client import initialize_checkpoint_store
+
+PROBLEM = "a1=3, a(n+1)=2a(n)+5, find a(n)."
+
+
+def _failing_inference(fail_on_call):
+    respond = scripted_responder(navigator_template())
+    calls = []
+
+    def responder(messages):
+        calls.append(messages)
+        if len(calls) == fail_on_call:
+            raise RuntimeError("provider down")
+        return respond(messages)
+    return responder
+
+
+def test_resume_continues_after_the_last_iteration(tmp_path, database, make_agents):
+    navigator, inference = make_agents()
+    inference.model_client.responder = _failing_inference(fail_on_call=2)
+    reason_flux = ReasonFlux(
+        navigator=navigator,
+        inference=inference,
+        hierarchical_database=database,
+        checkpoint_store=CheckpointStore(data_dir=str(tmp_path))
+    )
+
+    with pytest.raises(RuntimeError):
+        reason_flux.run(PROBLEM, run_id="run-1")
+    checkpoint = reason_flux.checkpoint_store.load("run-1")
+    assert checkpoint["status"] == "failed" and checkpoint["error"] == "RuntimeError: provider down"
+    assert checkpoint["stage"] == "step4.iteration_1"
+    assert checkpoint["state"]["navigator"]["reasoning_instructions"] == ["Instruction 2"]
+
+    # a fresh pipeline, as after a restart
+    navigator, inference = make_agents()
+    resumed = ReasonFlux(
+        navigator=navigator,
+        inference=inference,
+        hierarchical_database=database,
+        checkpoint_store=reason_flux.checkpoint_store
+    )
+    meta_data = resumed.resume("run-1")
+
+    prompts = [messages[0].content for messages in navigator.model_client.calls]
+    assert all(prompt.startswith("You are a math tutor") for prompt in prompts) and len(prompts) == 2
+    assert len(meta_data["step4"]) == 3
+    assert meta_data["run_id"] == "run-1"
+    assert meta_data["step4"][0]["instruction"] == "Instruction 2"
+    # the history of the first iteration is passed on to the resumed ones
+    assert len(inference.model_client.calls[-1]) > len(inference.model_client.calls[0])
+    assert reason_flux.checkpoint_store.load("run-1")["status"] == "completed"
+    assert resumed.resume("run-1")["step4"] == meta_data["step4"]
+
+
+def test_checkpoint_after_each_stage(tmp_path, database, make_agents):
+    navigator, inference = make_agents()
+    inference.model_client.responder = _failing_inference(fail_on_call=1)
+    store = CheckpointStore(data_dir=str(tmp_path))
+    reason_flux = ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database, checkpoint_store=store)
+
+    with pytest.raises(RuntimeError):
+        reason_flux.run(PROBLEM)
+    [run] = store.runs(status="failed")
+    assert run["stage"] == "step3"
+    state = store.load(run["run_id"])["state"]
+    assert {"step1", "step2", "step3"} <= set(state["task_meta_data"])
+    assert state["navigator"]["reasoning_flow"] == state["task_meta_data"]["step3"]["reasoning_flow"]
+
+    with pytest.raises(KeyError):
+        reason_flux.resume("unknown")
+
+
+def test_store_from_yaml(tmp_path, monkeypatch):
+    config_file = os.path.abspath("ReasonFlux/config/storage/checkpoint_store.yaml")
+    monkeypatch.chdir(tmp_path)
+    store = initialize_checkpoint_store(config_file)
+    store.save("run-1", PROBLEM, "step1", {"task_meta_data": {}})
+    assert os.path.isfile(tmp_path / "output" / "checkpoints" / "checkpoints.sqlite3")
+    assert store.runs() == [{"run_id": "run-1", "problem": PROBLEM, "stage": "step1", "status": "running", "error": None}]
+    store.delete("run-1")
+    assert store.load("run-1") is None
+    store.close()
@@ -0,0 +1,35 @@
+import sys,os
+sys.path.append(os.getcwd())
+from ReasonFlux.utils.client import initialize_agent
+from ReasonFlux.utils.client_registry import ClientRegistry, client_registry
+from ReasonFlux.template_matcher import HierarchicalVectorDatabase
+
+
+def test_registry_shares_clients_per_endpoint_and_model():
+    registry = ClientRegistry()
+    client = registry.get_http_client("https://a.invalid/v1", "sk-1", "qwen-max", {"max_connections": 4})
+    assert registry.get_http_client("https://a.invalid/v1", "sk-1", "qwen-max") is client
+    assert registry.get_http_client("https://a.invalid/v1", "sk-1", "qwen-turbo") is not client
+    assert client._transport._pool._max_connections == 4
+
+    registry.close()
+    assert client.is_closed
+    assert registry.get_http_client("https://a.invalid/v1", "sk-1", "qwen-max") is not client
+
+
+def test_agents_and_embeddings_draw_from_the_registry(tmp_path):
+    navigator = initialize_agent("ReasonFlux/config/agent/navigator.yaml")
+    inference = initialize_agent("ReasonFlux/config/agent/inference.yaml")
+    assert navigator.model_client.http_client is inference.model_client.http_client
+
+    params = {
+        "api_key": "sk-xx",
+        "api_base": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+        "model": "text-embedding-v3",
+        "provider": "openai"
+    }
+    first = HierarchicalVectorDatabase(data_dir=str(tmp_path / "a"), embedding_params=params)
+    second = HierarchicalVectorDatabase(data_dir=str(tmp_path / "b"), embedding_params=params)
+    shared = client_registry.get_http_client(params["api_base"], params["api_key"], params["model"])
+    assert first.embedding_service.embedding_function._client._client._client is shared
+    assert second.embedding_service.embedding_function._client._client._client is shared
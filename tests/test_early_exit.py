@@ -0,0 +1,99 @@
+import sys,os
+sys.path.append(os.getcwd())
+from conftest import navigator_template, scripted_responder
+from ReasonFlux.agent import EarlyExitPolicy
+from ReasonFlux.agent.early_exit import FINAL_ANSWER_FLAG
+from ReasonFlux.reason_flux import ReasonFlux
+
+PROBLEM = "a1=3, a(n+1)=2a(n)+5, find a(n)."
+
+
+def _responder(flow, answer):
+    respond = scripted_responder(navigator_template())
+
+    def responder(messages):
+        system = messages[0].content
+        if system.startswith("As a math problem-solving tutor"):
+            return "<think>adjust</think>\n" + "\n".join(f"{i}. {step}" for i, step in enumerate(flow, 1))
+        if system.startswith("Now you are a student"):
+            return answer
+        return respond(messages)
+    return responder
+
+
+def _reason_flux(database, make_agents, flow, answer, **kwargs):
+    navigator, inference = make_agents()
+    navigator.model_client.responder = _responder(flow, answer)
+    inference.model_client.responder = _responder(flow, answer)
+    return ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database, **kwargs)
+
+
+def _instruction_calls(reason_flux):
+    return [
+        messages for messages in reason_flux.navigator.model_client.calls
+        if messages[0].content.startswith("You are a math tutor")
+    ]
+
+
+def test_boxed_answer_skips_restating_steps(database, make_agents):
+    flow = ["Derive the general term", "Verify the result for n=1 and n=2", "Summarize the final answer"]
+    reason_flux = _reason_flux(
+        database, make_agents, flow,
+        "<think>solve</think>\nSo a(n) = 2^(n+2) - 5, \\boxed{2^{n+2}-5}",
+        early_exit=EarlyExitPolicy(mode="boxed")
+    )
+    meta_data = reason_flux.run(PROBLEM)
+
+    assert len(meta_data["step4"]) == 1 and len(_instruction_calls(reason_flux)) == 1
+    assert meta_data["early_exit"] == {
+        "reason": "boxed_answer",
+        "after_iteration": 1,
+        "skipped_steps": flow[1:],
+        "saved_llm_calls": 4
+    }
+    assert reason_flux.early_exit_stats == {"exits": 1, "saved_llm_calls": 4}
+
+
+def test_boxed_answer_before_substantive_steps_continues(database, make_agents):
+    flow = ["Derive the general term", "Compute the sum of the first n terms", "Verify the result"]
+    reason_flux = _reason_flux(
+        database, make_agents, flow, "\\boxed{2^{n+2}-5}", early_exit=EarlyExitPolicy(mode="boxed")
+    )
+    meta_data = reason_flux.run(PROBLEM)
+
+    # the second step still does new work, the last one is skipped
+    assert len(meta_data["step4"]) == 2
+    assert meta_data["early_exit"]["saved_llm_calls"] == 2
+
+
+def test_off_by_default(database, make_agents):
+    flow = ["Derive the general term", "Verify the result", "Summarize the final answer"]
+    reason_flux = _reason_flux(database, make_agents, flow, "\\boxed{2^{n+2}-5}")
+    meta_data = reason_flux.run(PROBLEM)
+
+    assert len(meta_data["step4"]) == 3 and "early_exit" not in meta_data
+    assert "[FINAL ANSWER VERIFIED]" not in reason_flux.inference.model_client.calls[0][0].content
+
+
+def test_flag_is_requested_and_stripped(database, make_agents):
+    flow = ["Derive the general term", "Compute a(5)", "Double-check a(5)"]
+    reason_flux = _reason_flux(
+        database, make_agents, flow,
+        f"<think>solve</think>\nIt is \\boxed{{2^{{n+2}}-5}}\n{FINAL_ANSWER_FLAG}",
+        early_exit=EarlyExitPolicy(mode="flag")
+    )
+    meta_data = reason_flux.run(PROBLEM)
+
+    assert FINAL_ANSWER_FLAG in reason_flux.inference.model_client.calls[0][0].content
+    assert meta_data["early_exit"]["reason"] == "final_answer_flag"
+    assert meta_data["step4"][0]["reasoning"] == "It is \\boxed{2^{n+2}-5}"
+    assert reason_flux.navigator.instantiation == ["It is \\boxed{2^{n+2}-5}"]
+
+
+def test_policy_check():
+    policy = EarlyExitPolicy(mode="boxed")
+    assert policy.check("\\boxed{5}", ["Check the answer"]) == "boxed_answer"
+    assert policy.check("\\boxed{}", ["Check the answer"]) is None
+    assert policy.check("\\boxed{5}", []) is None
+    assert policy.check("no answer yet", ["Summarize"]) is None
+    assert EarlyExitPolicy(mode="flag").check("\\boxed{5}", ["Summarize"]) is None
@@ -0,0 +1,155 @@
+import sys,os
+sys.path.append(os.getcwd())
+import threading
+import time
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from conftest import HashEmbeddingFunction, HashEmbeddingService, format_library
+from ReasonFlux.template_matcher import EmbeddingBatcher, HierarchicalVectorDatabase
+from ReasonFlux.utils.client import initialize_hierarchical_database
+
+
+class RecordingEmbeddingFunction(HashEmbeddingFunction):
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, input):
+        self.requests.append(list(input))
+        return super().__call__(input)
+
+
+def _in_flight(batcher):
+    """Keep a batch in flight until the returned event is set, as another run's request would."""
+    sent, release = threading.Event(), threading.Event()
+
+    def embed(texts):
+        sent.set()
+        release.wait(timeout=10)
+        return HashEmbeddingFunction()(texts)
+    thread = threading.Thread(target=batcher.submit, args=(["in flight"], embed))
+    thread.start()
+    sent.wait(timeout=10)
+    return release, thread
+
+
+def _service(**batcher):
+    service = HashEmbeddingService()
+    service.embedding_function = RecordingEmbeddingFunction()
+    service.batcher = EmbeddingBatcher(**batcher)
+    return service
+
+
+def test_concurrent_encodes_share_one_request():
+    texts = [f"query {i}" for i in range(8)] + ["query 0"]
+    # sent once every text is in, however long the threads take to start
+    service = _service(max_wait_ms=5000, max_batch=len(texts))
+    release, in_flight = _in_flight(service.batcher)
+    with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+        vectors = list(executor.map(service.encode, texts))
+    release.set()
+    in_flight.join()
+
+    reference = HashEmbeddingService()
+    for text, vector in zip(texts, vectors):
+        assert np.allclose(vector, reference.encode(text))
+    # one request, each distinct text sent once
+    assert len(service.embedding_function.requests) == 1
+    assert sorted(service.embedding_function.requests[0]) == sorted(set(texts))
+    assert service.batcher.stats == {"requests": 10, "texts": 10, "batches": 2}
+
+
+def test_full_batch_is_sent_without_waiting():
+    service = _service(max_wait_ms=5000, max_batch=2)
+    release, in_flight = _in_flight(service.batcher)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(service.encode, ["a", "b", "c", "d"]))
+    assert time.monotonic() - start < 2
+    release.set()
+    in_flight.join()
+    assert [len(request) for request in service.embedding_function.requests] == [2, 2]
+
+
+def test_batches_are_split_into_requests_of_max_request_texts():
+    texts = [f"query {i}" for i in range(25)]
+    service = _service(max_wait_ms=5000, max_batch=len(texts))
+    service.max_request_texts = 10
+    release, in_flight = _in_flight(service.batcher)
+    with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+        vectors = list(executor.map(service.encode, texts))
+    release.set()
+    in_flight.join()
+
+    reference = HashEmbeddingService()
+    assert all(np.allclose(vector, reference.encode(text)) for text, vector in zip(texts, vectors))
+    assert service.batcher.stats["batches"] == 2
+    assert [len(request) for request in service.embedding_function.requests] == [10, 10, 5]
+
+
+def test_single_encode_is_sent_at_once():
+    service = _service(max_wait_ms=5000)
+    start = time.monotonic()
+    service.encode("alone")
+    assert time.monotonic() - start < 0.5
+    assert service.embedding_function.requests == [["alone"]]
+
+
+def test_encode_batch_is_split_into_requests_of_max_request_texts():
+    service = HashEmbeddingService()
+    service.embedding_function = RecordingEmbeddingFunction()
+    service.max_request_texts = 10
+    texts = [f"query {i}" for i in range(32)] + ["query 0"]
+    vectors = service.encode_batch(texts)
+
+    reference = HashEmbeddingService()
+    assert all(np.allclose(vector, reference.encode(text)) for text, vector in zip(texts, vectors))
+    assert [len(request) for request in service.embedding_function.requests] == [10, 10, 10, 2]
+
+
+def test_ingestion_encodes_each_level_together(tmp_path):
+    service = HashEmbeddingService()
+    service.embedding_function = RecordingEmbeddingFunction()
+    database = HierarchicalVectorDatabase(data_dir=str(tmp_path / "database"), embedding_service=service)
+    database.add_recursive_dict(format_library())
+    # one request per dictionary of the library: the categories, 2 directions, 2 method groups
+    assert sorted(len(request) for request in service.embedding_function.requests) == [1, 1, 1, 2, 2]
+
+
+def test_errors_reach_every_caller():
+    batcher = EmbeddingBatcher(max_wait_ms=5000, max_batch=3)
+    release, in_flight = _in_flight(batcher)
+    called = threading.Event()
+
+    def embed(texts):
+        called.set()
+        raise RuntimeError("provider down")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(batcher.submit, [f"text {i}"], embed) for i in range(3)]
+    release.set()
+    in_flight.join()
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result()
+    assert called.is_set() and batcher.stats["batches"] == 2
+
+
+def test_batching_from_config(tmp_path):
+    config_file = tmp_path / "database.yaml"
+    config_file.write_text(
+        f"data_dir: {tmp_path / 'database'}\n"
+        "embedding_service:\n"
+        "  provider: openai\n"
+        "  model: text-embedding-v3\n"
+        "  api_key: sk-test\n"
+        "  api_base: https://example.test/v1\n"
+        "  max_request_texts: 10\n"
+        "  batching:\n"
+        "    max_wait_ms: 2\n"
+        "    max_batch: 16\n"
+    )
+    database = initialize_hierarchical_database(str(config_file))
+    batcher = database.embedding_service.batcher
+    assert batcher.max_wait_ms == 2 and batcher.max_batch == 16
+    assert database.embedding_service.max_request_texts == 10
@@ -0,0 +1,51 @@
+import sys,os
+sys.path.append(os.getcwd())
+from ReasonFlux.reason_flux import ReasonFlux
+from conftest import navigator_template
+
+PROBLEM = "a1=3, a(n+1)=2a(n)+5, find a(n)."
+
+
+def _step3_prompts(client):
+    return [
+        messages for messages in client.calls
+        if messages[0].content.startswith(("As a math problem-solving tutor", "Please extract the reasoning flows"))
+    ]
+
+
+def test_fast_path_reuses_step1_flow(database, make_agents):
+    navigator, inference = make_agents()
+    reason_flux = ReasonFlux(
+        navigator=navigator,
+        inference=inference,
+        hierarchical_database=database,
+        fast_path=True
+    )
+
+    meta_data = reason_flux.run(PROBLEM)
+
+    gate = meta_data["step3"]["fast_path"]
+    assert gate["template_match"] is True
+    assert gate["normalized_similarity"] == meta_data["step2"]["similarity"] == 1.0
+    assert gate["taken"] is True
+    assert meta_data["step3"]["reasoning_flow"] == navigator_template()["reason_flow"]
+    assert _step3_prompts(navigator.model_client) == []
+    assert len(meta_data["step4"]) == 3
+
+
+def test_fast_path_requires_template_match(database, make_agents):
+    navigator, inference = make_agents(navigator_template("Some Other Method"))
+    reason_flux = ReasonFlux(
+        navigator=navigator,
+        inference=inference,
+        hierarchical_database=database,
+        fast_path=True
+    )
+
+    meta_data = reason_flux.run(PROBLEM)
+
+    assert meta_data["step3"]["fast_path"]["template_match"] is False
+    assert meta_data["step3"]["fast_path"]["taken"] is False
+    # the adjusted flow is a numbered list, so it is parsed without a second model call
+    assert len(_step3_prompts(navigator.model_client)) == 1
+    assert meta_data["step3"]["reasoning_flow_parser"] == "local"
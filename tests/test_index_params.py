@@ -0,0 +1,52 @@
+import sys,os
+sys.path.append(os.getcwd())
+import numpy as np
+from conftest import HashEmbeddingService, format_library
+from ReasonFlux.template_matcher import HierarchicalVectorDatabase, IndexParams
+from ReasonFlux.template_matcher.database import exact_distances
+
+QUERY = ["Sequences and Series", "Recursive sequences", "Constructing Geometric Sequences"]
+PARAMS = {"top_k_per_level": [2, 2, 3], "weight_per_level": [1, 0.1, 0.9], "final_count": 3}
+
+
+def _database(path, index_per_level):
+    database = HierarchicalVectorDatabase(
+        data_dir=str(path),
+        embedding_service=HashEmbeddingService(),
+        index_per_level=index_per_level
+    )
+    database.add_recursive_dict(format_library())
+    return database
+
+
+def test_index_params_are_applied_per_level(tmp_path):
+    database = _database(tmp_path, [
+        IndexParams(space="l2"),
+        IndexParams(space="cosine", M=8, construction_ef=64, search_ef=32)
+    ])
+    assert database.collections["level_0"].metadata["hnsw:space"] == "l2"
+    # the last entry applies to every deeper level
+    for name in ("level_1", "level_2"):
+        metadata = database.collections[name].metadata
+        assert metadata["hnsw:space"] == "cosine"
+        assert (metadata["hnsw:M"], metadata["hnsw:construction_ef"], metadata["hnsw:search_ef"]) == (8, 64, 32)
+
+    reloaded = HierarchicalVectorDatabase(data_dir=str(tmp_path), embedding_service=HashEmbeddingService())
+    assert reloaded.collections["level_2"].metadata["hnsw:space"] == "cosine"
+
+
+def test_cosine_similarity_of_an_exact_match(tmp_path):
+    database = _database(tmp_path, [IndexParams(space="cosine")])
+    result = database.hierarchical_search(QUERY, **PARAMS)[0]
+    assert result["doc"] == QUERY[-1]
+    # every level matches exactly, so each contributes its full weight
+    assert abs(result["similarity"] - sum(PARAMS["weight_per_level"])) < 1e-5
+    assert database.leaf_search(QUERY[-1], top_k=1)[0]["similarity"] > 0.999
+
+
+def test_exact_distances_per_space():
+    rng = np.random.default_rng(0)
+    embeddings, query = rng.standard_normal((20, 8)), rng.standard_normal(8)
+    assert np.allclose(exact_distances(embeddings, query, "l2"), np.sum((embeddings - query) ** 2, axis=1))
+    cosine = exact_distances(embeddings, query, "cosine")
+    assert np.allclose(exact_distances(embeddings / np.linalg.norm(embeddings, axis=1)[:, None], query / np.linalg.norm(query), "ip"), cosine)
@@ -0,0 +1,71 @@
+import sys,os
+sys.path.append(os.getcwd())
+import io
+import json
+import logging
+import logging.handlers
+import pytest
+from ReasonFlux.config import LoggingSettings
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.utils.common import configure_logging, flush_logging, logger
+
+PROBLEM = "a1=3, a(n+1)=2a(n)+5, find a(n)."
+
+
+@pytest.fixture
+def log_stream():
+    stream = io.StringIO()
+    yield stream
+    configure_logging()
+
+
+def test_asynchronous_json_records(log_stream):
+    configure_logging(LoggingSettings(format="json", asynchronous=True, max_field_chars=20), stream=log_stream)
+    logger.info("Retrieved template with similarity score: %s", 0.5, extra={"template": {"reason_flow": ["a" * 50]}})
+    logger.warning("short", extra={"similarity": 0.5})
+    flush_logging()
+
+    first, second = [json.loads(line) for line in log_stream.getvalue().splitlines()]
+    assert first["message"] == "Retrieved template with similarity score: 0.5"
+    assert first["template"].startswith('{"reason_flow": ["aa') and first["template"].endswith("more chars]")
+    assert second["level"] == "WARNING" and second["similarity"] == 0.5
+
+
+def test_asynchronous_json_exception(log_stream):
+    configure_logging(LoggingSettings(format="json", asynchronous=True), stream=log_stream)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Step %d failed", 2, extra={"problem": PROBLEM})
+    flush_logging()
+
+    record = json.loads(log_stream.getvalue())
+    assert record["message"] == "Step 2 failed" and record["problem"] == PROBLEM
+    assert record["exception"].startswith("Traceback") and record["exception"].endswith("ValueError: boom")
+
+
+def test_payloads_are_sampled_and_disabled_levels_are_skipped(log_stream):
+    configure_logging(LoggingSettings(level="WARNING", sample_rate=0.0), stream=log_stream)
+    logger.info("dropped", extra={"problem": PROBLEM})
+    logger.warning("kept", extra={"problem": PROBLEM})
+    configure_logging(LoggingSettings(sample_rate=0.0), stream=log_stream)
+    logger.info("kept without payload", extra={"problem": PROBLEM})
+
+    lines = log_stream.getvalue().splitlines()
+    assert "dropped" not in log_stream.getvalue()
+    assert lines[0].endswith("WARNING - kept") and lines[1] == f"  problem: {PROBLEM}"
+    assert lines[2].endswith("INFO - kept without payload") and len(lines) == 3
+
+
+def test_run_logs_structured_fields(log_stream, database, make_agents):
+    configure_logging(LoggingSettings(format="json", asynchronous=True), stream=log_stream)
+    navigator, inference = make_agents()
+    ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database).run(PROBLEM)
+    flush_logging()
+
+    records = [json.loads(line) for line in log_stream.getvalue().splitlines()]
+    assert records[0]["message"] == "Starting ReasonFlux" and records[0]["problem"] == PROBLEM
+    retrieved = next(record for record in records if record["message"].startswith("[Step2] Retrieved"))
+    assert retrieved["template"]["template_name"] == "Constructing Geometric Sequences"
+    assert sum(record["message"] == "Iteration 3/3 instruction" for record in records) == 1
+    assert isinstance(logging.getLogger("ReasonFlux").handlers[0], logging.handlers.QueueHandler)
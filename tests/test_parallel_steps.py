@@ -0,0 +1,110 @@
+import sys,os
+sys.path.append(os.getcwd())
+import threading
+import time
+from conftest import navigator_template, scripted_client, scripted_responder
+from ReasonFlux.agent import Navigator
+from ReasonFlux.agent.parser import split_step_dependencies
+from ReasonFlux.reason_flux import ReasonFlux
+
+PROBLEM = "Find all integers n such that n^2 + n + 1 is divisible by 3."
+
+FLOW = [
+    "Analyse the case of even n",
+    "Analyse the case of odd n",
+    "Combine both cases"
+]
+
+
+def test_split_step_dependencies():
+    steps, dependencies = split_step_dependencies([
+        "Observe the pattern (depends on: none)",
+        "Hypothesize a form",
+        "Verify the base case (Depends on: step 1).",
+        "Combine (depends on: 2 and 3, 7)"
+    ])
+    assert steps == ["Observe the pattern", "Hypothesize a form", "Verify the base case", "Combine"]
+    # no marker means the previous step, forward references are dropped
+    assert dependencies == [[], [0], [0], [1, 2]]
+
+
+def test_step_blocks():
+    navigator = Navigator(name="Navigator", model_client=scripted_client(None))
+    navigator.reasoning_flow = ["a", "b", "c", "d"]
+    navigator.reasoning_rounds = 4
+    assert navigator.step_blocks() == [[0], [1], [2], [3]]
+
+    navigator.step_dependencies = [[], [], [0, 1], [0]]
+    assert navigator.step_blocks() == [[0, 1], [2, 3]]
+    assert navigator.step_blocks(start=1) == [[1], [2, 3]]
+
+
+def _responders():
+    respond = scripted_responder(navigator_template())
+    # both independent steps must be in flight at once to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    interplay_calls = []
+
+    def navigator_responder(messages):
+        system = messages[0].content
+        if system.startswith("As a math problem-solving tutor"):
+            return "<think>adjust</think>\n1. {} (depends on: none)\n2. {} (depends on: none)\n3. {} (depends on: 1, 2)".format(*FLOW)
+        if system.startswith("You are a math tutor"):
+            return f"Instruction for {messages[-1].content.splitlines()[-1]}"
+        return respond(messages)
+
+    def inference_responder(messages):
+        instruction = messages[-1].content
+        interplay_calls.append(instruction)
+        if len(interplay_calls) <= 2:
+            barrier.wait()
+        if FLOW[0] in instruction:
+            # the first step finishes last, its output still comes first
+            time.sleep(0.2)
+        return f"<think>work</think>\nDone: {instruction}"
+    return navigator_responder, inference_responder
+
+
+def test_independent_steps_run_concurrently(database, make_agents):
+    navigator, inference = make_agents()
+    navigator.emit_dependencies = True
+    navigator.model_client.responder, inference.model_client.responder = _responders()
+    reason_flux = ReasonFlux(
+        navigator=navigator,
+        inference=inference,
+        hierarchical_database=database,
+        parallel_steps=True
+    )
+    meta_data = reason_flux.run(PROBLEM)
+
+    adjust_prompt = [
+        messages for messages in navigator.model_client.calls
+        if messages[0].content.startswith("As a math problem-solving tutor")
+    ][0]
+    assert "(depends on: none)" in adjust_prompt[1].content
+    assert meta_data["step3"]["reasoning_flow"] == FLOW
+    assert meta_data["step3"]["step_dependencies"] == [[], [], [0, 1]]
+
+    assert [iteration["instruction"] for iteration in meta_data["step4"]] == [
+        f"Instruction for {step}" for step in FLOW
+    ]
+    assert navigator.instantiation == [
+        f"Done: Teacher Instruction for Step {i}: Instruction for {step}" for i, step in enumerate(FLOW, 1)
+    ]
+    # the last step sees both independent steps in its history
+    last_instruction_prompt = navigator.model_client.calls[-1]
+    assert "Current step: Step 3:" in last_instruction_prompt[-1].content
+    assert len(last_instruction_prompt) == len(navigator.model_client.calls[-2]) + 2 * 3
+
+
+def test_dependencies_are_ignored_without_parallel_steps(database, make_agents):
+    navigator, inference = make_agents()
+    navigator_responder, _ = _responders()
+    navigator.model_client.responder = navigator_responder
+    reason_flux = ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database)
+    meta_data = reason_flux.run(PROBLEM)
+
+    # without emit_dependencies the markers are kept as part of the steps
+    assert meta_data["step3"]["reasoning_flow"][0] == f"{FLOW[0]} (depends on: none)"
+    assert "step_dependencies" not in meta_data["step3"]
+    assert len(meta_data["step4"]) == 3
@@ -0,0 +1,77 @@
+import sys,os
+sys.path.append(os.getcwd())
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from ReasonFlux.prompts.inference import (
+    INTERPLAY_PROMPT, INTERPLAY_EARLY_EXIT_PROMPT, INTERPLAY_STABLE_PROMPT, INTERPLAY_EARLY_EXIT_STABLE_PROMPT
+)
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.utils.client import initialize_agent
+from ReasonFlux.utils.tracing import UsageCallbackHandler
+
+PROBLEM = "a1=3, a(n+1)=2a(n)+5, find a(n)."
+
+
+def _layout(messages):
+    return [(message.type, message.content) for message in messages]
+
+
+def _step4_calls(reason_flux):
+    instructions = [
+        _layout(messages) for messages in reason_flux.navigator.model_client.calls
+        if messages[0].content.startswith("You are a math tutor")
+    ]
+    interplays = [_layout(messages) for messages in reason_flux.inference.model_client.calls]
+    return instructions, interplays
+
+
+def _run(database, make_agents, layout):
+    navigator, inference = make_agents()
+    navigator.prompt_layout = inference.prompt_layout = layout
+    reason_flux = ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database)
+    reason_flux.run(PROBLEM)
+    return _step4_calls(reason_flux)
+
+
+def test_stable_prefix_only_appends_turns(database, make_agents):
+    instructions, interplays = _run(database, make_agents, "stable_prefix")
+    assert len(instructions) == len(interplays) == 3
+    for calls in (instructions, interplays):
+        for previous, current in zip(calls, calls[1:]):
+            assert current[:len(previous)] == previous
+        # the system message holds no problem, which is the first turn
+        assert PROBLEM not in calls[0][0][1]
+        assert calls[0][1] == ("human", f"Problem:\n{PROBLEM}")
+
+
+def test_default_layout_rewrites_the_last_turn(database, make_agents):
+    instructions, interplays = _run(database, make_agents, "default")
+    assert PROBLEM in instructions[0][0][1] and PROBLEM in interplays[0][0][1]
+    assert instructions[1][:len(instructions[0])] != instructions[0]
+
+
+@pytest.mark.parametrize("default, stable", [
+    (INTERPLAY_PROMPT, INTERPLAY_STABLE_PROMPT),
+    (INTERPLAY_EARLY_EXIT_PROMPT, INTERPLAY_EARLY_EXIT_STABLE_PROMPT)
+])
+def test_interplay_layouts_share_the_system_text(default, stable):
+    merged = _layout(default.format_messages(problem=PROBLEM))
+    split = _layout(stable.format_messages(problem=PROBLEM))
+    assert merged == [("system", f"{split[0][1]}\n\n{split[1][1]}")]
+    assert ("[FINAL ANSWER VERIFIED]" in merged[0][1]) == (default is INTERPLAY_EARLY_EXIT_PROMPT)
+
+
+def test_cached_tokens_are_collected():
+    usage = UsageCallbackHandler()
+    message = AIMessage(content="ok", usage_metadata={
+        "input_tokens": 1200, "output_tokens": 10, "total_tokens": 1210,
+        "input_token_details": {"cache_read": 1024}
+    })
+    usage.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+    assert (usage.prompt_tokens, usage.cached_tokens) == (1200, 1024)
+
+
+@pytest.mark.parametrize("config", ["navigator", "inference"])
+def test_yaml_prompt_layout(config):
+    assert initialize_agent(f"ReasonFlux/config/agent/{config}.yaml").prompt_layout == "default"
@@ -0,0 +1,78 @@
+import sys,os
+sys.path.append(os.getcwd())
+import pytest
+from langchain.schema import OutputParserException
+from ReasonFlux.agent.parser import reasoning_flow_parser
+from ReasonFlux.reason_flux import ReasonFlux
+from conftest import scripted_responder, navigator_template
+
+PROBLEM = "a1=3, a(n+1)=2a(n)+5, find a(n)."
+
+
+@pytest.mark.parametrize("text", [
+    '["Observe the recurrence", "Derive the general term"]',
+    '```json\n[\n  "Observe the recurrence",\n  "Derive the general term"\n]\n```',
+    "Optimized Reasoning Flow:\n1. Observe the recurrence\n2. Derive the general term",
+    "1) Observe the recurrence\n2) Derive the general term\n\nThe flow leaves the computation to the student.",
+    "**Step 1:** Observe the recurrence\n**Step 2:** Derive the general term",
+    "- Observe the recurrence\n- Derive the general term",
+    "① Observe the recurrence\n② Derive the general term",
+])
+def test_parses_adjustment_formats(text):
+    assert reasoning_flow_parser.parse(text) == ["Observe the recurrence", "Derive the general term"]
+
+
+def test_joins_continuation_lines_and_sub_points():
+    text = "1. Observe the\nrecurrence\n   - compare a(n+1) with a(n)\n2. Derive the general term"
+    assert reasoning_flow_parser.parse(text) == [
+        "Observe the recurrence - compare a(n+1) with a(n)",
+        "Derive the general term"
+    ]
+
+
+def test_strips_bold_from_steps():
+    text = "1. **Observe**: look at the recurrence\n2. __Derive__ the **general** term"
+    assert reasoning_flow_parser.parse(text) == ["Observe: look at the recurrence", "Derive the general term"]
+
+
+def test_prefers_the_numbered_list():
+    text = (
+        "Applied optimizations:\n- Merged the two calculation steps\n- Abstracted the pattern\n\n"
+        "Optimized reasoning flow:\n1. Observe the recurrence\n2. Derive the general term"
+    )
+    assert reasoning_flow_parser.parse(text) == ["Observe the recurrence", "Derive the general term"]
+
+
+def test_rejects_ambiguous_lists():
+    with pytest.raises(OutputParserException):
+        reasoning_flow_parser.parse("1. Observe the recurrence\n\nOr:\n1. Guess the general term\n2. Prove it")
+    with pytest.raises(OutputParserException):
+        reasoning_flow_parser.parse("- Observe the recurrence\n\nThen:\n- Derive the general term")
+
+
+def test_rejects_text_without_steps():
+    with pytest.raises(OutputParserException):
+        reasoning_flow_parser.parse("Observe the recurrence, then derive the general term.")
+    with pytest.raises(OutputParserException):
+        reasoning_flow_parser.parse('[{"step": "Observe"}]')
+
+
+def test_falls_back_to_the_model(database, make_agents):
+    navigator, inference = make_agents()
+    respond = scripted_responder(navigator_template())
+
+    def prose_adjustment(messages):
+        if messages[0].content.startswith("As a math problem-solving tutor"):
+            return "<think>adjust</think>\nObserve the recurrence, then derive the general term."
+        return respond(messages)
+
+    navigator.model_client.responder = prose_adjustment
+    reason_flux = ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database)
+
+    meta_data = reason_flux.run(PROBLEM)
+    reason_flux.run(PROBLEM)
+
+    assert meta_data["step3"]["reasoning_flow_parser"] == "llm"
+    assert meta_data["step3"]["reasoning_flow"] == \
+        ["Observe the recurrence", "Hypothesize a geometric form", "Derive the general term"]
+    assert navigator.flow_parse_stats == {"local": 0, "fallback": 2}
@@ -0,0 +1,128 @@
+import sys,os
+sys.path.append(os.getcwd())
+import httpx
+import openai
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableLambda
+from ReasonFlux.agent import BaseAgent, AgentCallError, CircuitOpenError, RetryPolicy
+from ReasonFlux.agent import base as agent_base
+from ReasonFlux.agent.retry import classify_error, get_retry_after
+from ReasonFlux.utils.client import initialize_agent
+
+
+class CallableAgent(BaseAgent):
+    def step(self, chain, **kwargs):
+        return chain.invoke(kwargs)
+
+
+def _status_error(error_type, status_code, headers=None):
+    response = httpx.Response(
+        status_code,
+        headers=headers or {},
+        request=httpx.Request("POST", "https://example.invalid/v1/chat/completions")
+    )
+    return error_type("provider error", response=response, body=None)
+
+
+def _agent(base_url, **kwargs):
+    return CallableAgent(
+        name="test",
+        client_params={**BaseAgent.model_fields["client_params"].default, "base_url": base_url},
+        **kwargs
+    )
+
+
+def _flaky(errors, result="ok"):
+    errors = list(errors)
+    def call(_):
+        if errors:
+            raise errors.pop(0)
+        return result
+    return RunnableLambda(call)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(agent_base.time, "sleep", recorded.append)
+    return recorded
+
+
+def test_backoff_grows_caps_and_honors_retry_after():
+    policy = RetryPolicy(initial_backoff=1, max_backoff=5, backoff_multiplier=2, jitter=0)
+    assert [policy.backoff(attempt) for attempt in range(1, 5)] == [1, 2, 4, 5]
+    assert policy.backoff(1, retry_after=7.5) == 7.5
+    assert RetryPolicy(max_retry_after=3).backoff(1, retry_after=60) == 3
+
+
+def test_error_classification_and_retry_after():
+    rate_limited = _status_error(openai.RateLimitError, 429, {"retry-after": "2"})
+    assert classify_error(rate_limited) == "retryable"
+    assert get_retry_after(rate_limited) == 2.0
+    assert get_retry_after(_status_error(openai.RateLimitError, 429, {"retry-after-ms": "250"})) == 0.25
+    assert classify_error(_status_error(openai.InternalServerError, 503)) == "retryable"
+    assert classify_error(OutputParserException("bad json")) == "parse"
+    assert classify_error(_status_error(openai.AuthenticationError, 401)) == "fatal"
+
+
+def test_retryable_errors_back_off_within_the_call_budget(sleeps):
+    agent = _agent("https://retry.invalid", max_steps=3, retry_policy=RetryPolicy(jitter=0))
+    call = _flaky([
+        _status_error(openai.RateLimitError, 429, {"retry-after": "4"}),
+        _status_error(openai.InternalServerError, 500)
+    ])
+
+    assert agent.run(call) == "ok"
+    assert sleeps == [4.0, 2.0]
+
+    # the budget is per call, so a later call starts from scratch
+    assert agent.run(_flaky([_status_error(openai.InternalServerError, 500)] * 2)) == "ok"
+    assert agent.current_step == 3
+
+
+def test_budget_exhaustion_raises(sleeps):
+    agent = _agent("https://exhausted.invalid", max_steps=2, retry_policy=RetryPolicy(jitter=0))
+    with pytest.raises(AgentCallError):
+        agent.run(_flaky([_status_error(openai.InternalServerError, 500)] * 2))
+    assert len(sleeps) == 1
+
+
+def test_parse_errors_are_resampled_without_backoff(sleeps):
+    agent = _agent("https://parse.invalid", max_steps=5, retry_policy=RetryPolicy(max_parse_retries=1))
+    assert agent.run(_flaky([OutputParserException("bad json")])) == "ok"
+    with pytest.raises(AgentCallError):
+        agent.run(_flaky([OutputParserException("bad json")] * 2))
+    assert sleeps == []
+
+
+def test_fatal_errors_are_not_retried(sleeps):
+    agent = _agent("https://fatal.invalid", max_steps=5)
+    with pytest.raises(openai.AuthenticationError):
+        agent.run(_flaky([_status_error(openai.AuthenticationError, 401)]))
+    assert agent.current_step == 1
+
+
+def test_circuit_breaker_sheds_load_until_reset(sleeps, monkeypatch):
+    policy = RetryPolicy(jitter=0, failure_threshold=2, reset_timeout=10)
+    agent = _agent("https://down.invalid", max_steps=1, retry_policy=policy)
+    other = _agent("https://down.invalid", max_steps=1, retry_policy=policy)
+    for _ in range(2):
+        with pytest.raises(AgentCallError):
+            agent.run(_flaky([_status_error(openai.InternalServerError, 502)]))
+
+    # shared by every agent on the same endpoint and model
+    with pytest.raises(CircuitOpenError):
+        other.run(_flaky([]))
+
+    now = agent_base.time.monotonic()
+    monkeypatch.setattr("ReasonFlux.agent.retry.time.monotonic", lambda: now + 11)
+    assert other.run(_flaky([])) == "ok"
+    assert agent.run(_flaky([])) == "ok"
+
+
+def test_clients_do_not_retry_on_their_own():
+    # a retry inside the openai client would bypass the policy's backoff and circuit breaker
+    navigator = initialize_agent("ReasonFlux/config/agent/navigator.yaml")
+    clients = [navigator.model_client, *navigator.stage_clients.values()]
+    assert len(clients) == 3 and all(client.max_retries == 0 for client in clients)
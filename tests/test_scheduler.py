@@ -0,0 +1,147 @@
+import sys,os
+sys.path.append(os.getcwd())
+import contextvars
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from conftest import navigator_template, scripted_responder
+from ReasonFlux.utils.client import initialize_scheduler
+from ReasonFlux.utils.scheduler import CallScheduler, call_scheduler, set_run_progress
+
+ENDPOINT = "https://example.test/v1"
+
+
+@pytest.fixture
+def scheduler():
+    yield call_scheduler
+    call_scheduler.reset()
+
+
+def test_request_limit_spaces_calls():
+    scheduler = CallScheduler()
+    scheduler.configure(ENDPOINT, "model", requests_per_minute=600, burst_seconds=0.1)
+
+    start = time.monotonic()
+    for _ in range(4):
+        scheduler.call(ENDPOINT, "model", lambda: None)
+    # a burst of one request, then one every 0.1s
+    assert 0.25 <= time.monotonic() - start < 1.0
+    assert scheduler.stats["calls"] == 4 and scheduler.stats["delayed"] == 3
+    # other endpoints are not limited
+    start = time.monotonic()
+    for _ in range(4):
+        scheduler.call(ENDPOINT, "other", lambda: None)
+    assert time.monotonic() - start < 0.05
+
+
+def test_token_limit():
+    scheduler = CallScheduler()
+    scheduler.configure(ENDPOINT, "model", tokens_per_minute=6000, burst_seconds=1)
+
+    start = time.monotonic()
+    scheduler.call(ENDPOINT, "model", lambda: None, tokens=100)
+    assert time.monotonic() - start < 0.05
+    scheduler.call(ENDPOINT, "model", lambda: None, tokens=50)
+    assert 0.4 <= time.monotonic() - start < 1.0
+
+
+def test_runs_closer_to_completion_go_first():
+    scheduler = CallScheduler()
+    scheduler.configure(ENDPOINT, "model", requests_per_minute=240, burst_seconds=0.25)
+    scheduler.call(ENDPOINT, "model", lambda: None)
+    order = []
+
+    def call(progress, name):
+        set_run_progress(progress)
+        scheduler.call(ENDPOINT, "model", lambda: order.append(name))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        executor.submit(contextvars.copy_context().run, call, 0.1, "starting")
+        time.sleep(0.05)
+        executor.submit(contextvars.copy_context().run, call, 0.9, "finishing")
+    assert order == ["finishing", "starting"]
+
+
+def test_identical_calls_in_flight_are_coalesced():
+    scheduler = CallScheduler(coalesce=True)
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(timeout=5)
+        return {"answer": [1, 2]}
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        leader = executor.submit(scheduler.call, ENDPOINT, "model", fn, coalesce_key="same")
+        time.sleep(0.05)
+        follower = executor.submit(scheduler.call, ENDPOINT, "model", fn, coalesce_key="same")
+        other = executor.submit(scheduler.call, ENDPOINT, "model", lambda: "other", coalesce_key="different")
+        time.sleep(0.05)
+        release.set()
+    assert leader.result() == follower.result() == {"answer": [1, 2]}
+    # followers get their own copy of the result
+    assert leader.result() is not follower.result()
+    assert other.result() == "other"
+    assert len(calls) == 1 and scheduler.stats["coalesced"] == 1
+
+
+def test_coalesced_calls_share_errors():
+    scheduler = CallScheduler(coalesce=True)
+    release = threading.Event()
+
+    def fn():
+        release.wait(timeout=5)
+        raise RuntimeError("provider down")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(scheduler.call, ENDPOINT, "model", fn, coalesce_key="same")
+        time.sleep(0.05)
+        follower = executor.submit(scheduler.call, ENDPOINT, "model", fn, coalesce_key="same")
+        time.sleep(0.05)
+        release.set()
+    for future in (leader, follower):
+        with pytest.raises(RuntimeError):
+            future.result()
+    # nothing is left in flight
+    assert scheduler.call(ENDPOINT, "model", lambda: "ok", coalesce_key="same") == "ok"
+
+
+def test_agents_calls_go_through_the_scheduler(scheduler, make_agents):
+    scheduler.coalesce = True
+    navigator, _ = make_agents()
+    release = threading.Event()
+    respond = scripted_responder(navigator_template())
+
+    def responder(messages):
+        release.wait(timeout=5)
+        return respond(messages)
+    navigator.model_client.responder = responder
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(navigator.initialize_reason_problem, "problem", "Observe the recurrence")
+            for _ in range(2)
+        ]
+        time.sleep(0.1)
+        release.set()
+    assert [future.result() for future in futures] == ["Instruction 2"] * 2
+    assert len(navigator.model_client.calls) == 1
+
+
+def test_initialize_scheduler(scheduler, tmp_path):
+    config_file = tmp_path / "scheduler.yaml"
+    config_file.write_text(
+        "coalesce: true\n"
+        "limits:\n"
+        f"  - base_url: {ENDPOINT}\n"
+        "    model: model\n"
+        "    requests_per_minute: 60\n"
+        "    burst_seconds: 5\n"
+    )
+    assert initialize_scheduler(str(config_file)) is call_scheduler
+    limit = call_scheduler.limits[(ENDPOINT, "model")]
+    assert call_scheduler.coalesce and limit.tokens is None
+    assert limit.requests.capacity == 5
+
@@ -0,0 +1,62 @@
+import sys,os
+sys.path.append(os.getcwd())
+import re
+from conftest import HashEmbeddingFunction, HashEmbeddingService
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.template_matcher import SemanticCache
+from ReasonFlux.utils.client import initialize_semantic_cache
+
+PROBLEM = "a1=3, a(n+1)=2a(n)+5, find a(n)."
+RENUMBERED = "a1=4, a(n+1)=2a(n)+7, find a(n)."
+UNRELATED = "Find the amplitude of sin x + cos x."
+
+
+class DigitBlindEmbeddingFunction(HashEmbeddingFunction):
+    """Problems that differ only in their numbers get the same vector."""
+    def __call__(self, input):
+        return super().__call__([re.sub(r"\d", "#", text) for text in input])
+
+
+def _reason_flux(database, make_agents):
+    embedding_service = HashEmbeddingService()
+    embedding_service.embedding_function = DigitBlindEmbeddingFunction()
+    navigator, inference = make_agents()
+    cache = SemanticCache(chroma_client=database.chroma_client, embedding_service=embedding_service)
+    return ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database, semantic_cache=cache)
+
+
+def test_exact_and_similar_hits(database, make_agents):
+    reason_flux = _reason_flux(database, make_agents)
+    calls = reason_flux.navigator.model_client.calls
+
+    first = reason_flux.run(PROBLEM)
+    assert first["cache"] == {"kind": "miss"}
+    full_calls = len(calls)
+
+    exact = reason_flux.run(PROBLEM)
+    assert exact["cache"]["kind"] == "exact"
+    assert exact["step4"] == first["step4"]
+    assert len(calls) == full_calls
+    assert exact["timing"]["llm_calls"] == []
+
+    similar = reason_flux.run(RENUMBERED)
+    assert similar["cache"]["kind"] == "similar" and similar["cache"]["problem"] == PROBLEM
+    assert similar["step1"]["template"]["Problem"] == RENUMBERED
+    assert similar["step3"]["reasoning_flow"] == first["step3"]["reasoning_flow"]
+    # only Step4 runs: no trajectory building and no adjustment
+    step4_calls = [call for call in calls[full_calls:] if call[0].content.startswith("You are a math tutor")]
+    assert len(calls) - full_calls == len(step4_calls) == 3
+    assert all(RENUMBERED in call[0].content for call in step4_calls)
+
+    assert reason_flux.run(UNRELATED)["cache"] == {"kind": "miss"}
+    assert reason_flux.semantic_cache.stats == {"lookups": 4, "exact": 1, "similar": 1}
+
+
+def test_cache_is_separate_from_template_levels(database):
+    cache = initialize_semantic_cache("ReasonFlux/config/database/semantic_cache.yaml", database)
+    cache.add(PROBLEM, {"problem": PROBLEM})
+    assert cache.similarity_threshold == 0.95
+    assert cache.lookup(PROBLEM)["result"] == {"problem": PROBLEM}
+    assert database.leaf_search(PROBLEM, top_k=10)[0]["doc"] != PROBLEM
+    cache.clear()
+    assert cache.lookup(PROBLEM) is None
@@ -0,0 +1,149 @@
+import sys,os
+sys.path.append(os.getcwd())
+import asyncio
+import threading
+import httpx
+from conftest import navigator_template, scripted_responder
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.server import ReasonFluxServer, create_app
+from ReasonFlux.template_matcher import HierarchicalVectorDatabase
+
+PROBLEM = "a1=3, a(n+1)=2a(n)+5, find a(n)."
+
+
+def _server(database, make_agents, **kwargs):
+    navigator, inference = make_agents()
+    pipeline = ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database)
+    return ReasonFluxServer(pipelines=[pipeline], **kwargs)
+
+
+def _block_inference(server):
+    """Hold every interplay call until the returned event is set."""
+    release = threading.Event()
+    respond = scripted_responder(navigator_template())
+
+    def responder(messages):
+        release.wait(timeout=10)
+        return respond(messages)
+    server.pipelines[0].inference.model_client.responder = responder
+    return release
+
+
+async def _until(condition):
+    for _ in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def _run(server, scenario):
+    async def main():
+        transport = httpx.ASGITransport(app=create_app(server))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+def test_solve_and_metrics(database, make_agents):
+    server = _server(database, make_agents)
+
+    async def scenario(client):
+        response = await client.post("/v1/solve", json={"problem": PROBLEM})
+        assert response.status_code == 200
+        assert len(response.json()["step4"]) == 3
+        await _until(lambda: server.metrics()["running"] == 0)
+        return (await client.get("/metrics")).json()
+
+    metrics = _run(server, scenario)
+    assert metrics["requests"]["completed"] == 1 and metrics["queue_depth"] == 0
+    assert {"queue_wait", "run", "total", "step1", "step2", "step3", "step4"} <= set(metrics["latency"])
+    assert metrics["latency"]["step4"]["count"] == 1
+
+
+def test_saturated_server_rejects_with_429(database, make_agents):
+    server = _server(database, make_agents, queue_size=1, retry_after=2)
+    release = _block_inference(server)
+
+    async def scenario(client):
+        running = asyncio.create_task(client.post("/v1/solve", json={"problem": PROBLEM}))
+        await _until(lambda: server.metrics()["running"] == 1)
+        waiting = asyncio.create_task(client.post("/v1/solve", json={"problem": PROBLEM}))
+        await _until(lambda: server.metrics()["queue_depth"] == 1)
+
+        rejected = await client.post("/v1/solve", json={"problem": PROBLEM})
+        release.set()
+        return rejected, await running, await waiting
+
+    try:
+        rejected, running, waiting = _run(server, scenario)
+    finally:
+        release.set()
+    assert rejected.status_code == 429 and rejected.headers["Retry-After"] == "2"
+    # both admitted requests are solved, one after the other on the single pipeline
+    assert running.status_code == 200 and waiting.status_code == 200
+    assert server.counters["admitted"] == 2 and server.counters["rejected"] == 1
+
+
+def test_deadlines(database, make_agents):
+    server = _server(database, make_agents)
+    release = _block_inference(server)
+
+    async def scenario(client):
+        solving = asyncio.create_task(client.post("/v1/solve", json={"problem": PROBLEM, "deadline": 0.5}))
+        await _until(lambda: server.metrics()["running"] == 1)
+        expired = await client.post("/v1/solve", json={"problem": PROBLEM, "deadline": 0.1})
+        timed_out = await solving
+
+        # the pipeline is back in the pool once the abandoned run finishes
+        release.set()
+        await _until(lambda: server.metrics()["running"] == 0)
+        solved = await client.post("/v1/solve", json={"problem": PROBLEM, "deadline": 5})
+        return expired, timed_out, solved
+
+    try:
+        expired, timed_out, solved = _run(server, scenario)
+    finally:
+        release.set()
+    assert expired.status_code == 504 and timed_out.status_code == 504
+    assert solved.status_code == 200
+    assert server.counters["expired"] == 1 and server.counters["timed_out"] == 1
+
+
+def test_search(database, make_agents):
+    server = _server(database, make_agents)
+
+    async def scenario(client):
+        leaf = await client.post("/v1/search", json={"query": "Find the general term of a recurrence", "top_k": 2})
+        invalid = await client.post("/v1/search", json={"top_k": 2})
+        return leaf, invalid
+
+    leaf, invalid = _run(server, scenario)
+    assert leaf.status_code == 200 and len(leaf.json()["results"]) == 2
+    assert invalid.status_code == 422
+    assert server.metrics()["latency"]["search"]["count"] == 1
+
+
+def test_abandoned_searches_keep_their_slots(database, make_agents, monkeypatch):
+    server = _server(database, make_agents, search_workers=1, queue_size=1)
+    release = threading.Event()
+    monkeypatch.setattr(HierarchicalVectorDatabase, "leaf_search", lambda self, query, top_k: release.wait(timeout=10) and [])
+
+    async def scenario(client):
+        timed_out = await client.post("/v1/search", json={"query": PROBLEM, "deadline": 0.1})
+        # the abandoned search still holds the only slot and counts against admission
+        searching = server.metrics()["searching"]
+        expired = await client.post("/v1/search", json={"query": PROBLEM, "deadline": 0.1})
+        # solves do not queue behind the searches
+        solved = await client.post("/v1/solve", json={"problem": PROBLEM, "deadline": 5})
+        release.set()
+        await _until(lambda: server.metrics()["searching"] == 0)
+        return timed_out, searching, expired, solved
+
+    try:
+        timed_out, searching, expired, solved = _run(server, scenario)
+    finally:
+        release.set()
+    assert timed_out.status_code == 504 and expired.status_code == 504 and searching == 1
+    assert solved.status_code == 200
+    assert server.counters["timed_out"] == 1 and server.counters["expired"] == 1
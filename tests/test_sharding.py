@@ -0,0 +1,65 @@
+import sys,os
+sys.path.append(os.getcwd())
+import pytest
+from conftest import HashEmbeddingService, format_library
+from ReasonFlux.template_matcher import HierarchicalVectorDatabase
+from ReasonFlux.utils.tracing import trace_run
+
+QUERIES = [
+    ["Sequences and Series", "Recursive sequences", "Constructing Geometric Sequences"],
+    ["Trigonometric Functions", "Identities", "Auxiliary Angle Formula"],
+    ["Sequences and Series", "Recursive sequences", "Accumulation Method"]
+]
+PARAMS = {"top_k_per_level": [2, 2, 3], "weight_per_level": [1, 0.1, 0.9], "final_count": 3}
+
+
+def _database(path, **kwargs):
+    return HierarchicalVectorDatabase(data_dir=str(path), embedding_service=HashEmbeddingService(), **kwargs)
+
+
+def _strip_ids(results):
+    return [[(cand["doc"], round(cand["similarity"], 6), cand["meta_data"]["data"]) for cand in result] for result in results]
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    database = _database(tmp_path / "sharded", shard_by_category=True)
+    database.add_recursive_dict(format_library())
+    return database
+
+
+def test_lower_levels_are_split_per_category(sharded):
+    assert [name for name in sharded.collections if name.startswith("level_0")] == ["level_0"]
+    assert "level_1" not in sharded.collections and "level_2" not in sharded.collections
+    # two categories, each with its own shard of level 1 and level 2
+    assert len(sharded.level_collections(1)) == 2 and len(sharded.level_collections(2)) == 2
+    assert sum(collection.count() for collection in sharded.level_collections(2)) == 3
+    assert sharded.max_level == 3
+
+
+def test_sharded_search_matches_unsharded(sharded, database):
+    assert _strip_ids(sharded.hierarchical_search_batch(QUERIES, **PARAMS)) == \
+        _strip_ids(database.hierarchical_search_batch(QUERIES, **PARAMS))
+    assert _strip_ids([sharded.leaf_search("Accumulation Method", top_k=3)]) == \
+        _strip_ids([database.leaf_search("Accumulation Method", top_k=3)])
+
+
+def test_child_queries_only_touch_the_chosen_shard(sharded):
+    with trace_run() as run_trace:
+        sharded.hierarchical_search(QUERIES[1], top_k_per_level=[1, 1, 1], weight_per_level=[1, 1, 1])
+    queried = [record.attributes["collection"] for record in run_trace.spans if record.kind == "vector_query"]
+    category = sharded.collections["level_0"].get(where={"parent": ""}, include=["documents"])
+    root_id = category["ids"][category["documents"].index("Trigonometric Functions")]
+    assert queried == ["level_0", f"level_1_{root_id}", f"level_2_{root_id}"]
+
+
+def test_sharding_is_detected_on_load(sharded, tmp_path):
+    reloaded = _database(tmp_path / "sharded")
+    assert reloaded.shard_by_category and reloaded.max_level == 3
+    assert _strip_ids([reloaded.hierarchical_search(QUERIES[0], **PARAMS)]) == \
+        _strip_ids([sharded.hierarchical_search(QUERIES[0], **PARAMS)])
+
+    unsharded = _database(tmp_path / "unsharded")
+    unsharded.add_recursive_dict(format_library())
+    with pytest.raises(ValueError):
+        _database(tmp_path / "unsharded", shard_by_category=True)
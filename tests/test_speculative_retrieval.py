@@ -0,0 +1,58 @@
+import sys,os
+sys.path.append(os.getcwd())
+from ReasonFlux.reason_flux import ReasonFlux
+from conftest import navigator_template
+
+# Hash embeddings only match identical text, so a problem worded exactly like a
+# template name is the one case where the speculative search can find it.
+PROBLEM = "Constructing Geometric Sequences"
+
+
+def test_leaf_search_returns_leaf_candidates(database):
+    results = database.leaf_search("Accumulation Method", top_k=2)
+    assert len(results) == 2
+    assert results[0]["doc"] == "Accumulation Method"
+    assert results[0]["meta_data"]["depth"] == database.max_level - 1
+    assert results[0]["similarity"] == 1.0
+
+
+def test_speculative_hit_skips_hierarchical_search(database, make_agents, monkeypatch):
+    navigator, inference = make_agents()
+    reason_flux = ReasonFlux(
+        navigator=navigator,
+        inference=inference,
+        hierarchical_database=database,
+        speculative_retrieval=True,
+        speculative_top_k=3
+    )
+
+    def hierarchical_search(*args, **kwargs):
+        raise AssertionError("hierarchical search should be skipped")
+    monkeypatch.setattr(type(database), "hierarchical_search", hierarchical_search)
+
+    meta_data = reason_flux.run(PROBLEM)
+
+    assert meta_data["step2"]["speculative_hit"] is True
+    assert meta_data["step2"]["source"] == "speculative" and meta_data["step2"]["similarity"] == 1.0
+    assert meta_data["step2"]["template"]["template_name"] == "Constructing Geometric Sequences"
+    assert reason_flux.speculation_stats == {"attempts": 1, "hits": 1}
+
+
+def test_speculative_miss_falls_back(database, make_agents):
+    navigator, inference = make_agents(navigator_template("Accumulation Method"))
+    reason_flux = ReasonFlux(
+        navigator=navigator,
+        inference=inference,
+        hierarchical_database=database,
+        speculative_retrieval=True,
+        speculative_top_k=1
+    )
+
+    meta_data = reason_flux.run(PROBLEM)
+
+    assert meta_data["step2"]["speculative_hit"] is False
+    # the weighted sum over levels is brought to the 0-1 scale of a speculative hit
+    assert meta_data["step2"]["source"] == "hierarchical"
+    assert abs(meta_data["step2"]["raw_similarity"] - sum(reason_flux.weight_per_level)) < 1e-5
+    assert abs(meta_data["step2"]["similarity"] - 1.0) < 1e-5
+    assert reason_flux.speculation_stats == {"attempts": 1, "hits": 0}
@@ -0,0 +1,54 @@
+import sys,os
+sys.path.append(os.getcwd())
+import pytest
+from conftest import navigator_template, scripted_client, scripted_responder
+from ReasonFlux.agent import Navigator
+from ReasonFlux.utils.client import initialize_agent
+from ReasonFlux.utils.tracing import trace_run
+
+
+def test_yaml_stages_get_their_own_clients():
+    navigator = initialize_agent("ReasonFlux/config/agent/navigator.yaml")
+    flow_client = navigator.client_for("update_reasoning_flow")
+    assert flow_client is not navigator.model_client
+    assert flow_client.model_name == "qwen-turbo"
+    assert flow_client.max_tokens == 1024
+    assert flow_client.temperature == 0.0
+
+    # unset fields fall back to the agent's llm settings
+    instruction_client = navigator.client_for("initialize_reason_problem")
+    assert instruction_client.model_name == navigator.model_client.model_name
+    assert instruction_client.max_tokens == 1024
+    assert navigator.client_for("dynamic_adjustment") is navigator.model_client
+
+    inference = initialize_agent("ReasonFlux/config/agent/inference.yaml")
+    assert inference.client_for("interplay") is inference.model_client
+
+
+def test_unknown_stage_is_rejected():
+    with pytest.raises(ValueError, match="Unknown stages"):
+        Navigator(name="Navigator", stage_params={"interplay": {"model": "qwen-turbo"}})
+
+
+def test_calls_are_routed_to_the_stage_client():
+    responder = scripted_responder(navigator_template())
+    default, small = scripted_client(responder), scripted_client(responder)
+    navigator = Navigator(
+        name="Navigator",
+        model_client=default,
+        stage_params={"update_reasoning_flow": {"model": "qwen-turbo"}},
+        stage_clients={"update_reasoning_flow": small}
+    )
+
+    with trace_run() as run_trace:
+        navigator.initializing_reasoning_trajectory("a1=3, a(n+1)=2a(n)+5, find a(n).")
+        navigator.update_reasoning_flow("Observe the recurrence, then derive the general term.")
+
+    assert len(default.calls) == 1 and len(small.calls) == 1
+    assert small.calls[0][0].content.startswith("Please extract the reasoning flows")
+    assert navigator.reasoning_rounds == 3
+    calls = run_trace.summary()["llm_calls"]
+    assert [(call["stage"], call["model"]) for call in calls] == [
+        ("initializing_reasoning_trajectory", "qwen-long"),
+        ("update_reasoning_flow", "qwen-turbo")
+    ]
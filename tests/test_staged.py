@@ -0,0 +1,93 @@
+import sys,os
+sys.path.append(os.getcwd())
+from conftest import HashEmbeddingFunction
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.staged import StagedExecutor
+
+PROBLEMS = [f"a1={n}, a(n+1)=2a(n)+5, find a(n)." for n in range(1, 7)]
+
+
+class RecordingEmbeddingFunction(HashEmbeddingFunction):
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, input):
+        self.requests.append(list(input))
+        return super().__call__(input)
+
+
+def _executor(database, make_agents, step1=3, step3=2, step4=2, **kwargs):
+    def pipeline():
+        navigator, inference = make_agents()
+        return ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database)
+    return StagedExecutor(
+        pipelines={
+            "step1": [pipeline() for _ in range(step1)],
+            "step3": [pipeline() for _ in range(step3)],
+            "step4": [pipeline() for _ in range(step4)]
+        },
+        **kwargs
+    )
+
+
+def test_staged_results_match_run(database, make_agents):
+    navigator, inference = make_agents()
+    expected = ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database).run(PROBLEMS[0])
+
+    with _executor(database, make_agents) as executor:
+        results = executor.run_batch(PROBLEMS)
+
+    assert [result["problem"] for result in results] == PROBLEMS
+    for result in results:
+        for key in ("step2", "step3", "step4"):
+            assert result[key] == expected[key]
+        assert set(result["timing"]["queues"]) == {"step1", "step2", "step3", "step4"}
+        assert {"step1", "step2", "step3", "step4"} <= set(result["timing"]["stages"])
+    assert all(executor.stats[stage]["processed"] == len(PROBLEMS) for stage in executor.stats)
+    assert executor.queue_depths() == {"step1": 0, "step2": 0, "step3": 0, "step4": 0}
+
+
+def test_step2_searches_problems_in_batches(database, make_agents):
+    database.embedding_service.embedding_function = RecordingEmbeddingFunction()
+    # every problem reaches Step2 well within the wait, so they are searched together
+    executor = _executor(database, make_agents, step1=len(PROBLEMS), step2_max_wait_ms=2000, step2_batch_size=len(PROBLEMS))
+    with executor:
+        results = executor.run_batch(PROBLEMS)
+
+    assert executor.stats["step2"]["batches"] == 1
+    # one request per level, each distinct query sent once
+    assert len(database.embedding_service.embedding_function.requests) == 3
+    assert all(result["step2"]["template"]["template_name"] == "Constructing Geometric Sequences" for result in results)
+    assert all(result["timing"]["stages"]["step2"] > 0 for result in results)
+
+
+def test_batch_search_matches_single_search(database):
+    queries_list = [
+        ["Sequences and Series", "Recursive sequences", "Constructing Geometric Sequences"],
+        ["Trigonometric Functions", "Identities", "Auxiliary Angle Formula"],
+        ["Sequences and Series", "Recursive sequences", "Accumulation Method"],
+        ["too", "short"]
+    ]
+    params = {"top_k_per_level": [1, 2, 3], "weight_per_level": [1, 0.1, 0.9], "final_count": 2}
+    batched = database.hierarchical_search_batch(queries_list, **params)
+    assert batched == [database.hierarchical_search(queries, **params) for queries in queries_list]
+    assert batched[-1] is None
+
+
+def test_failed_run_does_not_stop_the_others(database, make_agents):
+    executor = _executor(database, make_agents, step1=1)
+    inference = executor.pipelines["step4"][0].inference
+    respond = inference.model_client.responder
+
+    def responder(messages):
+        if any("a1=2," in message.content for message in messages):
+            raise RuntimeError("provider error")
+        return respond(messages)
+    for pipeline in executor.pipelines["step4"]:
+        pipeline.inference.model_client.responder = responder
+
+    with executor:
+        futures = [executor.submit(problem) for problem in PROBLEMS[:3]]
+        outcomes = [future.exception() for future in futures]
+    assert outcomes[0] is None and outcomes[2] is None
+    assert outcomes[1] is not None
@@ -0,0 +1,83 @@
+import sys,os
+sys.path.append(os.getcwd())
+import pytest
+from conftest import HashEmbeddingService, format_library
+from ReasonFlux.template_matcher import HierarchicalVectorDatabase
+from ReasonFlux.utils.tracing import trace_run
+
+QUERIES = ["Sequences and Series", "Recursive sequences", "Constructing Geometric Sequences"]
+PARAMS = {"top_k_per_level": [1, 1, 1], "weight_per_level": [1, 0.1, 0.9], "final_count": 2}
+
+
+def _database(path, **kwargs):
+    database = HierarchicalVectorDatabase(data_dir=str(path), embedding_service=HashEmbeddingService(), **kwargs)
+    if database.max_level == 0:
+        database.add_recursive_dict(format_library())
+    return database
+
+
+def _names(results):
+    return [cand["doc"] for cand in results]
+
+
+def test_index_is_built_at_ingestion_and_persisted(tmp_path):
+    database = _database(tmp_path)
+    index = database.tag_index
+    assert len(index) == 3
+    assert len(index.postings["recurrence relations"]) == 2
+    assert len(index.postings["trigonometric identities"]) == 1
+    leaf_level = {leaf_id for leaf_id in database.collections["level_2"].get()["ids"]}
+    assert set(index.parents) == leaf_level
+    assert os.path.exists(tmp_path / "tag_index.json")
+
+    assert _database(tmp_path).tag_index == index
+    os.remove(tmp_path / "tag_index.json")
+    assert _database(tmp_path).tag_index == index
+
+
+def test_filter_scores_only_tagged_children(tmp_path):
+    database = _database(tmp_path, tag_mode="filter")
+    with trace_run() as run_trace:
+        results = database.hierarchical_search(QUERIES, tags=["  summation "], **PARAMS)
+    assert _names(results) == ["Accumulation Method"]
+    queried = [record.name for record in run_trace.spans if record.kind == "vector_query"]
+    assert queried == ["chroma.query", "chroma.query", "chroma.get"]
+    assert database.tag_stats == {"searches": 1, "narrowed": 1, "fallbacks": 0}
+
+    # the same tags under another parent leave that parent's search as it is
+    assert _names(database.hierarchical_search(QUERIES, tags=["Trigonometric Identities"], **PARAMS)) == \
+        ["Constructing Geometric Sequences"]
+
+
+def test_boost_raises_tagged_leaves(tmp_path):
+    plain = _database(tmp_path / "plain").hierarchical_search(QUERIES, tags=["Summation"], **{**PARAMS, "top_k_per_level": [1, 1, 2]})
+    database = _database(tmp_path / "boost", tag_mode="boost", tag_boost=0.5)
+    boosted = database.hierarchical_search(QUERIES, tags=["Summation", "Recurrence Relations"], **{**PARAMS, "top_k_per_level": [1, 1, 2]})
+
+    plain_similarity = {cand["doc"]: cand["similarity"] for cand in plain}
+    boosted_similarity = {cand["doc"]: cand["similarity"] for cand in boosted}
+    assert boosted_similarity["Accumulation Method"] == pytest.approx(plain_similarity["Accumulation Method"] + 0.5, abs=1e-4)
+    assert boosted_similarity["Constructing Geometric Sequences"] == \
+        pytest.approx(plain_similarity["Constructing Geometric Sequences"] + 0.25, abs=1e-4)
+
+
+def test_uninformative_tags_fall_back_to_full_search(tmp_path):
+    database = _database(tmp_path, tag_mode="filter", max_tag_candidates=1)
+    expected = database.hierarchical_search(QUERIES, **PARAMS)
+    assert database.hierarchical_search(QUERIES, tags=["Recurrence Relations", "Unknown Tag"], **PARAMS) == expected
+    assert database.tag_stats == {"searches": 1, "narrowed": 0, "fallbacks": 1}
+
+
+def test_filter_on_sharded_database(tmp_path):
+    database = _database(tmp_path, tag_mode="filter", shard_by_category=True)
+    assert _names(database.hierarchical_search(QUERIES, tags=["Summation"], **PARAMS)) == ["Accumulation Method"]
+
+
+def test_tags_from_model_json_are_coerced(tmp_path):
+    database = _database(tmp_path, tag_mode="filter")
+    # a single string is one tag, not one tag per character
+    assert _names(database.hierarchical_search(QUERIES, tags="Summation", **PARAMS)) == ["Accumulation Method"]
+    # anything else that is not a list is no tags
+    assert _names(database.hierarchical_search(QUERIES, tags={"tag": "Summation"}, **PARAMS)) == \
+        _names(database.hierarchical_search(QUERIES, **PARAMS))
+    assert database.tag_stats["searches"] == 1
@@ -0,0 +1,69 @@
+import sys,os
+sys.path.append(os.getcwd())
+import json
+from conftest import navigator_template, scripted_client, scripted_responder
+from ReasonFlux.agent import Navigator, TemplateProjection
+from ReasonFlux.agent.projection import TRUNCATION_MARK, estimate_tokens
+from ReasonFlux.utils.client import initialize_agent
+from ReasonFlux.utils.tracing import trace_run
+
+TEMPLATE = {
+    "template_name": "Auxiliary Angle Formula",
+    "template_type": "Problem Solving Method",
+    "knowledge_tag": ["Trigonometric Identities"],
+    "description": "Combine a·sinx + b·cosx into a single sine.",
+    "reason_flow": ["Identify a and b", "Compute √(a²+b²)", "Find the phase"],
+    "example_application": {
+        "example_problem": "Find the maximum of y = 3sinx + 4cosx.",
+        "solution_steps": [f"Step {i}: " + "rewrite the expression " * 10 for i in range(20)],
+        "final_answer": "5"
+    }
+}
+
+
+def test_default_projection_sends_the_whole_template():
+    assert TemplateProjection().serialize(TEMPLATE) == json.dumps(TEMPLATE, indent=2)
+
+
+def test_fields_compact_and_example_budget():
+    projection = TemplateProjection(fields=["template_name", "reason_flow", "example_application", "missing"],
+                                    compact=True, max_example_tokens=100)
+    text = projection.serialize(TEMPLATE)
+    projected = json.loads(text)
+    assert list(projected) == ["template_name", "reason_flow", "example_application"]
+    assert "√(a²+b²)" in text and "\n" not in text
+
+    example = projected["example_application"]
+    assert estimate_tokens(json.dumps(example, ensure_ascii=False, separators=(",", ":"))) <= 100
+    # the longest value, the solution steps, is cut first and keeps its leading steps
+    assert example["example_problem"] == TEMPLATE["example_application"]["example_problem"]
+    assert example["final_answer"] == "5"
+    assert example["solution_steps"][0] == TEMPLATE["example_application"]["solution_steps"][0]
+    assert example["solution_steps"][-1] == TRUNCATION_MARK
+    assert estimate_tokens(text) < estimate_tokens(json.dumps(TEMPLATE, indent=2)) / 3
+
+
+def test_dynamic_adjustment_reports_template_tokens():
+    responder = scripted_responder(navigator_template())
+    client = scripted_client(responder)
+    navigator = Navigator(name="Navigator", model_client=client,
+                          template_projection=TemplateProjection(fields=["template_name", "reason_flow"], compact=True))
+    with trace_run() as run_trace:
+        navigator.dynamic_adjustment(["Observe the recurrence"], TEMPLATE)
+
+    prompt = client.calls[-1][0].content
+    assert '{"template_name":"Auxiliary Angle Formula","reason_flow":' in prompt
+    assert "solution_steps" not in prompt
+    attributes = [record for record in run_trace.spans if record.kind == "llm"][0].attributes
+    assert attributes["template_tokens_before"] == estimate_tokens(json.dumps(TEMPLATE, indent=2))
+    assert attributes["template_tokens_after"] < attributes["template_tokens_before"]
+    assert navigator.projection_stats["calls"] == 1
+    assert navigator.projection_stats["tokens_after"] == attributes["template_tokens_after"]
+
+
+def test_yaml_projection():
+    navigator = initialize_agent("ReasonFlux/config/agent/navigator.yaml")
+    assert navigator.template_projection.compact
+    assert "example_application" in navigator.template_projection.fields
+    inference = initialize_agent("ReasonFlux/config/agent/inference.yaml")
+    assert not hasattr(inference, "template_projection")
@@ -0,0 +1,51 @@
+import sys,os
+sys.path.append(os.getcwd())
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.utils import tracing
+
+PROBLEM = "a1=3, a(n+1)=2a(n)+5, find a(n)."
+
+
+def test_run_attaches_timing_summary(database, make_agents):
+    navigator, inference = make_agents()
+    reason_flux = ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database)
+
+    timing = reason_flux.run(PROBLEM)["timing"]
+
+    assert list(timing["stages"]) == ["step1", "step2", "step3", "step4"]
+    assert len(timing["iterations"]) == 3
+    assert timing["total"] >= sum(timing["stages"].values())
+    # Step1, the Step3 adjustment (its flow is parsed locally), then an instruction and an inference call per iteration
+    assert [call["name"] for call in timing["llm_calls"]] == \
+        ["llm.Navigator"] * 2 + ["llm.Navigator", "llm.Inference"] * 3
+    assert all(call["retries"] == 0 and call["prompt_tokens"] > 0 and call["completion_tokens"] > 0
+               for call in timing["llm_calls"])
+    assert timing["embedding"]["count"] == 3
+    # one query per level-(n-1) candidate on level n, and the matched category has a single direction
+    assert timing["vector_query"]["count"] == 3
+
+
+def test_spans_are_exported_with_parents(database, make_agents, monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "tracer", provider.get_tracer("ReasonFlux"))
+    navigator, inference = make_agents()
+    reason_flux = ReasonFlux(
+        navigator=navigator,
+        inference=inference,
+        hierarchical_database=database,
+        speculative_retrieval=True
+    )
+
+    reason_flux.run(PROBLEM)
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    root = spans["reason_flux.run"]
+    assert spans["step2"].parent.span_id == root.context.span_id
+    assert spans["chroma.query"].attributes["reasonflux.kind"] == "vector_query"
+    # the speculative search runs in another thread but stays in the run's trace
+    assert all(span.context.trace_id == root.context.trace_id for span in spans.values())
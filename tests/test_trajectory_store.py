@@ -0,0 +1,107 @@
+import sys,os
+sys.path.append(os.getcwd())
+import json
+import multiprocessing
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.storage import TrajectoryStore
+from ReasonFlux.utils.client import initialize_trajectory_store
+
+PROBLEM = "a1=3, a(n+1)=2a(n)+5, find a(n)."
+
+
+def _record(i, template_name):
+    return {
+        "problem": f"Problem {i}",
+        "step2": {"similarity": 1.5, "template": {"template_name": template_name, "reason_flow": ["Observe"] * 20}},
+        "step4": [{"instruction": "Apply the step " * 50, "thought": "", "reasoning": "x" * 200}] * 3
+    }
+
+
+def test_append_find_and_stream(tmp_path):
+    store = TrajectoryStore(data_dir=str(tmp_path), segment_bytes=2048)
+    records = [_record(i, "Method A" if i % 3 else "Method B") for i in range(30)]
+    ids = [store.append(record) for record in records]
+
+    assert len(store.segments()) > 1
+    assert store.get(ids[4]) == records[4]
+    assert list(store.find(problem="  Problem   7 ")) == [records[7]]
+    assert [record["problem"] for record in store.find(template_name="Method B", limit=3)] == \
+        ["Problem 0", "Problem 3", "Problem 6"]
+    assert store.template_counts() == {"Method A": 20, "Method B": 10}
+    assert list(store.iter_records()) == records
+
+    # compact json in zstd frames is far smaller than the indented json files
+    stored = sum(os.path.getsize(os.path.join(tmp_path, f"segment_{n:06d}.jsonl.zst")) for n in store.segments())
+    assert stored * 5 < sum(len(json.dumps(record, indent=4)) for record in records)
+    store.close()
+
+    reopened = TrajectoryStore(data_dir=str(tmp_path), segment_bytes=2048)
+    reopened.append(_record(30, "Method B"))
+    assert reopened.count() == 31
+    assert list(reopened.iter_records())[-1]["problem"] == "Problem 30"
+    reopened.close()
+
+
+def test_two_stores_on_one_directory(tmp_path):
+    first = TrajectoryStore(data_dir=str(tmp_path), segment_bytes=2048)
+    second = TrajectoryStore(data_dir=str(tmp_path), segment_bytes=2048)
+    records = [_record(i, "Method A") for i in range(30)]
+    ids = [(first if i % 2 else second).append(record) for i, record in enumerate(records)]
+
+    assert len(first.segments()) > 1
+    assert [first.get(record_id) for record_id in ids] == records
+    assert [second.get(record_id) for record_id in ids] == records
+    assert list(first.iter_records()) == records
+    first.close()
+    second.close()
+
+
+def _append_from_process(data_dir, start):
+    store = TrajectoryStore(data_dir=data_dir, segment_bytes=4096)
+    for i in range(start, start + 20):
+        store.append(_record(i, "Method A"))
+    store.close()
+
+
+def test_processes_append_to_one_store(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_append_from_process, args=(str(tmp_path), start)) for start in (0, 100, 200)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    store = TrajectoryStore(data_dir=str(tmp_path), segment_bytes=4096)
+    assert store.count() == 60
+    problems = [store.get(record_id)["problem"] for record_id in range(1, 61)]
+    assert sorted(problems) == sorted(f"Problem {i}" for start in (0, 100, 200) for i in range(start, start + 20))
+    assert sorted(record["problem"] for record in store.iter_records()) == sorted(problems)
+    store.close()
+
+
+def test_run_appends_to_the_store(tmp_path, database, make_agents):
+    navigator, inference = make_agents()
+    reason_flux = ReasonFlux(
+        navigator=navigator,
+        inference=inference,
+        hierarchical_database=database,
+        trajectory_store=TrajectoryStore(data_dir=str(tmp_path / "trajectories"))
+    )
+
+    meta_data = reason_flux.run(PROBLEM)
+
+    stored = reason_flux.trajectory_store.get(meta_data["trajectory_id"])
+    assert stored["problem"] == PROBLEM
+    assert stored["step3"] == meta_data["step3"]
+    assert [record["problem"] for record in reason_flux.trajectory_store.find(
+        template_name="Constructing Geometric Sequences")] == [PROBLEM]
+
+
+def test_store_from_yaml(tmp_path, monkeypatch):
+    config_file = os.path.abspath("ReasonFlux/config/storage/trajectory_store.yaml")
+    monkeypatch.chdir(tmp_path)
+    store = initialize_trajectory_store(config_file)
+    assert os.path.isfile(tmp_path / "output" / "trajectories" / "index.sqlite3")
+    assert store.compression_level == 10
+    store.close()
@@ -0,0 +1,181 @@
+import sys,os
+sys.path.append(os.getcwd())
+import json
+import threading
+import time
+import pytest
+from conftest import navigator_template, scripted_responder
+from ReasonFlux.distributed import QueueWorker, coordinate
+from ReasonFlux.reason_flux import ReasonFlux
+from ReasonFlux.storage import CheckpointStore, WorkQueue
+
+PROBLEMS = [f"a1={i}, a(n+1)=2a(n)+5, find a(n)." for i in range(1, 7)]
+
+
+def test_lease_complete_and_results_in_order(tmp_path):
+    queue = WorkQueue(data_dir=str(tmp_path))
+    job_ids = queue.enqueue(PROBLEMS[:3], "batch")
+    assert queue.enqueue(PROBLEMS[:3], "batch") == job_ids
+    assert queue.counts("batch") == {"pending": 3, "leased": 0, "done": 0, "failed": 0}
+
+    leased = queue.lease("w1", count=2)
+    assert [job["job_id"] for job in leased] == job_ids[:2] and leased[0]["attempts"] == 1
+    assert queue.lease("w2", count=5)[0]["job_id"] == job_ids[2]
+    assert queue.lease("w3") == []
+
+    assert queue.complete(job_ids[1], "w1", {"answer": 2})
+    assert not queue.complete(job_ids[2], "w1", {"answer": 3})
+    assert queue.complete(job_ids[2], "w2", {"answer": 3})
+    assert queue.complete(job_ids[0], "w1", None)
+    assert [(job["status"], job["result"]) for job in queue.results("batch")] == [
+        ("done", None), ("done", {"answer": 2}), ("done", {"answer": 3})
+    ]
+
+
+def test_enqueue_rejects_an_edited_batch(tmp_path):
+    queue = WorkQueue(data_dir=str(tmp_path))
+    queue.enqueue(PROBLEMS[:3], "batch")
+    with pytest.raises(ValueError, match="batch:000001"):
+        queue.enqueue([PROBLEMS[0], "a1=1, a(n+1)=3a(n), find a(n).", PROBLEMS[2]], "batch")
+    with pytest.raises(ValueError):
+        queue.enqueue(PROBLEMS[:2], "batch")
+    # appending problems to a batch keeps its rows, a new name starts over
+    assert len(queue.enqueue(PROBLEMS[:4], "batch")) == 4
+    queue.enqueue(PROBLEMS[3:], "edited")
+    assert [job["problem"] for job in queue.results("edited")] == PROBLEMS[3:]
+    assert queue.counts("batch")["pending"] == 4
+
+
+def test_expired_leases_and_failures_are_retried(tmp_path):
+    queue = WorkQueue(data_dir=str(tmp_path), lease_seconds=0.05, max_attempts=2)
+    first, second = queue.enqueue(PROBLEMS[:2], "batch")
+    assert len(queue.lease("crashed", count=2)) == 2
+    queue.heartbeat("crashed", [second])
+    time.sleep(0.06)
+    queue.heartbeat("alive", [first])
+
+    # the lease on the first problem ran out, a heartbeat of another worker does not renew it
+    retried = queue.lease("w2", count=2)
+    assert [(job["job_id"], job["attempts"]) for job in retried] == [(first, 2), (second, 2)]
+    assert not queue.complete(first, "crashed", {"stale": True})
+
+    assert queue.fail(first, "w2", "RuntimeError: boom") == "failed"
+    time.sleep(0.06)
+    assert queue.lease("w3") == []
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 2}
+    errors = [job["error"] for job in queue.results("batch")]
+    assert errors == ["RuntimeError: boom", "Lease expired"]
+
+
+def test_concurrent_connections_never_share_a_lease(tmp_path):
+    WorkQueue(data_dir=str(tmp_path)).enqueue([f"problem {i}" for i in range(200)], "batch")
+    leased = []
+
+    def _drain(worker):
+        # a queue per worker, i.e. a connection of its own as in separate processes
+        queue = WorkQueue(data_dir=str(tmp_path))
+        while jobs := queue.lease(worker, count=3):
+            leased.extend(job["job_id"] for job in jobs)
+        queue.close()
+
+    threads = [threading.Thread(target=_drain, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(leased) == len(set(leased)) == 200
+
+
+def _failing_inference(fail_on_call):
+    respond = scripted_responder(navigator_template())
+    calls = []
+
+    def responder(messages):
+        calls.append(messages)
+        if len(calls) == fail_on_call:
+            raise RuntimeError("worker lost")
+        return respond(messages)
+    return responder
+
+
+def _worker(queue, database, make_agents, pipelines, checkpoint_store=None, **kwargs):
+    flux = []
+    for _ in range(pipelines):
+        navigator, inference = make_agents()
+        flux.append(ReasonFlux(navigator=navigator, inference=inference, hierarchical_database=database,
+                               **({"checkpoint_store": checkpoint_store} if checkpoint_store else {})))
+    return QueueWorker(queue=queue, pipelines=flux, poll_seconds=0.01, **kwargs)
+
+
+def test_workers_drain_the_queue_into_one_output(tmp_path, database, make_agents):
+    queue = WorkQueue(data_dir=str(tmp_path / "queue"))
+    workers = [_worker(WorkQueue(data_dir=str(tmp_path / "queue")), database, make_agents, 2, worker_id=f"w{i}")
+               for i in range(2)]
+    output = tmp_path / "results.jsonl"
+    coordinator = threading.Thread(target=coordinate, args=(queue, PROBLEMS, "batch", str(output), 0.01))
+    coordinator.start()
+    while queue.counts("batch")["pending"] < len(PROBLEMS):
+        time.sleep(0.01)
+    threads = [threading.Thread(target=worker.run) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    coordinator.join()
+
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [result["problem"] for result in results] == PROBLEMS
+    assert all(len(result["step4"]) == 3 for result in results)
+    assert sum(worker.stats["completed"] for worker in workers) == len(PROBLEMS)
+
+
+def test_stopped_worker_keeps_its_leases_until_done(tmp_path, database, make_agents):
+    queue = WorkQueue(data_dir=str(tmp_path), lease_seconds=0.15)
+    queue.enqueue(PROBLEMS[:1], "batch")
+    worker = _worker(WorkQueue(data_dir=str(tmp_path), lease_seconds=0.15), database, make_agents, 1)
+    respond = worker.pipelines[0].inference.model_client.responder
+
+    def slow(messages):
+        time.sleep(0.1)
+        return respond(messages)
+    worker.pipelines[0].inference.model_client.responder = slow
+
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    while queue.counts("batch")["leased"] == 0:
+        time.sleep(0.01)
+    worker.stop()
+    stolen = []
+    while thread.is_alive():
+        stolen.extend(queue.lease("other"))
+        time.sleep(0.02)
+    thread.join()
+
+    assert stolen == []
+    assert worker.stats["completed"] == 1 and worker.stats["lost"] == 0
+    assert [(job["status"], job["attempts"]) for job in queue.results("batch")] == [("done", 1)]
+
+
+def test_crashed_worker_problem_resumes_from_its_checkpoint(tmp_path, database, make_agents):
+    queue = WorkQueue(data_dir=str(tmp_path / "queue"), lease_seconds=0.05)
+    checkpoint_store = CheckpointStore(data_dir=str(tmp_path / "checkpoints"))
+    job_ids = queue.enqueue(PROBLEMS[:3], "batch")
+
+    # a worker leased the first problem and died during its second Step4 iteration
+    crashed = _worker(queue, database, make_agents, 1, checkpoint_store=checkpoint_store, worker_id="crashed")
+    crashed.pipelines[0].inference.model_client.responder = _failing_inference(fail_on_call=2)
+    job = queue.lease("crashed")[0]
+    with pytest.raises(RuntimeError):
+        crashed.pipelines[0].run(job["problem"], run_id=job["job_id"])
+    time.sleep(0.06)
+
+    worker = _worker(queue, database, make_agents, 1, checkpoint_store=checkpoint_store)
+    worker.run()
+
+    assert worker.stats == {"completed": 3, "resumed": 1, "failed": 0, "lost": 0}
+    results = list(queue.results("batch"))
+    assert [result["attempts"] for result in results] == [2, 1, 1]
+    assert all(len(result["result"]["step4"]) == 3 for result in results)
+    # the first iteration of the crashed worker was kept, not run again
+    assert results[0]["result"]["step4"][0]["instruction"] == "Instruction 2"
+    assert [result["result"]["run_id"] for result in results] == job_ids